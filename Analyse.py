@@ -0,0 +1,348 @@
+import argparse
+import csv
+import glob
+import itertools
+import os
+import numpy as np
+from multiprocessing import Pool
+
+class Analyse():
+    """Summarises the output files of runs which may be too large for memory.
+
+    This is a standalone post-processing module. To run it, execute this file
+    with the run names (the timestamps of the output files) as arguments,
+    e.g. `python Analyse.py 1542627068 1542627069`. Runs are analysed in
+    parallel, one process per run (up to the number of cores or `-j`).
+
+    For each run this writes:
+    - `1542627068_averages.csv`: the time average of every observable in
+      `1542627068.csv` with its error from block averaging
+    - `1542627068_pressure_convergence.csv`: the pressure and its error
+      against time (if pressure was output)
+    - `1542627068_speeds.csv`: a histogram of ball speeds, from the
+      trajectory files if they exist (every sample) or otherwise from the
+      final state in `1542627068_states.csv` (if speed was output)
+
+    `1542627068.csv` is read `chunk_size` rows at a time and the trajectory
+    files are memory-mapped, so memory use does not grow with the length of
+    the run (apart from one small row per block).
+
+    Each row of the output holds from its time until the time of the next
+    row, so averages are weighted by that interval. The intervals are split
+    into blocks of `block_size` rows, and the error is the standard error of
+    the mean of the block averages. The pressure column is already averaged
+    since t = 0, so the pressure of each block is found from the change in
+    (pressure x time) over the block, as in RunController.
+
+    Arguments:
+        run_name (str): The timestamp at the start of the output file names.
+        chunk_size (int = 100000): The number of rows read at once.
+        block_size (int = 1000): The number of rows in each block.
+        num_bins (int = 50): The number of bins of the speed histogram.
+        max_points (int = 1000): The largest number of points written to the
+                                 pressure convergence file.
+
+    Attributes:
+        run_name (str): The timestamp at the start of the output file names.
+        columns (list): The names of the columns of the output file.
+        block_sums (np.array): A (blocks, columns) array of the sum of each
+                               observable times its interval in each block.
+        block_times (np.array): The length of time of each block.
+        block_ends (np.array): A (blocks, columns + 1) array of the row at
+                               the end of each block (time first).
+        block_counts (np.array): The number of rows in each block.
+        first_row (np.array): The first row of the output file.
+    """
+    def __init__(self, run_name, chunk_size = 100000, block_size = 1000,
+                 num_bins = 50, max_points = 1000):
+        """Initialises the analysis of a run."""
+        self.run_name = run_name
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self.num_bins = num_bins
+        self.max_points = max_points
+        self.columns = []
+        self.block_sums = None
+        self.block_times = None
+        self.block_ends = None
+        self.block_counts = None
+        self.first_row = None
+
+    def read_chunks(self, file_name):
+        """Reads a CSV file with a header row `chunk_size` rows at a time.
+
+        Yields:
+            chunk (np.array): An array of the next rows of the file.
+        """
+        try:
+            f = open(file_name, "rt")
+        except IOError:
+            raise Exception("File not found: run App.py with SHOULD_OUTPUT"
+                            " in Config module.")
+
+        with f as csv_file:
+            self.columns = next(csv.reader([csv_file.readline()]))
+            if self.columns[:1] != ["time"]:
+                raise Exception("Output file has no header row (written"
+                                " before observables were named) in Analyse"
+                                " module.")
+            while True:
+                lines = list(itertools.islice(csv_file, self.chunk_size))
+                if len(lines) == 0:
+                    break
+                yield np.loadtxt(lines, delimiter = ",", ndmin = 2)
+
+    def accumulate(self):
+        """Reads the output file and sums every observable over each block."""
+        sums = []
+        times = []
+        ends = []
+        counts = []
+        previous = None # Last row of the previous chunk
+        num_intervals = 0
+        num_blocks = 0
+
+        for chunk in self.read_chunks("{}.csv".format(self.run_name)):
+            if previous is None:
+                self.first_row = chunk[0]
+                rows = chunk
+            else:
+                rows = np.concatenate([previous, chunk])
+            previous = rows[-1:]
+            if len(rows) < 2:
+                continue
+
+            # Interval k is the time for which row k holds
+            dt = np.diff(rows[:, 0])
+            weighted = rows[:-1, 1:] * dt[:, None]
+
+            # Sum the intervals of each block in this chunk
+            ids = (num_intervals + np.arange(len(dt))) // self.block_size
+            starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+            stops = np.r_[starts[1:], len(dt)]
+            chunk_sums = np.add.reduceat(weighted, starts, axis = 0)
+            chunk_times = np.add.reduceat(dt, starts)
+            chunk_ends = rows[stops]
+            chunk_counts = stops - starts
+            num_intervals += len(dt)
+
+            if ids[0] == num_blocks - 1:
+                # The first block continues the last block of the previous
+                # chunk
+                sums[-1][-1] += chunk_sums[0]
+                times[-1][-1] += chunk_times[0]
+                ends[-1][-1] = chunk_ends[0]
+                counts[-1][-1] += chunk_counts[0]
+                chunk_sums = chunk_sums[1:]
+                chunk_times = chunk_times[1:]
+                chunk_ends = chunk_ends[1:]
+                chunk_counts = chunk_counts[1:]
+            if len(chunk_counts) > 0:
+                num_blocks += len(chunk_counts)
+                sums.append(chunk_sums)
+                times.append(chunk_times)
+                ends.append(chunk_ends)
+                counts.append(chunk_counts)
+
+        if len(counts) == 0:
+            raise Exception("Output file has fewer than two rows in Analyse"
+                            " module.")
+        self.block_sums = np.concatenate(sums)
+        self.block_times = np.concatenate(times)
+        self.block_ends = np.concatenate(ends)
+        self.block_counts = np.concatenate(counts)
+
+    @classmethod
+    def standard_error(cls, values):
+        """Returns the standard error of the mean of block values."""
+        if len(values) < 2:
+            return np.nan
+        return np.std(values, ddof = 1) / np.sqrt(len(values))
+
+    def block_pressures(self):
+        """Calculates the pressure of each block from the pressure column.
+
+        Returns:
+            An np.array of the pressure of each block.
+        """
+        p = self.columns.index("pressure")
+        end_impulse = self.block_ends[:, p] * self.block_ends[:, 0]
+        start_impulse = np.r_[self.first_row[p] * self.first_row[0],
+                              end_impulse[:-1]]
+        return (end_impulse - start_impulse) / self.block_times
+
+    def averages(self):
+        """Calculates the time average and error of every observable.
+
+        Only complete blocks are used for the errors.
+
+        Returns:
+            A list of rows [observable, time average, error, blocks].
+        """
+        complete = self.block_counts == self.block_size
+        total_time = self.block_times.sum()
+        rows = []
+        for c, name in enumerate(self.columns[1:]):
+            if name == "pressure":
+                # Already averaged since t = 0
+                average = self.block_ends[-1, c + 1]
+                blocks = self.block_pressures()[complete]
+            else:
+                average = self.block_sums[:, c].sum() / total_time
+                blocks = (self.block_sums[complete, c] /
+                          self.block_times[complete])
+            rows.append([name, average, Analyse.standard_error(blocks),
+                         len(blocks)])
+        return rows
+
+    def pressure_convergence(self):
+        """Calculates the pressure and its error at the end of each block.
+
+        Returns:
+            A list [times, pressures, errors] of np.arrays, with at most
+            `max_points` points.
+        """
+        p = self.columns.index("pressure")
+        blocks = self.block_pressures()
+
+        # Running standard error of the block pressures
+        n = np.arange(1, len(blocks) + 1)
+        mean = np.cumsum(blocks) / n
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            variance = (np.cumsum(blocks ** 2) - n * mean ** 2) / (n - 1)
+            errors = np.sqrt(np.maximum(variance, 0.0) / n)
+
+        step = max(1, int(np.ceil(len(blocks) / self.max_points)))
+        keep = np.r_[np.arange(0, len(blocks) - 1, step), len(blocks) - 1]
+        return [self.block_ends[keep, 0], self.block_ends[keep, p],
+                errors[keep]]
+
+    def speeds(self):
+        """Returns a histogram of ball speeds, or None if there is no data.
+
+        Returns:
+            A list [bin starts, counts, source] or None.
+        """
+        file_names = sorted(glob.glob("{}_trajectory_[0-9]*.npy".format(
+            self.run_name)))
+        if len(file_names) > 0:
+            # Each batch of samples holds about `chunk_size` speeds
+            batches = []
+            for f in file_names:
+                chunk = np.load(f, mmap_mode = "r")
+                size = max(1, self.chunk_size // chunk.shape[1])
+                batches.extend(chunk[start:start + size]
+                               for start in range(0, len(chunk), size))
+
+            # Two passes over the memory-mapped files: the largest speed
+            # fixes the bins, then every speed is counted
+            top = max(Analyse.speeds_of(batch).max() for batch in batches)
+            edges = np.linspace(0.0, top, self.num_bins + 1)
+            counts = sum(np.histogram(Analyse.speeds_of(batch), edges)[0]
+                         for batch in batches)
+            return [edges[:-1], counts, "trajectories"]
+
+        final = None
+        try:
+            f = open("{}_states.csv".format(self.run_name), "rt")
+        except IOError:
+            return None
+        with f as csv_file:
+            reader = csv.reader(csv_file)
+            header = next(reader)
+            columns = [k for k, name in enumerate(header)
+                       if name.startswith("speed_")]
+            for row in reader:
+                final = row # Only the final state is kept
+        if final is None or len(columns) == 0:
+            return None
+
+        speeds = np.array([final[k] for k in columns], dtype = float)
+        edges = np.linspace(0.0, speeds.max(), self.num_bins + 1)
+        return [edges[:-1], np.histogram(speeds, edges)[0], "final state"]
+
+    @classmethod
+    def speeds_of(cls, batch):
+        """Returns the speeds in a (samples, N, 4) trajectory batch."""
+        return np.hypot(batch[:, :, 2], batch[:, :, 3])
+
+    def write_csv(self, file_name, header, rows):
+        """Writes a header row and then `rows` to a CSV file."""
+        try:
+            f = open(file_name, "wt")
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in Analyse module.")
+
+        with f as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def save(self):
+        """Analyses the run and writes the results to CSV files.
+
+        Returns:
+            A string summarising the time averages of the run.
+        """
+        self.accumulate()
+        averages = self.averages()
+        self.write_csv("{}_averages.csv".format(self.run_name),
+                       ["observable", "time_average", "error", "blocks"],
+                       averages)
+
+        if "pressure" in self.columns:
+            self.write_csv("{}_pressure_convergence.csv".format(
+                self.run_name), ["time", "pressure", "error"],
+                zip(*self.pressure_convergence()))
+
+        speeds = self.speeds()
+        if speeds is not None:
+            self.write_csv("{}_speeds.csv".format(self.run_name),
+                           ["speed_bin_start", "count"],
+                           zip(speeds[0], speeds[1]))
+
+        lines = ["{}:".format(self.run_name)]
+        for name, average, error, blocks in averages:
+            lines.append("  {} = {:.6g} +/- {:.2g} ({} blocks)".format(
+                name, average, error, blocks))
+        if speeds is not None:
+            lines.append("  speed histogram from {}".format(speeds[2]))
+        return "\n".join(lines)
+
+    @classmethod
+    def process(cls, arguments):
+        """Analyses one run in a worker process.
+
+        Arguments:
+            arguments (list): The arguments of Analyse.
+
+        Returns:
+            The summary returned by save().
+        """
+        return Analyse(*arguments).save()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description = "Summarises the output files of one or more runs.")
+    parser.add_argument("run_names", nargs = "+",
+                        help = "timestamps of the output files")
+    parser.add_argument("-j", "--jobs", type = int, default = os.cpu_count(),
+                        help = "number of runs analysed at once")
+    parser.add_argument("--chunk-size", type = int, default = 100000,
+                        help = "rows read at once")
+    parser.add_argument("--block-size", type = int, default = 1000,
+                        help = "rows in each block for errors")
+    parser.add_argument("--num-bins", type = int, default = 50,
+                        help = "bins of the speed histogram")
+    args = parser.parse_args()
+
+    jobs = [[run_name, args.chunk_size, args.block_size, args.num_bins]
+            for run_name in args.run_names]
+    if len(jobs) == 1 or args.jobs <= 1:
+        for summary in map(Analyse.process, jobs):
+            print(summary)
+    else:
+        with Pool(min(args.jobs, len(jobs))) as pool:
+            for summary in pool.imap(Analyse.process, jobs):
+                print(summary)
@@ -10,10 +10,21 @@ Thermodynamics Snooker
 import numpy as np
 from numpy import linalg as la
 import pylab as pl
+import time
 
 from Ball import Ball
 import Config
+from EventLog import EventLog
+from FieldSampler import FieldSampler
+from FreeFlights import FreeFlights
+from InvariantMonitor import InvariantMonitor
+from PairCorrelation import PairCorrelation
+from TrajectorySampler import TrajectorySampler
 from ParseState import ParseState
+from Renderer import Renderer, SnapshotBuffer
+from RunController import RunController
+from StateCache import StateCache
+from Telemetry import Telemetry
 from WriteOutput import WriteOutput
 
 class App(object):
@@ -32,6 +43,30 @@ class App(object):
         should_animate (bool): Should the simulation produce an animation?
         animation_frame_pause (float): The pause time in seconds between frames.
         initial_state_file_name (str): Name of CSV file containing initial state.
+        state_cache (StateCache): Cache the initial state is loaded from
+                                  instead of the CSV file, or None.
+        initial_state_parameters (dict): The arguments of InitialState used to
+                                         find the state in `state_cache`.
+        should_use_render_process (bool): Should the animation be drawn by a
+                                          separate Renderer process?
+        animation_mode (str): When frames are drawn: "collision", "time" or
+                              "fps" (see render()).
+        animation_time_step (float): Simulated time between frames in "time"
+                                     mode.
+        animation_fps (float): Wall-clock frames per second in "fps" mode.
+        frame_count (int): The number of frames drawn in "time" mode.
+        next_frame_wall_time (float): Wall-clock time of next "fps" frame.
+        should_record_events (bool): Should every collision be recorded to an
+                                     EventLog file?
+        keyframe_interval (int): Number of events between EventLog keyframes
+                                 (None for no keyframes).
+        run_name (str): Timestamp used to name the output files of this run.
+        inner_radius (float): Radius of the inner circle used to measure the
+                              inner concentration.
+        sample_interval (float): Simulated time between samples.
+        sample_count (int): The number of samples taken.
+        telemetry_interval (int): Number of events between telemetry
+                                  snapshots.
         
         time (float): The time of the simulation.
         num_balls (int): The number of balls in the container.
@@ -41,8 +76,24 @@ class App(object):
         delta_p (float): The total change in momentum of balls in container.
         ball_collisions (int): The total number of ball-ball collisions.
         wall_collisions (int): The total number of ball-wall collisions.
+        overlaps (int): The number of collisions of balls which overlapped
+                        each other (or the wall) by more than rounding error.
+        repeated_events (int): The number of collisions which repeated the
+                               previous collision at once.
+        last_collision (list): The IDs of the balls in the previous collision.
         
         __balls (list): An array of each ball in the simulation.
+        positions (np.array): An (N, 2) array of ball positions. The position
+                              of each Ball is a view of one row.
+        velocities (np.array): An (N, 2) array of ball velocities. The
+                               velocity of each Ball is a view of one row.
+        masses (np.array): The mass of each ball.
+        radii (np.array): The radius of each ball.
+        distance_travelled (np.array): The distance each ball has travelled
+                                       up to its last ball collision.
+        ball_collision_counts (np.array): The number of ball collisions of
+                                          each ball.
+        initial_positions (np.array): An (N, 2) array of positions at t = 0.
         b2b_table (list): A 2-D array of collision times for each pair of balls.
         b2w_table (list): A 1-D array of collision times for wall collisions.
         
@@ -51,9 +102,52 @@ class App(object):
         
         output (WriteOutput): WriteOutput class that measures observables of
                               system and outputs to CSV file for data analysis.
+        event_log (EventLog): Records every collision for exact replay, or
+                              None if events are not recorded.
+        samplers (list): Objects (e.g. FieldSampler) whose sample() method is
+                         given the state of the system every sample_interval
+                         and whose save() method is called at the end.
+        telemetry (Telemetry): Local server publishing the progress of the
+                               run, or None if telemetry is disabled.
+        controller (RunController): Detects equilibration and stops the run
+                                    early once the pressure is precise, or
+                                    None to always run num_frames collisions.
+        free_flights (FreeFlights): Distributions of the free-flight times
+                                    and path lengths, or None.
+        monitor (InvariantMonitor): Checks conservation laws and overlaps
+                                    while the simulation runs, or None.
     """
     def __init__(self, container_radius, num_frames, should_output,
-                 should_animate, animation_frame_pause, initial_state_file_name):
+                 should_animate, animation_frame_pause, initial_state_file_name,
+                 should_use_render_process = False,
+                 animation_mode = "collision", animation_time_step = 0.1,
+                 animation_fps = 30.0, should_record_events = False,
+                 keyframe_interval = None, inner_radius = None,
+                 sample_interval = 1.0, should_sample_fields = False,
+                 field_num_shells = 10, field_grid_size = 20,
+                 field_regions = None, field_species = None,
+                 should_sample_pair_correlation = False,
+                 pair_correlation_cutoff = 5.0,
+                 pair_correlation_num_bins = 50,
+                 should_sample_trajectories = False,
+                 trajectory_chunk_size = 1000, telemetry_port = None,
+                 telemetry_socket_path = None, telemetry_interval = 1000,
+                 should_control_run = False,
+                 equilibration_check_interval = 100,
+                 equilibration_ks_threshold = 1.0,
+                 equilibration_num_checks = 3, pressure_block_size = 1000,
+                 pressure_min_blocks = 10, pressure_tolerance = None,
+                 state_cache_directory = None, state_cache_max_bytes = 1e9,
+                 initial_state_parameters = None, output_observables = None,
+                 output_ball_observables = None,
+                 should_collect_free_flights = False,
+                 free_flight_num_bins = 100,
+                 should_monitor_invariants = False,
+                 invariant_energy_interval = 100,
+                 invariant_collision_interval = 1,
+                 invariant_overlap_interval = None,
+                 invariant_tolerance = 1e-8,
+                 should_fail_on_violation = False):
         """Initialises the application."""
         self.__container_radius = container_radius
         self.num_frames = num_frames
@@ -61,6 +155,25 @@ class App(object):
         self.should_animate = should_animate
         self.animation_frame_pause = animation_frame_pause
         self.initial_state_file_name = initial_state_file_name
+        self.state_cache = None
+        if state_cache_directory is not None:
+            self.state_cache = StateCache(state_cache_directory,
+                                          state_cache_max_bytes)
+        self.initial_state_parameters = initial_state_parameters
+        self.should_use_render_process = should_use_render_process
+        self.animation_mode = animation_mode
+        self.animation_time_step = animation_time_step
+        self.animation_fps = animation_fps
+        self.frame_count = 1 # Frame 0 (t = 0) is drawn before any collision
+        self.next_frame_wall_time = 0.0
+        self.should_record_events = should_record_events
+        self.keyframe_interval = keyframe_interval
+        self.run_name = "{}".format(int(time.time()))
+        self.inner_radius = (inner_radius if inner_radius is not None
+                             else container_radius)
+        self.sample_interval = sample_interval
+        self.sample_count = 0
+        self.telemetry_interval = telemetry_interval
         
         # Initialise simulation variables
         self.time = 0.0
@@ -71,11 +184,32 @@ class App(object):
         self.delta_p = 0.0
         self.ball_collisions = 0
         self.wall_collisions = 0
+        self.overlaps = 0
+        self.repeated_events = 0
+        self.last_collision = []
 
         # Initialise balls list
         self.__balls = ParseState(self).get_balls()
         self.num_balls = len(self.balls())
 
+        # Store the state of every ball in contiguous arrays so that the whole
+        # system can be copied or measured without looping over balls.
+        self.positions = np.array([b.position() for b in self.balls()],
+                                  dtype = float).reshape(self.num_balls, 2)
+        self.velocities = np.array([b.velocity() for b in self.balls()],
+                                   dtype = float).reshape(self.num_balls, 2)
+        for i, b in enumerate(self.balls()):
+            b.bind(self.positions[i], self.velocities[i])
+        self.masses = np.array([b.mass() for b in self.balls()], dtype = float)
+        self.radii = np.array([b.radius() for b in self.balls()], dtype = float)
+        self.distance_travelled = np.zeros(self.num_balls)
+        self.ball_collision_counts = np.zeros(self.num_balls, dtype = np.int64)
+        self.initial_positions = np.zeros((self.num_balls, 2))
+        for i, b in enumerate(self.balls()):
+            b.bind_statistics(self.distance_travelled[i:i + 1],
+                              self.ball_collision_counts[i:i + 1],
+                              self.initial_positions[i])
+
         # Initialise collision time tables
         self.b2b_table = np.full((self.num_balls, self.num_balls), np.inf)
         self.b2w_table = np.full(self.num_balls, np.inf)
@@ -87,15 +221,84 @@ class App(object):
                                          ec = "b", fill = False, ls = "solid")
 
         # Initialise data output mechanism
-        self.output = WriteOutput(self)
+        self.output = WriteOutput(self, output_observables,
+                                  output_ball_observables)
+        self.event_log = None
+        if should_record_events:
+            self.event_log = EventLog("{}.events".format(self.run_name),
+                                      self.positions, self.velocities,
+                                      self.masses, self.radii,
+                                      keyframe_interval)
+
+        # Initialise samplers of the state at regular time intervals
+        self.samplers = []
+        if should_sample_fields:
+            self.samplers.append(FieldSampler(self, field_num_shells,
+                                              field_grid_size,
+                                              field_regions or {},
+                                              field_species or {}))
+        if should_sample_pair_correlation:
+            self.samplers.append(PairCorrelation(self, pair_correlation_cutoff,
+                                                 pair_correlation_num_bins))
+        if should_sample_trajectories:
+            self.samplers.append(TrajectorySampler(self,
+                                                   trajectory_chunk_size))
+
+        # Initialise detection of equilibration and early stopping
+        self.controller = None
+        if should_control_run:
+            self.controller = RunController(self, equilibration_check_interval,
+                                            equilibration_ks_threshold,
+                                            equilibration_num_checks,
+                                            pressure_block_size,
+                                            pressure_min_blocks,
+                                            pressure_tolerance)
+
+        # Initialise distributions of free flights between collisions
+        self.free_flights = None
+        if should_collect_free_flights:
+            self.free_flights = FreeFlights(self, free_flight_num_bins)
+
+        # Initialise checks of conservation laws
+        self.monitor = None
+        if should_monitor_invariants:
+            self.monitor = InvariantMonitor(self, invariant_energy_interval,
+                                            invariant_collision_interval,
+                                            invariant_overlap_interval,
+                                            invariant_tolerance,
+                                            should_fail_on_violation)
+
+        # Initialise live telemetry server
+        self.telemetry = None
+        if telemetry_port is not None or telemetry_socket_path is not None:
+            self.telemetry = Telemetry(num_frames, telemetry_port,
+                                       telemetry_socket_path)
+
         self.output.print_state() # Print initial state of system
         self.update_state(0.0) # Calculates state measurements at t = 0
+        self.take_samples(0.0) # Takes samples at t = 0
+        if self.telemetry is not None:
+            self.telemetry.publish(self)
         
         # Run simulation
         self.render(num_frames = num_frames, animate = should_animate)
 
         self.output.print_state() # Print final state of system
         self.output.save() # Save CSV data file
+        if self.controller is not None:
+            print(self.controller.summary())
+        if self.monitor is not None:
+            print(self.monitor.summary())
+        if self.free_flights is not None:
+            print(self.free_flights.summary())
+            self.free_flights.save()
+        if self.event_log is not None:
+            self.event_log.close() # Write remaining events to file
+        for sampler in self.samplers:
+            sampler.save()
+        if self.telemetry is not None:
+            self.telemetry.publish(self) # Publish final state
+            self.telemetry.close()
 
     def balls(self):
         """Accessor method for balls in simulation."""
@@ -188,18 +391,22 @@ class App(object):
         """
 
         dt = collision[1] # Stores time of next collision
+        self.take_samples(dt) # Takes samples which fall before the collision
         self.update_table(dt) # Update collision table
         balls = self.balls()
 
-        for b in self.balls():
-            # Updates position of each ball to position at collision time
-            b.update_position(dt)
+        # Updates position of every ball to its position at collision time
+        self.positions += self.velocities * dt
+
+        self.check_collision(collision[0], dt)
+        if self.monitor is not None:
+            self.monitor.before_collision(collision[0])
         
         if len(collision[0]) == 1:
             # Wall collision
             b2w = collision[0][0] # Store index of colliding ball
             ball = balls[b2w] # Store reference to colliding ball
-            u = ball.velocity()
+            u = np.copy(ball.velocity()) # Copy as the view is updated in place
             v = ball.velocity_after_wall_collision()
             ball.update_velocity(v)
                 
@@ -221,6 +428,12 @@ class App(object):
             b1 = balls[b_i]
             b2 = balls[b_j]
 
+            # End the free flights of both balls before their speeds change
+            for b in [b1, b2]:
+                flight = b.end_free_flight(self.time + dt)
+                if self.free_flights is not None and b.ball_collisions() > 0:
+                    self.free_flights.record(flight)
+
             v1, v2 = b1.velocity_after_ball_collision(b2)
             b1.update_velocity(v1)
             b2.update_velocity(v2)
@@ -229,21 +442,103 @@ class App(object):
             self.recalculate_collision([b_i, b_j])
 
             # Increment collision counters
-            b1.ball_collisions += 1
-            b2.ball_collisions += 1
+            b1.add_ball_collision()
+            b2.add_ball_collision()
             self.ball_collisions += 1
 
+        if self.event_log is not None:
+            # Record new velocities of colliding balls for replay
+            ball_ids = collision[0]
+            self.event_log.record(dt, ball_ids,
+                                  [self.velocities[i] for i in ball_ids])
+
         # Calculate new state variables (i.e KE, RMS Speed)
         self.update_state(dt)
 
+        if self.monitor is not None:
+            self.monitor.after_collision(collision[0])
+
+        if self.controller is not None:
+            self.controller.update()
+
+        if (self.telemetry is not None and
+            (self.ball_collisions + self.wall_collisions) %
+            self.telemetry_interval == 0):
+            self.telemetry.publish(self)
+
+    def check_collision(self, ball_ids, dt):
+        """Counts overlapping balls and repeated collisions.
+
+        Neither should happen, but rounding errors in the positions of balls
+        can cause both in dense, long simulations.
+
+        Arguments:
+            ball_ids (list): The IDs of the colliding balls.
+            dt (float): The time since the previous collision.
+        """
+        ball_ids = [int(i) for i in ball_ids]
+        positions = self.positions[ball_ids]
+        radii = self.radii[ball_ids]
+
+        if len(ball_ids) == 1:
+            distance = self.container_radius() - radii[0]
+            is_overlap = la.norm(positions[0]) > distance * (1 + Ball.TOLERANCE)
+        else:
+            contact = radii[0] + radii[1]
+            is_overlap = (la.norm(positions[0] - positions[1]) <
+                          contact * (1 - Ball.TOLERANCE))
+        if is_overlap:
+            self.overlaps += 1
+
+        # A repeated collision happens before the balls have moved more than
+        # the rounding error of their positions
+        speed = np.max(la.norm(self.velocities[ball_ids], axis = 1))
+        if (ball_ids == self.last_collision and
+            dt * speed <= Ball.TOLERANCE * np.min(radii)):
+            self.repeated_events += 1
+        self.last_collision = ball_ids
+
+    def take_samples(self, dt):
+        """Passes the state at each sample time within the next dt to samplers.
+
+        Samples are taken at multiples of `sample_interval`. The positions of
+        the balls are extrapolated from the last collision to the sample time.
+
+        Arguments:
+            dt (float): The time until the next collision.
+        """
+        if len(self.samplers) == 0:
+            return
+
+        while self.sample_count * self.sample_interval <= self.time + dt:
+            t = self.sample_count * self.sample_interval
+            positions = self.positions + self.velocities * (t - self.time)
+            for sampler in self.samplers:
+                sampler.sample(t, positions, self.velocities)
+            self.sample_count += 1
+
     def render(self, num_frames, animate = False):
-        """Renders each frame of the simulation at collision time.
+        """Renders frames of the simulation while executing collisions.
+
+        When frames are drawn depends on `animation_mode`:
+        - "collision": One frame after every collision
+        - "time": One frame every `animation_time_step` seconds of simulated
+                  time, with positions extrapolated from the last collision
+        - "fps": One frame every 1 / `animation_fps` seconds of wall-clock
+                 time, showing the state after the latest collision
+
+        The run stops before `num_frames` collisions if the RunController
+        has met its precision target.
 
         Arguments:
-            num_frames (int): The number of collision frames to render.
+            num_frames (int): The maximum number of collisions to execute.
             animate (bool): Flag to indicate if output should be animated.
         """
 
+        if animate and self.should_use_render_process:
+            self.render_out_of_process(num_frames)
+            return
+
         # For rendering purposes
         if animate:
             bounds = self.container_radius() + 5 # Defines bounds of axis
@@ -253,36 +548,139 @@ class App(object):
             ax.add_artist(self.container_patch)
             time_txt = ax.text(0.05, 0.01, self.format_debug_text(),
                                fontsize = 7, transform = ax.transAxes)
-            for b in self.balls():
-                b.render(ax)
-            pl.pause(self.animation_frame_pause)
+            self.draw_frame(ax, time_txt, 0.0)
 
         for frame in range(num_frames):
             next_collision = self.next_collision() # Determines next collision
-            self.collide(next_collision) # Executes collision
             if animate:
-                for b in self.balls():
-                    b.render(ax)
-                time_txt.set_text(self.format_debug_text()) # Debug string
-                pl.pause(self.animation_frame_pause)
+                # Draw any frames which fall before the next collision
+                for dt in self.frame_times(next_collision[1]):
+                    self.draw_frame(ax, time_txt, dt)
+            self.collide(next_collision) # Executes collision
+            if animate and self.is_frame_due():
+                self.draw_frame(ax, time_txt, 0.0)
+            if self.should_stop():
+                break
 
         if animate:
             pl.show()
 
-    def format_debug_text(self):
+    def should_stop(self):
+        """Checks if the RunController has ended the run early."""
+        return self.controller is not None and self.controller.should_stop
+
+    def draw_frame(self, ax, time_txt, dt):
+        """Draws the balls and debug string a time dt after the current time.
+
+        Arguments:
+            ax (axes.Axes): Axes object to draw the balls on.
+            time_txt (text.Text): Text object showing the debug string.
+            dt (float): Time since the last collision at which to draw balls.
+        """
+        for b in self.balls():
+            b.render(ax, dt)
+        time_txt.set_text(self.format_debug_text(dt)) # Debug string
+        pl.pause(self.animation_frame_pause)
+
+    def frame_times(self, dt):
+        """Finds the frames which fall within the next time interval dt.
+
+        Only used when `animation_mode` is "time". Frames are drawn at
+        multiples of `animation_time_step` of simulated time.
+
+        Arguments:
+            dt (float): The time until the next collision.
+
+        Yields:
+            dt_frame (float): The time of each frame after the current time.
+        """
+        if self.animation_mode != "time":
+            return
+
+        # Frame times are calculated from the frame count rather than summed
+        # so that rounding errors do not accumulate over long animations.
+        while self.frame_count * self.animation_time_step <= self.time + dt:
+            yield self.frame_count * self.animation_time_step - self.time
+            self.frame_count += 1
+
+    def is_frame_due(self):
+        """Checks if a frame should be drawn after the current collision.
+
+        Returns:
+            A bool which is True if a frame should be drawn for the state of
+            the system immediately after the latest collision.
+        """
+        if self.animation_mode == "collision":
+            return True
+        elif self.animation_mode == "fps":
+            now = time.perf_counter()
+            if now >= self.next_frame_wall_time:
+                self.next_frame_wall_time = now + 1.0 / self.animation_fps
+                return True
+        return False
+
+    def render_out_of_process(self, num_frames):
+        """Runs the simulation while a Renderer process draws the animation.
+
+        Frames are published to a shared-memory SnapshotBuffer at the times
+        given by `animation_mode` (see render()). The Renderer draws whichever
+        snapshot is the latest when it is ready for a new frame, so the
+        simulation never waits on drawing.
+
+        Arguments:
+            num_frames (int): The number of collisions to simulate.
+        """
+        buffer = SnapshotBuffer(self.num_balls)
+        radii = [b.radius() for b in self.balls()]
+        renderer = Renderer(buffer.name(), radii, self.container_radius(),
+                            self.animation_frame_pause)
+
+        self.publish_snapshot(buffer, 0.0) # Publish initial state first
+        renderer.start()
+
+        for frame in range(num_frames):
+            next_collision = self.next_collision() # Determines next collision
+            for dt in self.frame_times(next_collision[1]):
+                self.publish_snapshot(buffer, dt)
+            self.collide(next_collision) # Executes collision
+            if self.is_frame_due():
+                self.publish_snapshot(buffer, 0.0)
+            if self.should_stop():
+                break
+
+        buffer.finish()
+        renderer.join() # Waits for the animation window to be closed
+        buffer.close(unlink = True)
+
+    def publish_snapshot(self, buffer, dt):
+        """Writes the state of the simulation a time dt from now to `buffer`.
+
+        Arguments:
+            buffer (SnapshotBuffer): The buffer read by the Renderer process.
+            dt (float): Time since the last collision at which to extrapolate
+                        the positions of the balls.
+        """
+        stats = [self.time + dt, self.ball_collisions, self.wall_collisions,
+                 self.kinetic_energy, self.rms_speed, self.pressure]
+        positions = self.positions + self.velocities * dt
+        buffer.write(stats, positions, self.velocities)
+
+    def format_debug_text(self, dt = 0.0):
         """Formats debug string for rendering on animation.
-        
+
+        Arguments:
+            dt (float = 0.0): Time since the last collision at which the frame
+                              is drawn.
+
         Returns:
             A formatted string containing the state variables for each
             time-step.
         """
-        total_collisions = self.wall_collisions + self.ball_collisions
-        txt_str = ("Time: {:.2f}s\nBalls: {:d}\nBall Collisions: {:d}"
-                   "\nWall Collisions: {:d}\nTotal Collisions: {:d}"
-                   "\nKE: {:.2f}J\nRMS Speed: {:.2f}m/s\nPressure: {:.2f}Pa")
-        return txt_str.format(self.time, self.num_balls, self.ball_collisions,
-                              self.wall_collisions, total_collisions,
-                              self.kinetic_energy, self.rms_speed, self.pressure)
+        return Renderer.format_debug_text(self.num_balls, self.time + dt,
+                                          self.ball_collisions,
+                                          self.wall_collisions,
+                                          self.kinetic_energy, self.rms_speed,
+                                          self.pressure)
 
     def update_state(self, dt):
         """Updates the state variables of the simulation after a time dt.
@@ -290,22 +688,70 @@ class App(object):
         Arguments:
             dt (float): The time which has elapsed since the last update.
         """
-        kinetic_energy = 0.0
-        rms_speed_sum = 0.0
-        for b in self.balls():
-            kinetic_energy += b.kinetic_energy()
-            rms_speed_sum += b.speed_squared()
+        speed_squared = np.einsum("ij,ij->i", self.velocities, self.velocities)
 
         # Update state variables
         self.time += dt
-        self.kinetic_energy = kinetic_energy
-        self.rms_speed = np.sqrt(rms_speed_sum / self.num_balls)
+        self.kinetic_energy = 0.5 * np.dot(self.masses, speed_squared)
+        self.rms_speed = np.sqrt(np.mean(speed_squared))
         self.pressure = (self.delta_p / (self.container_circumference * self.time)
                         if self.time > 0.0 else 0.0)
         Ball.rms_speed = self.rms_speed # Used for scaling of velocity vectors
         self.output.print_line()
 
-# Initialises simulation agent
-app = App(Config.CONTAINER_RADIUS, Config.NUM_FRAMES_TO_RENDER,
-          Config.SHOULD_OUTPUT, Config.SHOULD_ANIMATE,
-          Config.ANIMATION_FRAME_PAUSE, Config.INITIAL_STATE_FILE_NAME)
+# Initialises simulation agent. The guard stops the simulation from running
+# again when a child process (e.g. the Renderer) imports this module.
+if __name__ == "__main__":
+    app = App(Config.CONTAINER_RADIUS, Config.NUM_FRAMES_TO_RENDER,
+              Config.SHOULD_OUTPUT, Config.SHOULD_ANIMATE,
+              Config.ANIMATION_FRAME_PAUSE, Config.INITIAL_STATE_FILE_NAME,
+              Config.SHOULD_USE_RENDER_PROCESS, Config.ANIMATION_MODE,
+              Config.ANIMATION_TIME_STEP, Config.ANIMATION_FPS,
+              Config.SHOULD_RECORD_EVENTS, Config.KEYFRAME_INTERVAL,
+              inner_radius = Config.INNER_RADIUS,
+              sample_interval = Config.SAMPLE_INTERVAL,
+              should_sample_fields = Config.SHOULD_SAMPLE_FIELDS,
+              field_num_shells = Config.FIELD_NUM_SHELLS,
+              field_grid_size = Config.FIELD_GRID_SIZE,
+              field_regions = Config.FIELD_REGIONS,
+              field_species = Config.FIELD_SPECIES,
+              should_sample_pair_correlation = (
+                  Config.SHOULD_SAMPLE_PAIR_CORRELATION),
+              pair_correlation_cutoff = Config.PAIR_CORRELATION_CUTOFF,
+              pair_correlation_num_bins = Config.PAIR_CORRELATION_NUM_BINS,
+              should_sample_trajectories = Config.SHOULD_SAMPLE_TRAJECTORIES,
+              trajectory_chunk_size = Config.TRAJECTORY_CHUNK_SIZE,
+              telemetry_port = Config.TELEMETRY_PORT,
+              telemetry_socket_path = Config.TELEMETRY_SOCKET_PATH,
+              telemetry_interval = Config.TELEMETRY_INTERVAL,
+              should_control_run = Config.SHOULD_CONTROL_RUN,
+              equilibration_check_interval = (
+                  Config.EQUILIBRATION_CHECK_INTERVAL),
+              equilibration_ks_threshold = Config.EQUILIBRATION_KS_THRESHOLD,
+              equilibration_num_checks = Config.EQUILIBRATION_NUM_CHECKS,
+              pressure_block_size = Config.PRESSURE_BLOCK_SIZE,
+              pressure_min_blocks = Config.PRESSURE_MIN_BLOCKS,
+              pressure_tolerance = Config.PRESSURE_TOLERANCE,
+              state_cache_directory = (Config.STATE_CACHE_DIRECTORY
+                                       if Config.SHOULD_USE_STATE_CACHE
+                                       else None),
+              state_cache_max_bytes = Config.STATE_CACHE_MAX_SIZE * 1e6,
+              initial_state_parameters = {
+                  "container_radius": Config.CONTAINER_RADIUS,
+                  "num_balls": Config.NUMBER_OF_BALLS,
+                  "default_mass": Config.DEFAULT_MASS,
+                  "default_radius": Config.DEFAULT_BALL_RADIUS,
+                  "rms_speed": Config.RMS_SPEED,
+                  "inner_radius": Config.INNER_RADIUS,
+                  "seed": Config.RANDOM_SEED},
+              output_observables = Config.OUTPUT_OBSERVABLES,
+              output_ball_observables = Config.OUTPUT_BALL_OBSERVABLES,
+              should_collect_free_flights = Config.SHOULD_COLLECT_FREE_FLIGHTS,
+              free_flight_num_bins = Config.FREE_FLIGHT_NUM_BINS,
+              should_monitor_invariants = Config.SHOULD_MONITOR_INVARIANTS,
+              invariant_energy_interval = Config.INVARIANT_ENERGY_INTERVAL,
+              invariant_collision_interval = (
+                  Config.INVARIANT_COLLISION_INTERVAL),
+              invariant_overlap_interval = Config.INVARIANT_OVERLAP_INTERVAL,
+              invariant_tolerance = Config.INVARIANT_TOLERANCE,
+              should_fail_on_violation = Config.SHOULD_FAIL_ON_VIOLATION)
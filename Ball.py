@@ -1,6 +1,6 @@
+import math
 import pylab as pl
 import numpy as np
-from numpy import linalg as la
 
 class Ball():
     """Ball object representing each colliding entity in simulation.
@@ -25,11 +25,19 @@ class Ball():
         __radius (float): The radius of the ball.
         __ball_patch (patches.Cirlce): Circle patch to render ball position.
         __arrow_patch (patches.Arrow): Arrow patch to render ball velocity.
-        distance_travelled (float): Tracks total distance travelled by ball.
-        ball_collisions (int): Counts number of collisions with other balls.
+        __distance_travelled (np.array): Length 1 array of the total distance
+                                         travelled by the ball up to its last
+                                         collision with another ball.
+        __ball_collisions (np.array): Length 1 array counting the collisions
+                                      of the ball with other balls.
+        last_collision_time (float): The time of the last collision of the
+                                     ball with another ball (0 at first).
+        initial_position (np.array): The position of the ball at t = 0, used
+                                     to calculate its displacement.
         wall_collisions (int): Counts number of collisions with wall.
     """
     rms_speed = 1.0 # Used for scaling of velocity vector graphic
+    TOLERANCE = 1e-9 # Relative rounding error of positions
     
     def __init__(self, position, velocity, mass = 1.0, radius = 1.0):
         """Initialises ball object with position, velocity, mass and radius."""
@@ -37,16 +45,18 @@ class Ball():
             raise Exception("Unexpected position or velocity format in Ball"
                             "module.")
         
-        self.__position = np.array(position) # Private attribute
-        self.__velocity = np.array(velocity) # Private attribute
+        self.__position = np.array(position, dtype = float) # Private attribute
+        self.__velocity = np.array(velocity, dtype = float) # Private attribute
         self.__mass = mass # Private attribute
         self.__radius = radius # Private attribute
         self.__ball_patch = None
         self.__arrow_patch = None
 
         # Statistical variables, not relevant to functioning of simulation
-        self.distance_travelled = 0.0
-        self.ball_collisions = 0
+        self.__distance_travelled = np.zeros(1)
+        self.__ball_collisions = np.zeros(1, dtype = np.int64)
+        self.last_collision_time = 0.0
+        self.initial_position = np.array(self.__position)
         self.wall_collisions = 0
 
     def position(self):
@@ -100,6 +110,27 @@ class Ball():
         v = self.velocity()
         return np.dot(v, v)
 
+    def distance_travelled(self):
+        """Accessor method for the distance travelled by the ball.
+
+        Returns:
+            A float specifying the distance travelled up to the last collision
+            of the ball with another ball.
+        """
+        return float(self.__distance_travelled[0])
+
+    def ball_collisions(self):
+        """Accessor method for the number of collisions with other balls.
+
+        Returns:
+            An int counting the collisions of the ball with other balls.
+        """
+        return int(self.__ball_collisions[0])
+
+    def add_ball_collision(self):
+        """Counts a collision of the ball with another ball."""
+        self.__ball_collisions[0] += 1
+
     def mean_free_path(self):
         """Calculates the mean free path of the ball.
         
@@ -107,11 +138,22 @@ class Ball():
             A float specifying the distance travelled divided by the number of
             ball-ball collisions.
         """
-        if self.ball_collisions > 0:
-            return self.distance_travelled / self.ball_collisions
+        if self.ball_collisions() > 0:
+            return self.distance_travelled() / self.ball_collisions()
         else:
             return 0.0
 
+    def displacement(self):
+        """Calculates the displacement of the ball since t = 0.
+
+        The container has no periodic boundaries, so the displacement never
+        needs unwrapping and is simply the change in position.
+
+        Returns:
+            An np.array of the displacement of the ball.
+        """
+        return self.position() - self.initial_position
+
     def momentum(self):
         """Calculates the momentum of the ball.
         
@@ -120,25 +162,99 @@ class Ball():
         """
         return self.velocity() * self.mass()
 
+    def position_after(self, dt):
+        """Extrapolates the position of the ball after elapsed time dt.
+
+        The ball itself is not moved, so this can be used to draw the ball
+        between collisions.
+
+        Arguments:
+            dt (float): Elapsed time since last update.
+
+        Returns:
+            An np.array of the position of the ball after time dt.
+        """
+        return self.position() + self.velocity() * dt
+
     def update_position(self, dt):
         """Updates position of the ball after elapsed time dt.
+
+        App moves every ball at once with its position array instead.
         
         Arguments:
             dt (float): Elapsed time since last update.
         """
-        dp = self.velocity() * dt # Displacement of ball after time dt
-        self.__position += dp
+        self.__position += self.velocity() * dt
+
+    def end_free_flight(self, time):
+        """Ends the free flight of the ball at a collision with another ball.
 
-        # Increment the distance travelled by the magnitude of dp
-        self.distance_travelled += la.norm(dp)
+        Must be called before the velocity is updated. The distance
+        travelled is only updated here rather than at every event, since
+        collisions with the wall do not change the speed of the ball.
+
+        Arguments:
+            time (float): The time of the collision.
+
+        Returns:
+            A list [time, path length] of the free flight since the last
+            collision of the ball.
+        """
+        flight_time = time - self.last_collision_time
+        path_length = flight_time * math.sqrt(self.speed_squared())
+        self.__distance_travelled[0] += path_length
+        self.last_collision_time = time
+        return [flight_time, path_length]
 
     def update_velocity(self, v):
         """Updates velocity of the ball.
 
+        The velocity is updated in place so that arrays bound with bind() stay
+        in sync with the ball.
+
         Arguments:
             v (np.array): New velocity of the ball.
         """
-        self.__velocity = v
+        self.__velocity[:] = v
+
+    def bind(self, position, velocity):
+        """Stores the position and velocity of the ball in external arrays.
+
+        The current position and velocity are copied into `position` and
+        `velocity`, which are then used as the ball's own state. This lets App
+        keep the state of every ball in a single array (e.g. one row each).
+
+        Arguments:
+            position (np.array): A length 2 array to hold the position.
+            velocity (np.array): A length 2 array to hold the velocity.
+        """
+        position[:] = self.__position
+        velocity[:] = self.__velocity
+        self.__position = position
+        self.__velocity = velocity
+
+    def bind_statistics(self, distance_travelled, ball_collisions,
+                        initial_position):
+        """Stores the statistics of the ball in external arrays.
+
+        As with bind(), the current values are copied into the arrays, which
+        are then used as the ball's own statistics, so App can measure every
+        ball at once.
+
+        Arguments:
+            distance_travelled (np.array): A length 1 array to hold the
+                                           distance travelled.
+            ball_collisions (np.array): A length 1 integer array to hold the
+                                        number of ball collisions.
+            initial_position (np.array): A length 2 array to hold the
+                                         position at t = 0.
+        """
+        distance_travelled[:] = self.__distance_travelled
+        ball_collisions[:] = self.__ball_collisions
+        initial_position[:] = self.initial_position
+        self.__distance_travelled = distance_travelled
+        self.__ball_collisions = ball_collisions
+        self.initial_position = initial_position
 
     def next_wall_collision(self, container_radius):
         """Calculates the time at which the ball will next collide with a wall.
@@ -152,11 +268,12 @@ class Ball():
         x = self.position()
         v = self.velocity()
 
+        distance = container_radius - self.radius()
         a = np.dot(v, v)
         b = 2 * np.dot(x, v)
-        c = np.dot(x, x) - (container_radius - self.radius()) ** 2
+        c = np.dot(x, x) - distance ** 2
 
-        t = Ball.predict_collision_time(a, b, c)
+        t = Ball.wall_collision_time(a, b, c, distance)
         return t
 
     def next_ball_collision(self, ball):
@@ -185,39 +302,115 @@ class Ball():
         b = 2 * np.dot(dx, dv)
         c = np.dot(dx, dx) - (r1 + r2) ** 2
 
-        t = Ball.predict_collision_time(a, b, c)
+        t = Ball.ball_collision_time(a, b, c, r1 + r2)
         return t
 
+    @classmethod
+    def ball_collision_time(cls, a, b, c, contact):
+        """Calculates the time at which two balls will collide.
+
+        The quadratic is the one solved by predict_collision_time, where dx
+        and dv are the differences in position and velocity of the balls.
+
+        Balls only collide if they are approaching, i.e. dx . dv is negative
+        by more than the rounding error of positions of size `contact`. So
+        balls which have just collided, and are touching, are never predicted
+        to collide again at once. Approaching balls which already touch or
+        overlap (from rounding errors) collide immediately rather than being
+        missed.
+
+        Arguments:
+            a (float): dv . dv
+            b (float): 2 dx . dv
+            c (float): dx . dx - contact^2
+            contact (float): The sum of the radii of the balls.
+
+        Returns:
+            The time (float) of the collision, or np.inf if the balls do not
+            collide.
+        """
+        if a == 0.0 or b >= -2 * Ball.TOLERANCE * contact * math.sqrt(a):
+            return np.inf
+        if c <= 0.0:
+            return 0.0
+        return Ball.predict_collision_time(a, b, c)
+
+    @classmethod
+    def wall_collision_time(cls, a, b, c, distance):
+        """Calculates the time at which a ball will collide with the wall.
+
+        The centre of the ball collides with the wall when it reaches the
+        circle of radius `distance` (container radius minus ball radius). A
+        ball inside the circle reaches it at the larger root of the
+        quadratic. The smaller root is ignored even if it is positive (from
+        rounding errors placing a ball which has just rebounded slightly
+        outside the circle), so a ball never collides with the wall twice at
+        once. A ball on or outside the circle which is moving outwards
+        collides immediately.
+
+        Arguments:
+            a (float): v . v
+            b (float): 2 x . v
+            c (float): x . x - distance^2
+            distance (float): The distance of the centre of the ball from the
+                              centre of the container at collision.
+
+        Returns:
+            The time (float) of the collision, or np.inf if the ball is not
+            moving.
+        """
+        if a == 0.0:
+            return np.inf
+        if c >= 0.0 and b > 0.0:
+            return 0.0
+
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0.0:
+            return np.inf # Outside the circle and missing it (rounding)
+
+        # The larger root, written to avoid cancellation between b and the
+        # square root of the discriminant
+        if b > 0.0:
+            t = -2 * c / (b + math.sqrt(discriminant))
+        else:
+            t = (math.sqrt(discriminant) - b) / (2 * a)
+        return max(t, 0.0)
+
     @classmethod
     def predict_collision_time(cls, a, b, c):
         """Calculates time when the ball will collide by solving quadratic.
 
         Responsible for:
         - Solving quadratic of the form at^2 + bt + c = 0
-        - Returns the smallest positive time of collision if one exists
+        - Returns the smallest non-negative time of collision if one exists
         - If no collision (no roots) returns np.inf as time of collision
 
+        The roots are calculated with the closed form rather than a general
+        polynomial solver, choosing the form of each root which avoids
+        cancellation, so grazing collisions (b^2 close to 4ac) and collisions
+        very close to t = 0 are found accurately.
+
         Arguments:
             a (float): The coefficient of t^2 in quadratic.
             b (float): The coefficient of t in quadratic.
             c (float): The constant term in quadratic.
 
         Returns:
-            The smallest, positive time of next collision (float) or np.inf
-            if no collision is expected (i.e. quadatic has no solutions).
+            The smallest, non-negative time of next collision (float) or
+            np.inf if no collision is expected (i.e. quadatic has no
+            solutions).
         """
+        discriminant = b * b - 4 * a * c
+        if a == 0.0 or discriminant < 0.0:
+            return np.inf
 
-        # Variable `roots` holds all possible roots of polynomial equation of
-        # the form at^2 + bt + c = 0, including complex and negative roots. We
-        # extract the real and positive roots in `time_roots`. We neglect
-        # values of t < 1e-12 as these are likely equivalent to t = 0 with
-        # floating point arithmetic errors.
-        roots = np.roots([a, b, c])
-        time_roots = [t for t in roots if np.isreal(t) and t > 1e-12]
+        q = -0.5 * (b + math.copysign(math.sqrt(discriminant), b))
+        roots = [q / a, c / q if q != 0.0 else np.inf]
+        time_roots = [t for t in roots if t >= 0.0]
 
         # Sets `collision_time` to np.inf if no collision occurs or to the
-        # smallest, positive root in `time_roots` if there is a collision time.
-        time = np.inf if len(time_roots) == 0 else np.amin(time_roots)
+        # smallest, non-negative root in `time_roots` otherwise.
+        time = np.inf if len(time_roots) == 0 else min(time_roots)
         return time
 
     def velocity_after_wall_collision(self):
@@ -265,22 +458,26 @@ class Ball():
 
         return [v1, v2]
     
-    def render(self, ax):
+    def render(self, ax, dt = 0.0):
         """Draws the ball and its velocity vector to screen.
 
         Arguments:
             ax (axes.Axes): Axes object to draw the ball on.
+            dt (float = 0.0): Elapsed time since last update at which to draw
+                              the ball.
         """
-        self.draw_ball(ax)
-        self.draw_arrow(ax)
+        self.draw_ball(ax, dt)
+        self.draw_arrow(ax, dt)
     
-    def draw_ball(self, ax):
+    def draw_ball(self, ax, dt = 0.0):
         """Draws the ball outline to screen.
 
         Arguments:
             ax (axes.Axes): Axes object to draw the ball on.
+            dt (float = 0.0): Elapsed time since last update at which to draw
+                              the ball.
         """
-        r = self.position()
+        r = self.position_after(dt)
         
         # If the ball is already drawn on screen, just update its position
         if self.__ball_patch:
@@ -290,11 +487,13 @@ class Ball():
             ball_patch = pl.Circle(r, self.radius(), ec = "r", fill = False)
             self.__ball_patch = ax.add_patch(ball_patch)
     
-    def draw_arrow(self, ax):
+    def draw_arrow(self, ax, dt = 0.0):
         """Draws the velocity vector to screen.
 
         Arguments:
             ax (axes.Axes): Axes object to draw the velocity vector on.
+            dt (float = 0.0): Elapsed time since last update at which to draw
+                              the velocity vector.
         """
         
         # If a velocity vector already exists on screen, remove it
@@ -302,7 +501,7 @@ class Ball():
             self.__arrow_patch.remove()
         
         # Draw the velocity vector
-        r = self.position()
+        r = self.position_after(dt)
         u = self.velocity() / Ball.rms_speed
         arrow_patch = pl.Arrow(r[0], r[1], u[0], u[1], width = 0.2, ec = "b")
         self.__arrow_patch = ax.add_patch(arrow_patch)
@@ -13,6 +13,16 @@ Attributes:
     NUM_FRAMES_TO_RENDER (int = 1000): Defines how many frames
                                        (i.e. collisions) the simulation should
                                        render.
+    ANIMATION_MODE (str = "collision"): Defines when animation frames are
+                                        drawn. "collision" draws a frame after
+                                        every collision, "time" draws a frame
+                                        every ANIMATION_TIME_STEP of simulated
+                                        time and "fps" draws ANIMATION_FPS
+                                        frames per second of real time.
+    ANIMATION_TIME_STEP (float = 0.1): Simulated time in seconds between
+                                       frames in "time" mode.
+    ANIMATION_FPS (float = 30.0): Frames per second of real time in "fps"
+                                  mode.
     
     DEFAULT_BALL_RADIUS (float = 1.0): The default radius of
                                        procedurally-generated balls.
@@ -23,11 +33,152 @@ Attributes:
     NUMBER_OF_BALLS (int = 8): The number of procedurally-generated balls to
                                create in InitialState.py.
     RMS_SPEED (float = 1.0): Root mean square speed of the balls in container.
+    INNER_RADIUS (float = None): Radius of an inner circle. If set, balls are
+                                 only generated inside it and the inner
+                                 concentration counts balls inside it (i.e.
+                                 for diffusion experiments). None uses the
+                                 whole container.
+    RANDOM_SEED (int = None): Seed used to generate the initial state, so the
+                              same state is generated every time. None gives
+                              a different state each time.
+    SHOULD_USE_STATE_CACHE (bool = False): Flag to indicate if App.py should
+                                           generate the initial state from
+                                           the parameters above (instead of
+                                           reading INITIAL_STATE_FILE_NAME)
+                                           and store it in a cache, so the
+                                           same parameters and RANDOM_SEED
+                                           load instantly next time.
+    STATE_CACHE_DIRECTORY (str = '.state_cache'): The directory of the cache.
+    STATE_CACHE_MAX_SIZE (float = 1000): The maximum size of the cache in
+                                         megabytes. The least recently used
+                                         states are deleted above this.
+    PARALLEL_NUM_WORKERS (int = 4): The number of worker processes used by
+                                    ParallelEngine.py (usually the number of
+                                    cores).
+    PARALLEL_END_TIME (float = 10.0): The time ParallelEngine.py simulates
+                                      until.
+    PARALLEL_BENCHMARK_WORKERS (list = None): If given, ParallelEngine.py
+                                              times the run with each of
+                                              these numbers of workers (e.g.
+                                              [1, 2, 4]) instead of saving
+                                              the final state.
+    REPLICA_COUNT (int = 1000): The number of independent replicas of the
+                                system simulated by ReplicaEngine.py.
+    REPLICA_NUM_EVENTS (int = 1000): The number of collisions
+                                     ReplicaEngine.py executes in each
+                                     replica.
 
     SHOULD_OUTPUT (bool = True): Flag to indicate if simulation data should be
                                  written to a file.
+    OUTPUT_OBSERVABLES (list = ["rms_speed"]): Names of the observables of the
+        whole system written after every collision. Any of "kinetic_energy",
+        "rms_speed", "pressure", "inner_concentration", "momentum" and
+        "mean_free_path" (see WriteOutput.OBSERVABLES).
+    OUTPUT_BALL_OBSERVABLES (list = ["speed"]): Names of the observables of
+        every ball written at the start and end of the simulation. Any of
+        "speed", "kinetic_energy", "mean_free_path", "momentum", "position"
+        and "displacement" (see WriteOutput.BALL_OBSERVABLES).
     SHOULD_ANIMATE (bool = True): Flag to indicate if the animation should be
                                   shown.
+    SHOULD_RECORD_EVENTS (bool = False): Flag to indicate if every collision
+                                         should be recorded to a binary event
+                                         log (e.g. `1542627068.events`) from
+                                         which trajectories can be replayed.
+    KEYFRAME_INTERVAL (int = 10000): Number of recorded events between
+                                     keyframes of the full state, which let
+                                     a replay start near any time rather than
+                                     at t = 0. None disables keyframes.
+
+    SAMPLE_INTERVAL (float = 1.0): Simulated time in seconds between samples
+                                   of the state of the system.
+    SHOULD_SAMPLE_FIELDS (bool = False): Flag to indicate if density and
+                                         temperature fields should be sampled
+                                         and saved (e.g.
+                                         `1542627068_fields.npz`).
+    FIELD_NUM_SHELLS (int = 10): The number of radial shells in the fields.
+    FIELD_GRID_SIZE (int = 20): The number of grid cells along each axis.
+    FIELD_REGIONS (dict = {}): Maps region names to (r_min, r_max) of an
+                               annulus in which balls are counted.
+    FIELD_SPECIES (dict = {}): Maps species names to (r_min, r_max) of an
+                               annulus. Balls which start in the annulus
+                               belong to the species.
+    SHOULD_SAMPLE_PAIR_CORRELATION (bool = False): Flag to indicate if the
+                                                   radial distribution
+                                                   function g(r) should be
+                                                   averaged over samples and
+                                                   saved (e.g.
+                                                   `1542627068_gr.csv`).
+    PAIR_CORRELATION_CUTOFF (float = 5.0): The maximum distance r of g(r).
+    PAIR_CORRELATION_NUM_BINS (int = 50): The number of bins of g(r).
+    SHOULD_SAMPLE_TRAJECTORIES (bool = False): Flag to indicate if the
+                                               displacement and velocity of
+                                               every ball should be saved at
+                                               each sample for analysis by
+                                               Transport.py.
+    TRAJECTORY_CHUNK_SIZE (int = 1000): The number of samples in each
+                                        trajectory file.
+    SHOULD_COLLECT_FREE_FLIGHTS (bool = False): Flag to indicate if the
+                                                distributions of free-flight
+                                                times and path lengths
+                                                between ball collisions
+                                                should be saved (e.g.
+                                                `1542627068_free_flights.csv`).
+    FREE_FLIGHT_NUM_BINS (int = 100): The number of bins of each free-flight
+                                      histogram (must be even).
+    SHOULD_MONITOR_INVARIANTS (bool = False): Flag to indicate if energy,
+                                              momentum and angular momentum
+                                              conservation and overlaps
+                                              should be checked during the
+                                              run.
+    INVARIANT_ENERGY_INTERVAL (int = 100): The number of events between
+                                           checks of the total energy.
+    INVARIANT_COLLISION_INTERVAL (int = 1): The number of events between
+                                            checks of the momentum and
+                                            angular momentum of a collision.
+    INVARIANT_OVERLAP_INTERVAL (int = 10000): The number of events between
+                                              scans of every ball for
+                                              overlaps. None never scans.
+    INVARIANT_TOLERANCE (float = 1e-8): The largest relative error allowed
+                                        in a conserved quantity.
+    SHOULD_FAIL_ON_VIOLATION (bool = False): Flag to indicate if a violation
+                                             should stop the simulation with
+                                             an exception, rather than being
+                                             printed and counted.
+    TELEMETRY_PORT (int = None): Local TCP port on which the progress of the
+                                 run is published as JSON over HTTP (e.g.
+                                 `curl http://127.0.0.1:8000/`). None disables
+                                 telemetry.
+    TELEMETRY_SOCKET_PATH (str = None): Unix socket to publish telemetry on
+                                        instead of a TCP port.
+    TELEMETRY_INTERVAL (int = 1000): The number of events between telemetry
+                                     snapshots.
+    SHOULD_CONTROL_RUN (bool = False): Flag to indicate if equilibration
+                                       should be detected and the run stopped
+                                       once the pressure is precise enough.
+                                       NUM_FRAMES_TO_RENDER is then the
+                                       maximum number of collisions.
+    EQUILIBRATION_CHECK_INTERVAL (int = 100): The number of events between
+                                              checks of the kinetic energy
+                                              distribution.
+    EQUILIBRATION_KS_THRESHOLD (float = 1.0): The scaled KS distance from
+                                              Maxwell-Boltzmann below which a
+                                              check passes (see RunController;
+                                              1.094 is the 5% critical value).
+    EQUILIBRATION_NUM_CHECKS (int = 3): The number of checks in a row which
+                                        must pass.
+    PRESSURE_BLOCK_SIZE (int = 1000): The number of events in each block
+                                      used to estimate the error of the
+                                      pressure.
+    PRESSURE_MIN_BLOCKS (int = 10): The minimum number of blocks before the
+                                    run can stop.
+    PRESSURE_TOLERANCE (float = None): The relative standard error of the
+                                       pressure at which the run stops (e.g.
+                                       0.01). None never stops early.
+    SHOULD_USE_RENDER_PROCESS (bool = False): Flag to indicate if the
+                                              animation should be drawn by a
+                                              separate process, so that the
+                                              simulation does not wait on
+                                              drawing.
 """
 
 # Required
@@ -36,6 +187,9 @@ CONTAINER_RADIUS = 10 # Meters
 # Required for App.py to run
 ANIMATION_FRAME_PAUSE = 0.001 # Pause time in seconds
 NUM_FRAMES_TO_RENDER = 1000
+ANIMATION_MODE = "collision" # "collision", "time" or "fps"
+ANIMATION_TIME_STEP = 0.1 # Seconds of simulated time
+ANIMATION_FPS = 30.0 # Frames / Second
 
 # Required for InitialState.py to run
 DEFAULT_BALL_RADIUS = 1.0 # Meters
@@ -43,9 +197,71 @@ DEFAULT_MASS = 1.0 # Kilograms
 INITIAL_STATE_FILE_NAME = "InitialState.csv" # DO NOT CHANGE
 NUMBER_OF_BALLS = 15
 RMS_SPEED = 5.0 # Meters / Second
+INNER_RADIUS = None # Meters
+RANDOM_SEED = None # e.g. 42
+SHOULD_USE_STATE_CACHE = False
+STATE_CACHE_DIRECTORY = ".state_cache"
+STATE_CACHE_MAX_SIZE = 1000 # Megabytes
+
+# Required for ParallelEngine.py to run
+PARALLEL_NUM_WORKERS = 4
+PARALLEL_END_TIME = 10.0 # Seconds
+PARALLEL_BENCHMARK_WORKERS = None # e.g. [1, 2, 4]
+
+# Required for ReplicaEngine.py to run
+REPLICA_COUNT = 1000
+REPLICA_NUM_EVENTS = 1000 # Collisions per replica
 
 SHOULD_OUTPUT = False
+OUTPUT_OBSERVABLES = ["rms_speed"] # e.g. ["kinetic_energy", "pressure"]
+OUTPUT_BALL_OBSERVABLES = ["speed"] # e.g. ["speed", "momentum"]
 SHOULD_ANIMATE = True
+SHOULD_RECORD_EVENTS = False
+KEYFRAME_INTERVAL = 10000 # Events
+
+# Required for sampling of fields
+SAMPLE_INTERVAL = 1.0 # Seconds
+SHOULD_SAMPLE_FIELDS = False
+FIELD_NUM_SHELLS = 10
+FIELD_GRID_SIZE = 20
+FIELD_REGIONS = {} # e.g. {"inner": (0.0, 5.0), "outer": (5.0, 10.0)}
+FIELD_SPECIES = {} # e.g. {"tracer": (0.0, 5.0)}
+
+# Required for sampling of g(r)
+SHOULD_SAMPLE_PAIR_CORRELATION = False
+PAIR_CORRELATION_CUTOFF = 5.0 # Meters
+PAIR_CORRELATION_NUM_BINS = 50
+
+# Required for sampling of trajectories
+SHOULD_SAMPLE_TRAJECTORIES = False
+TRAJECTORY_CHUNK_SIZE = 1000 # Samples
+
+# Required for free-flight distributions
+SHOULD_COLLECT_FREE_FLIGHTS = False
+FREE_FLIGHT_NUM_BINS = 100
+
+# Required for checks of conservation laws
+SHOULD_MONITOR_INVARIANTS = False
+INVARIANT_ENERGY_INTERVAL = 100 # Events
+INVARIANT_COLLISION_INTERVAL = 1 # Events
+INVARIANT_OVERLAP_INTERVAL = 10000 # Events
+INVARIANT_TOLERANCE = 1e-8
+SHOULD_FAIL_ON_VIOLATION = False
+
+# Required for live telemetry
+TELEMETRY_PORT = None # e.g. 8000
+TELEMETRY_SOCKET_PATH = None # e.g. "/tmp/hardspheres.sock"
+TELEMETRY_INTERVAL = 1000 # Events
+
+# Required for equilibration detection and early stopping
+SHOULD_CONTROL_RUN = False
+EQUILIBRATION_CHECK_INTERVAL = 100 # Events
+EQUILIBRATION_KS_THRESHOLD = 1.0
+EQUILIBRATION_NUM_CHECKS = 3
+PRESSURE_BLOCK_SIZE = 1000 # Events
+PRESSURE_MIN_BLOCKS = 10
+PRESSURE_TOLERANCE = None # e.g. 0.01
+SHOULD_USE_RENDER_PROCESS = False
 
 
 """Error validation
@@ -64,6 +280,15 @@ if (not np.isfinite(NUM_FRAMES_TO_RENDER) or NUM_FRAMES_TO_RENDER <= 0 or
     np.mod(NUM_FRAMES_TO_RENDER, 1)) != 0:
     raise Exception("Invalid NUM_FRAMES_TO_RENDER parameter in Config module.")
 
+if ANIMATION_MODE not in ["collision", "time", "fps"]:
+    raise Exception("Invalid ANIMATION_MODE parameter in Config module.")
+
+if not np.isfinite(ANIMATION_TIME_STEP) or ANIMATION_TIME_STEP <= 0:
+    raise Exception("Invalid ANIMATION_TIME_STEP parameter in Config module.")
+
+if not np.isfinite(ANIMATION_FPS) or ANIMATION_FPS <= 0:
+    raise Exception("Invalid ANIMATION_FPS parameter in Config module.")
+
 if (not np.isfinite(DEFAULT_BALL_RADIUS) or DEFAULT_BALL_RADIUS <= 0 or
     DEFAULT_BALL_RADIUS >= CONTAINER_RADIUS):
     print("Invalid DEFAULT_BALL_RADIUS parameter in Config module.")
@@ -75,5 +300,104 @@ if (not np.isfinite(NUMBER_OF_BALLS) or NUMBER_OF_BALLS <= 0
    or np.mod(NUMBER_OF_BALLS, 1)) != 0:
     raise Exception("Invalid NUMBER_OF_BALLS parameter in Config module.")
 
+if KEYFRAME_INTERVAL is not None and (KEYFRAME_INTERVAL <= 0 or
+   np.mod(KEYFRAME_INTERVAL, 1) != 0):
+    raise Exception("Invalid KEYFRAME_INTERVAL parameter in Config module.")
+
 if not np.isfinite(RMS_SPEED) or RMS_SPEED <= 0:
-    raise Exception("Invalid RMS_SPEED parameter in Config module.")
\ No newline at end of file
+    raise Exception("Invalid RMS_SPEED parameter in Config module.")
+
+if INNER_RADIUS is not None and (not np.isfinite(INNER_RADIUS) or
+   INNER_RADIUS <= 0 or INNER_RADIUS > CONTAINER_RADIUS):
+    raise Exception("Invalid INNER_RADIUS parameter in Config module.")
+
+if len(set(OUTPUT_OBSERVABLES)) != len(OUTPUT_OBSERVABLES):
+    raise Exception("Invalid OUTPUT_OBSERVABLES parameter in Config module.")
+
+if len(set(OUTPUT_BALL_OBSERVABLES)) != len(OUTPUT_BALL_OBSERVABLES):
+    raise Exception("Invalid OUTPUT_BALL_OBSERVABLES parameter in Config"
+                    " module.")
+
+if not np.isfinite(SAMPLE_INTERVAL) or SAMPLE_INTERVAL <= 0:
+    raise Exception("Invalid SAMPLE_INTERVAL parameter in Config module.")
+
+if FIELD_NUM_SHELLS <= 0 or np.mod(FIELD_NUM_SHELLS, 1) != 0:
+    raise Exception("Invalid FIELD_NUM_SHELLS parameter in Config module.")
+
+if FIELD_GRID_SIZE <= 0 or np.mod(FIELD_GRID_SIZE, 1) != 0:
+    raise Exception("Invalid FIELD_GRID_SIZE parameter in Config module.")
+
+for bounds in list(FIELD_REGIONS.values()) + list(FIELD_SPECIES.values()):
+    if len(bounds) != 2 or bounds[0] < 0 or bounds[1] < bounds[0]:
+        raise Exception("Invalid FIELD_REGIONS or FIELD_SPECIES parameter in"
+                        " Config module.")
+
+if not np.isfinite(PAIR_CORRELATION_CUTOFF) or PAIR_CORRELATION_CUTOFF <= 0:
+    raise Exception("Invalid PAIR_CORRELATION_CUTOFF parameter in Config"
+                    " module.")
+
+if PAIR_CORRELATION_NUM_BINS <= 0 or np.mod(PAIR_CORRELATION_NUM_BINS, 1) != 0:
+    raise Exception("Invalid PAIR_CORRELATION_NUM_BINS parameter in Config"
+                    " module.")
+
+if TRAJECTORY_CHUNK_SIZE <= 0 or np.mod(TRAJECTORY_CHUNK_SIZE, 1) != 0:
+    raise Exception("Invalid TRAJECTORY_CHUNK_SIZE parameter in Config module.")
+
+if FREE_FLIGHT_NUM_BINS <= 0 or np.mod(FREE_FLIGHT_NUM_BINS, 2) != 0:
+    raise Exception("Invalid FREE_FLIGHT_NUM_BINS parameter in Config module.")
+
+for interval in [INVARIANT_ENERGY_INTERVAL, INVARIANT_COLLISION_INTERVAL,
+                 INVARIANT_OVERLAP_INTERVAL]:
+    if interval is not None and (interval <= 0 or np.mod(interval, 1) != 0):
+        raise Exception("Invalid INVARIANT interval parameter in Config"
+                        " module.")
+
+if not np.isfinite(INVARIANT_TOLERANCE) or INVARIANT_TOLERANCE <= 0:
+    raise Exception("Invalid INVARIANT_TOLERANCE parameter in Config module.")
+
+if TELEMETRY_PORT is not None and (np.mod(TELEMETRY_PORT, 1) != 0 or
+                                   not 0 <= TELEMETRY_PORT <= 65535):
+    raise Exception("Invalid TELEMETRY_PORT parameter in Config module.")
+
+if TELEMETRY_INTERVAL <= 0 or np.mod(TELEMETRY_INTERVAL, 1) != 0:
+    raise Exception("Invalid TELEMETRY_INTERVAL parameter in Config module.")
+
+for interval in [EQUILIBRATION_CHECK_INTERVAL, EQUILIBRATION_NUM_CHECKS,
+                 PRESSURE_BLOCK_SIZE]:
+    if interval <= 0 or np.mod(interval, 1) != 0:
+        raise Exception("Invalid EQUILIBRATION or PRESSURE_BLOCK_SIZE"
+                        " parameter in Config module.")
+
+if PRESSURE_MIN_BLOCKS < 2 or np.mod(PRESSURE_MIN_BLOCKS, 1) != 0:
+    raise Exception("Invalid PRESSURE_MIN_BLOCKS parameter in Config module.")
+
+if not EQUILIBRATION_KS_THRESHOLD > 0:
+    raise Exception("Invalid EQUILIBRATION_KS_THRESHOLD parameter in Config"
+                    " module.")
+
+if PRESSURE_TOLERANCE is not None and not PRESSURE_TOLERANCE > 0:
+    raise Exception("Invalid PRESSURE_TOLERANCE parameter in Config module.")
+
+if RANDOM_SEED is not None and (np.mod(RANDOM_SEED, 1) != 0 or
+                                not 0 <= RANDOM_SEED < 2 ** 32):
+    raise Exception("Invalid RANDOM_SEED parameter in Config module.")
+
+if not np.isfinite(STATE_CACHE_MAX_SIZE) or STATE_CACHE_MAX_SIZE <= 0:
+    raise Exception("Invalid STATE_CACHE_MAX_SIZE parameter in Config module.")
+
+if PARALLEL_NUM_WORKERS <= 0 or np.mod(PARALLEL_NUM_WORKERS, 1) != 0:
+    raise Exception("Invalid PARALLEL_NUM_WORKERS parameter in Config module.")
+
+if not np.isfinite(PARALLEL_END_TIME) or PARALLEL_END_TIME <= 0:
+    raise Exception("Invalid PARALLEL_END_TIME parameter in Config module.")
+
+for num_workers in PARALLEL_BENCHMARK_WORKERS or []:
+    if num_workers <= 0 or np.mod(num_workers, 1) != 0:
+        raise Exception("Invalid PARALLEL_BENCHMARK_WORKERS parameter in"
+                        " Config module.")
+
+if REPLICA_COUNT <= 0 or np.mod(REPLICA_COUNT, 1) != 0:
+    raise Exception("Invalid REPLICA_COUNT parameter in Config module.")
+
+if REPLICA_NUM_EVENTS < 0 or np.mod(REPLICA_NUM_EVENTS, 1) != 0:
+    raise Exception("Invalid REPLICA_NUM_EVENTS parameter in Config module.")
\ No newline at end of file
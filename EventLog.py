@@ -0,0 +1,364 @@
+import numpy as np
+import os
+
+# Binary layout of an event log file (e.g. `1542627068.events`):
+# 1) HEADER: identifies the file and gives the number of balls
+# 2) An (N, 6) float64 table of the initial state of every ball as
+#    [x, y, vx, vy, mass, radius] (same columns as InitialState.csv)
+# 3) One EVENT record per collision, appended in the order they occur
+#
+# Optionally, a keyframe file (`1542627068.keyframes`) holds the full state
+# of the system every `keyframe_interval` events as keyframe_dtype(N)
+# records, and an index file (`1542627068.index`) holds the float64 time of
+# each keyframe. The index is small and sorted, so the keyframe before any
+# time is found by binary search without reading the keyframes themselves.
+HEADER = np.dtype([("magic", "S8"), ("num_balls", "<i8")])
+EVENT = np.dtype([("dt", "<f8"), # Time since previous event
+                  ("time", "<f8"), # Time of event
+                  ("ball_1", "<i4"), # Index of first colliding ball
+                  ("ball_2", "<i4"), # Index of second ball (-1 for wall)
+                  ("velocity_1", "<f8", (2,)), # New velocity of first ball
+                  ("velocity_2", "<f8", (2,))]) # New velocity of second ball
+MAGIC = b"HSEVENTS"
+
+def keyframe_dtype(num_balls):
+    """Returns the dtype of a keyframe record for `num_balls` balls."""
+    return np.dtype([("time", "<f8"), # Time of keyframe
+                     ("event", "<i8"), # Number of events before keyframe
+                     ("state", "<f8", (num_balls, 4))]) # [x, y, vx, vy]
+
+def keyframe_file_names(file_name):
+    """Returns the keyframe and index file names for an event log."""
+    stem = os.path.splitext(file_name)[0]
+    return ["{}.keyframes".format(stem), "{}.index".format(stem)]
+
+class EventLog():
+    """Append-only binary log of the collisions in a simulation.
+
+    Between collisions every ball moves ballistically, so the initial state
+    plus the time and new velocities of each collision is enough to recover
+    the complete trajectory of every ball (see EventReplay). This is far
+    smaller than saving the state of every ball at each collision.
+
+    Responsible for:
+    - Writing the initial state of the system
+    - Appending a fixed-size record for every collision
+    - Buffering records so that the file is written in large blocks
+    - Writing periodic keyframes of the full state for fast seeking
+
+    Arguments:
+        file_name (str): The name of the event log file.
+        positions (np.array): An (N, 2) array of ball positions. The log keeps
+                              a reference to read the state for keyframes.
+        velocities (np.array): An (N, 2) array of ball velocities. The log
+                               keeps a reference to read the state for
+                               keyframes.
+        masses (np.array): The mass of each ball.
+        radii (np.array): The radius of each ball.
+        keyframe_interval (int = None): Number of events between keyframes,
+                                        or None to write no keyframes.
+        buffer_size (int = 4096): Number of events to buffer before writing.
+
+    Attributes:
+        file_name (str): The name of the event log file.
+        keyframe_interval (int): Number of events between keyframes.
+        time (float): The time of the last recorded event.
+        num_events (int): The number of events recorded.
+        __positions (np.array): Reference to the ball positions.
+        __velocities (np.array): Reference to the ball velocities.
+        __file (file): The open event log file.
+        __keyframe_file (file): The open keyframe file (or None).
+        __index_file (file): The open keyframe index file (or None).
+        __keyframe (np.array): A single keyframe record used for writing.
+        __buffer (np.array): Events which have not yet been written to file.
+        __buffered (int): The number of events in `__buffer`.
+    """
+    def __init__(self, file_name, positions, velocities, masses, radii,
+                 keyframe_interval = None, buffer_size = 4096):
+        """Opens the event log file and writes the initial state."""
+        self.file_name = file_name
+        self.keyframe_interval = keyframe_interval
+        self.time = 0.0
+        self.num_events = 0
+        self.__positions = positions
+        self.__velocities = velocities
+        self.__buffer = np.zeros(buffer_size, dtype = EVENT)
+        self.__buffered = 0
+        self.__keyframe_file = None
+        self.__index_file = None
+
+        try:
+            self.__file = open(file_name, "wb")
+            if keyframe_interval:
+                keyframe_file_name, index_file_name = keyframe_file_names(
+                    file_name)
+                self.__keyframe_file = open(keyframe_file_name, "wb")
+                self.__index_file = open(index_file_name, "wb")
+        except IOError:
+            raise Exception("Event log file cannot be created in EventLog "
+                            "module.")
+
+        header = np.array([(MAGIC, len(positions))], dtype = HEADER)
+        state = np.column_stack([positions, velocities, masses, radii])
+        self.__file.write(header.tobytes())
+        self.__file.write(state.astype("<f8").tobytes())
+
+        if keyframe_interval:
+            self.__keyframe = np.zeros(1, dtype = keyframe_dtype(len(positions)))
+            self.write_keyframe() # Keyframe 0 holds the initial state
+
+    def record(self, dt, ball_ids, velocities):
+        """Appends a collision to the log.
+
+        Arguments:
+            dt (float): The time elapsed since the previous collision.
+            ball_ids (list): The indices of the colliding balls (1 index for
+                             a wall collision, 2 for a ball collision).
+            velocities (list): The new velocity (np.array) of each ball in
+                               `ball_ids`.
+        """
+        # Time is summed exactly as App.time so that replay is exact
+        self.time += dt
+        event = self.__buffer[self.__buffered]
+        event["dt"] = dt
+        event["time"] = self.time
+        event["ball_1"] = ball_ids[0]
+        event["velocity_1"] = velocities[0]
+        if len(ball_ids) == 2:
+            event["ball_2"] = ball_ids[1]
+            event["velocity_2"] = velocities[1]
+        else:
+            event["ball_2"] = -1
+            event["velocity_2"] = 0.0
+
+        self.__buffered += 1
+        self.num_events += 1
+        if self.__buffered == len(self.__buffer):
+            self.flush()
+
+        if (self.keyframe_interval and
+            self.num_events % self.keyframe_interval == 0):
+            self.write_keyframe()
+
+    def write_keyframe(self):
+        """Writes the current state of every ball as a keyframe.
+
+        Must be called after the positions and velocities have been updated
+        for the latest event, so the keyframe is the state just after it.
+
+        The buffered events are written first, and the keyframe before its
+        index entry, so the index never points at a keyframe or events which
+        are not yet on disk.
+        """
+        self.flush()
+        keyframe = self.__keyframe[0]
+        keyframe["time"] = self.time
+        keyframe["event"] = self.num_events
+        keyframe["state"][:, :2] = self.__positions
+        keyframe["state"][:, 2:] = self.__velocities
+        self.__keyframe_file.write(self.__keyframe.tobytes())
+        self.__keyframe_file.flush()
+        self.__index_file.write(np.array([self.time], dtype = "<f8").tobytes())
+        self.__index_file.flush()
+
+    def flush(self):
+        """Writes buffered events to file."""
+        self.__file.write(self.__buffer[:self.__buffered].tobytes())
+        self.__file.flush()
+        self.__buffered = 0
+
+    def close(self):
+        """Writes remaining events and closes the files."""
+        self.flush()
+        self.__file.close()
+        if self.__keyframe_file is not None:
+            self.__keyframe_file.close()
+            self.__index_file.close()
+
+class EventReplay():
+    """Reconstructs the state of a simulation from an EventLog file.
+
+    The events are memory-mapped rather than read into memory, so the log of
+    a long simulation can be replayed without loading it. Positions are
+    advanced by exactly the same floating-point operations as App.collide(),
+    so the replayed state at each collision is identical to the simulated one.
+
+    If keyframes were recorded, the state at time t is found by a binary
+    search of the keyframe index followed by a replay of at most
+    `keyframe_interval` events, rather than a replay from t = 0.
+
+    Arguments:
+        file_name (str): The name of the event log file.
+
+    Attributes:
+        file_name (str): The name of the event log file.
+        num_balls (int): The number of balls in the simulation.
+        initial_state (np.array): An (N, 6) array of the initial state as
+                                  [x, y, vx, vy, mass, radius].
+        events (np.memmap): The array of EVENT records in the file.
+        keyframes (np.memmap): The array of keyframe records (or None).
+        keyframe_times (np.memmap): The time of each keyframe (or None).
+    """
+    BLOCK_SIZE = 4096 # Number of event times searched at once
+
+    def __init__(self, file_name):
+        """Reads the initial state and maps the events of an event log."""
+        self.file_name = file_name
+
+        try:
+            header = np.fromfile(file_name, dtype = HEADER, count = 1)
+        except IOError:
+            raise Exception("Event log file not found in EventReplay module.")
+
+        if len(header) == 0 or header[0]["magic"] != MAGIC:
+            raise Exception("File is not an event log in EventReplay module.")
+
+        self.num_balls = int(header[0]["num_balls"])
+        self.initial_state = np.fromfile(file_name, dtype = "<f8",
+                                         count = 6 * self.num_balls,
+                                         offset = HEADER.itemsize)
+        self.initial_state = self.initial_state.reshape(self.num_balls, 6)
+
+        offset = HEADER.itemsize + self.initial_state.nbytes
+        self.events = EventReplay.map_records(file_name, EVENT, offset)
+
+        # Keyframes are optional. A keyframe is only used once its index
+        # entry exists, so a partly written keyframe file is harmless.
+        self.keyframes = None
+        self.keyframe_times = None
+        keyframe_file_name, index_file_name = keyframe_file_names(file_name)
+        if os.path.isfile(keyframe_file_name) and os.path.isfile(index_file_name):
+            self.keyframes = EventReplay.map_records(
+                keyframe_file_name, keyframe_dtype(self.num_balls), 0)
+            self.keyframe_times = EventReplay.map_records(index_file_name,
+                                                          np.dtype("<f8"), 0)
+            num_keyframes = min(len(self.keyframes), len(self.keyframe_times))
+            self.keyframes = self.keyframes[:num_keyframes]
+            self.keyframe_times = self.keyframe_times[:num_keyframes]
+
+    @classmethod
+    def map_records(cls, file_name, dtype, offset):
+        """Memory-maps the complete records of `dtype` in a file.
+
+        Arguments:
+            file_name (str): The name of the file.
+            dtype (np.dtype): The dtype of each record.
+            offset (int): The position in bytes of the first record.
+
+        Returns:
+            An np.memmap of the records (or an empty np.array if there are
+            no complete records).
+        """
+        num_records = (os.path.getsize(file_name) - offset) // dtype.itemsize
+        if num_records <= 0:
+            return np.zeros(0, dtype = dtype)
+        return np.memmap(file_name, dtype = dtype, mode = "r", offset = offset,
+                         shape = (num_records,))
+
+    def masses(self):
+        """Accessor method for the mass of each ball."""
+        return self.initial_state[:, 4]
+
+    def radii(self):
+        """Accessor method for the radius of each ball."""
+        return self.initial_state[:, 5]
+
+    def state_at(self, t):
+        """Reconstructs the positions and velocities of all balls at time t.
+
+        Arguments:
+            t (float): The time of the simulation.
+
+        Returns:
+            A list [positions, velocities] of (N, 2) np.arrays.
+        """
+        return next(self.states_at([t]))
+
+    def states_at(self, times):
+        """Reconstructs the state of all balls at each of `times`.
+
+        The log is replayed forwards, jumping to a later keyframe whenever one
+        lies between two requested times, so all times should be requested in
+        a single call.
+
+        Arguments:
+            times (list): Increasing times of the simulation.
+
+        Yields:
+            [positions, velocities] (list): (N, 2) np.arrays of the state of
+                                            the balls at each time.
+        """
+        positions = np.array(self.initial_state[:, 0:2])
+        velocities = np.array(self.initial_state[:, 2:4])
+        time = 0.0
+        index = 0
+
+        for t in times:
+            keyframe = self.keyframe_before(t)
+            if keyframe is not None and keyframe["event"] > index:
+                positions[:] = keyframe["state"][:, :2]
+                velocities[:] = keyframe["state"][:, 2:]
+                time = float(keyframe["time"])
+                index = int(keyframe["event"])
+
+            end = self.find_event(t, index)
+            if end > index:
+                time = self.replay(positions, velocities, index, end)
+                index = end
+
+            # Balls move ballistically from the last event to time t
+            yield [positions + velocities * (t - time), np.copy(velocities)]
+
+    def keyframe_before(self, t):
+        """Finds the last keyframe at or before time t by binary search.
+
+        Returns:
+            A keyframe record, or None if there are no keyframes.
+        """
+        if self.keyframe_times is None or len(self.keyframe_times) == 0:
+            return None
+        k = int(np.searchsorted(self.keyframe_times, t, side = "right")) - 1
+        return self.keyframes[max(k, 0)]
+
+    def find_event(self, t, index):
+        """Finds the first event after time t, searching forward from `index`.
+
+        Event times are searched in blocks so that only the part of the file
+        which is about to be replayed is read.
+
+        Arguments:
+            t (float): The time of the simulation.
+            index (int): The index of the first event to search.
+
+        Returns:
+            The index (int) of the first event after time t.
+        """
+        times = self.events["time"]
+        while index < len(times):
+            block = times[index:index + EventReplay.BLOCK_SIZE]
+            end = int(np.searchsorted(block, t, side = "right"))
+            if end < len(block):
+                return index + end
+            index += len(block)
+        return len(times)
+
+    def replay(self, positions, velocities, start, end):
+        """Applies events start to end - 1 to a state in place.
+
+        Arguments:
+            positions (np.array): The (N, 2) positions before event `start`.
+            velocities (np.array): The (N, 2) velocities before event `start`.
+            start (int): The index of the first event to apply.
+            end (int): The index after the last event to apply.
+
+        Returns:
+            The time (float) of the last event applied.
+        """
+        time = 0.0
+        for event in self.events[start:end]:
+            positions += velocities * event["dt"]
+            velocities[event["ball_1"]] = event["velocity_1"]
+            if event["ball_2"] >= 0:
+                velocities[event["ball_2"]] = event["velocity_2"]
+            time = event["time"]
+        return float(time)
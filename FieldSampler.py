@@ -0,0 +1,177 @@
+import numpy as np
+
+class FieldSampler():
+    """Samples density and temperature fields of the system at sample times.
+
+    All measurements are made by binning arrays of every ball at once, so no
+    loop over balls is needed. Fields are measured for every named species:
+
+    - Radial shells: density and temperature in equal-width shells from the
+      centre to the container wall
+    - Grid: density and temperature in a square grid covering the container
+    - Regions: the number of balls of each species in each named annulus
+
+    Temperatures are the mean kinetic energy per ball (with k_B = 1, in two
+    dimensions kT = <KE>). Densities are the number of ball centres per unit
+    area.
+
+    Responsible for:
+    - Classifying balls into species from the initial state
+    - Binning the state of the balls at each sample time
+    - Saving the sampled fields to a `.npz` file
+
+    Arguments:
+        App (App): App object containing the state of the simulation.
+        num_shells (int): The number of radial shells.
+        grid_size (int): The number of grid cells along each axis.
+        regions (dict): Maps a region name to (r_min, r_max) of an annulus.
+        species (dict): Maps a species name to (r_min, r_max) of an annulus.
+                        Balls which start inside the annulus belong to the
+                        species. The species "all" always contains every ball,
+                        so it cannot be given here.
+
+    Attributes:
+        App (App): App object containing the state of the simulation.
+        file_name (str): The name of the output file.
+        shell_edges (np.array): The radii of the edges of the shells.
+        grid_edges (np.array): The coordinates of the edges of the grid cells.
+        region_names (list): The names of the regions.
+        region_bounds (np.array): A (regions, 2) array of [r_min, r_max].
+        species_names (list): The names of the species.
+        species_masks (np.array): A (species, N) bool array of membership.
+        __times (list): The time of each sample.
+        __shell_counts (list): (species, shells) counts for each sample.
+        __shell_energies (list): (species, shells) energies for each sample.
+        __grid_counts (list): (species, grid, grid) counts for each sample.
+        __grid_energies (list): (species, grid, grid) energies for each sample.
+        __region_counts (list): (species, regions) counts for each sample.
+    """
+    def __init__(self, App, num_shells, grid_size, regions, species):
+        """Initialises the field sampler."""
+        self.App = App
+        self.file_name = "{}_fields.npz".format(App.run_name)
+
+        container_radius = App.container_radius()
+        self.shell_edges = np.linspace(0.0, container_radius, num_shells + 1)
+        self.grid_edges = np.linspace(-container_radius, container_radius,
+                                      grid_size + 1)
+
+        self.region_names = list(regions.keys())
+        self.region_bounds = np.array([regions[name] for name in
+                                       self.region_names],
+                                      dtype = float).reshape(-1, 2)
+
+        # Species are fixed by the initial position of each ball so that the
+        # spreading of a group of balls can be followed (e.g. diffusion)
+        if "all" in species:
+            raise Exception("Species name \"all\" is reserved for every ball"
+                            " in FieldSampler module.")
+        r = np.sqrt(np.einsum("ij,ij->i", App.positions, App.positions))
+        self.species_names = ["all"]
+        masks = [np.ones(App.num_balls, dtype = bool)]
+        for name, (r_min, r_max) in species.items():
+            self.species_names.append(name)
+            masks.append((r >= r_min) & (r <= r_max))
+        self.species_masks = np.array(masks)
+
+        self.__times = []
+        self.__shell_counts = []
+        self.__shell_energies = []
+        self.__grid_counts = []
+        self.__grid_energies = []
+        self.__region_counts = []
+
+    def sample(self, t, positions, velocities):
+        """Measures the fields for the state of the system at time t.
+
+        Arguments:
+            t (float): The time of the sample.
+            positions (np.array): An (N, 2) array of ball positions at time t.
+            velocities (np.array): An (N, 2) array of ball velocities.
+        """
+        num_shells = len(self.shell_edges) - 1
+        grid_size = len(self.grid_edges) - 1
+
+        r = np.sqrt(np.einsum("ij,ij->i", positions, positions))
+        kinetic_energy = 0.5 * self.App.masses * np.einsum("ij,ij->i",
+                                                           velocities,
+                                                           velocities)
+
+        # Bin index of every ball. Balls touching the outer edge are counted
+        # in the last shell or cell.
+        shell = np.minimum((r / self.shell_edges[1]).astype(int),
+                           num_shells - 1)
+        cell_width = self.grid_edges[1] - self.grid_edges[0]
+        cell = np.clip(((positions - self.grid_edges[0]) /
+                        cell_width).astype(int), 0, grid_size - 1)
+        cell = cell[:, 1] * grid_size + cell[:, 0] # Row-major (y, x) index
+
+        shell_counts = []
+        shell_energies = []
+        grid_counts = []
+        grid_energies = []
+        for mask in self.species_masks:
+            shell_counts.append(np.bincount(shell[mask],
+                                            minlength = num_shells))
+            shell_energies.append(np.bincount(shell[mask],
+                                              weights = kinetic_energy[mask],
+                                              minlength = num_shells))
+            grid_counts.append(np.bincount(cell[mask],
+                                           minlength = grid_size ** 2))
+            grid_energies.append(np.bincount(cell[mask],
+                                             weights = kinetic_energy[mask],
+                                             minlength = grid_size ** 2))
+
+        # Membership of every ball in every region, then counted per species
+        in_region = ((r >= self.region_bounds[:, 0:1]) &
+                     (r <= self.region_bounds[:, 1:2]))
+        region_counts = np.dot(self.species_masks.astype(int),
+                               in_region.astype(int).T)
+
+        shape = (len(self.species_names), grid_size, grid_size)
+        self.__times.append(t)
+        self.__shell_counts.append(shell_counts)
+        self.__shell_energies.append(shell_energies)
+        self.__grid_counts.append(np.reshape(grid_counts, shape))
+        self.__grid_energies.append(np.reshape(grid_energies, shape))
+        self.__region_counts.append(region_counts)
+
+    def save(self):
+        """Writes the sampled fields to a `.npz` file.
+
+        The file contains the raw counts and energies of every sample as well
+        as the densities and temperatures calculated from them. Temperatures
+        of empty bins are NaN.
+        """
+        shell_counts = np.array(self.__shell_counts, dtype = float)
+        shell_energies = np.array(self.__shell_energies, dtype = float)
+        grid_counts = np.array(self.__grid_counts, dtype = float)
+        grid_energies = np.array(self.__grid_energies, dtype = float)
+
+        shell_areas = np.pi * np.diff(self.shell_edges ** 2)
+        cell_area = (self.grid_edges[1] - self.grid_edges[0]) ** 2
+
+        with np.errstate(invalid = "ignore", divide = "ignore"):
+            shell_temperature = shell_energies / shell_counts
+            grid_temperature = grid_energies / grid_counts
+
+        try:
+            np.savez_compressed(self.file_name,
+                                times = np.array(self.__times),
+                                species = np.array(self.species_names),
+                                regions = np.array(self.region_names),
+                                region_bounds = self.region_bounds,
+                                shell_edges = self.shell_edges,
+                                shell_counts = shell_counts,
+                                shell_energies = shell_energies,
+                                shell_density = shell_counts / shell_areas,
+                                shell_temperature = shell_temperature,
+                                grid_edges = self.grid_edges,
+                                grid_counts = grid_counts,
+                                grid_energies = grid_energies,
+                                grid_density = grid_counts / cell_area,
+                                grid_temperature = grid_temperature,
+                                region_counts = np.array(self.__region_counts))
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in FieldSampler module.")
@@ -0,0 +1,109 @@
+import csv
+import numpy as np
+
+class StreamingHistogram():
+    """Histogram of a positive quantity whose range is not known in advance.
+
+    The bins start at zero and have equal widths. When a value falls beyond
+    the last bin, neighbouring bins are merged in pairs (doubling the width)
+    until it fits, so the histogram never needs to store the values
+    themselves and always uses `num_bins` bins or fewer.
+
+    Arguments:
+        num_bins (int): The number of bins (must be even).
+
+    Attributes:
+        counts (np.array): The number of values in each bin.
+        width (float): The width of each bin (None until the first value).
+        count (int): The number of values added.
+        total (float): The sum of the values added.
+    """
+    def __init__(self, num_bins):
+        """Initialises an empty histogram."""
+        if num_bins <= 0 or num_bins % 2 != 0:
+            raise Exception("Number of bins must be even in FreeFlights"
+                            " module.")
+        self.counts = np.zeros(num_bins, dtype = int)
+        self.width = None
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        """Adds a value to the histogram."""
+        num_bins = len(self.counts)
+        if self.width is None:
+            # Start with the first value in the middle of the range
+            self.width = 2.0 * value / num_bins if value > 0 else 1e-12
+
+        while value >= self.width * num_bins:
+            merged = self.counts.reshape(-1, 2).sum(axis = 1)
+            self.counts[:] = 0
+            self.counts[:len(merged)] = merged
+            self.width *= 2.0
+
+        self.counts[int(value / self.width)] += 1
+        self.count += 1
+        self.total += value
+
+    def mean(self):
+        """Returns the mean of the values added (0 if none)."""
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def edges(self):
+        """Returns the lower edge of each bin."""
+        return np.arange(len(self.counts)) * (self.width or 0.0)
+
+class FreeFlights():
+    """Collects the distributions of free-flight times and path lengths.
+
+    A free flight is the motion of a ball between two collisions with other
+    balls. Collisions with the wall do not change the speed of a ball, so
+    the path length of a flight is simply its speed times its duration, and
+    both are only calculated when the ball next collides (see
+    Ball.end_free_flight). The flight before the first collision of each
+    ball started at an arbitrary time, so it is not recorded.
+
+    The distributions are saved to a CSV file (e.g.
+    `1542627068_free_flights.csv`) with one row per bin.
+
+    Arguments:
+        App (App): App object containing the state of the simulation.
+        num_bins (int): The number of bins of each histogram.
+
+    Attributes:
+        times (StreamingHistogram): The free-flight times.
+        path_lengths (StreamingHistogram): The free-flight path lengths.
+        file_name (str): The name of the CSV file.
+    """
+    def __init__(self, App, num_bins):
+        """Initialises empty histograms."""
+        self.times = StreamingHistogram(num_bins)
+        self.path_lengths = StreamingHistogram(num_bins)
+        self.file_name = "{}_free_flights.csv".format(App.run_name)
+
+    def record(self, flight):
+        """Adds a free flight [time, path length] to the histograms."""
+        self.times.add(flight[0])
+        self.path_lengths.add(flight[1])
+
+    def summary(self):
+        """Returns a line describing the mean free time and path."""
+        return ("Mean free time: {:.4g} s, mean free path: {:.4g} m ({} "
+                "flights)".format(self.times.mean(), self.path_lengths.mean(),
+                                  self.times.count))
+
+    def save(self):
+        """Writes the histograms to a CSV file."""
+        try:
+            f = open(self.file_name, "wt")
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in FreeFlights module.")
+
+        with f as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerow(["time_bin_start", "time_count",
+                             "path_length_bin_start", "path_length_count"])
+            writer.writerows(zip(self.times.edges(), self.times.counts,
+                                 self.path_lengths.edges(),
+                                 self.path_lengths.counts))
@@ -30,8 +30,14 @@ class InitialState():
         container_radius (float): The radius of the container.
         default_radius (float): Default radius of the ball.
         default_mass (float): Default mass of each ball.
-        initial_state_file_name (str): The name of the output file for initial conditions.
+        initial_state_file_name (str): The name of the output file for initial conditions (None to only generate the state, e.g. for StateCache).
         num_balls (int): The number of balls to generate for simulation.
+        inner_radius (float = None): If given, balls are only generated within
+                                     an inner circle of this radius (i.e. for
+                                     diffusion experiments).
+        seed (int = None): Seed of the random number generator, so the same
+                           state is generated every time (None for a
+                           different state each time).
 
     Attributes:
         balls (list): A list containing each ball that has been generated.
@@ -41,15 +47,20 @@ class InitialState():
         default_mass (float): The default mass of the balls.
         default_radius (float): The default radius of the balls.
         rms_speed (float): Root mean square speed of the balls.
+        inner_radius (float): Radius of the circle balls are generated in.
+        random (random.RandomState): Random number generator.
     """
-    def __init__(self, container_radius, initial_state_file_name, num_balls, default_mass, default_radius, rms_speed):
+    def __init__(self, container_radius, initial_state_file_name, num_balls, default_mass, default_radius, rms_speed, inner_radius = None, seed = None):
         """Initialises the InitialState class with the required variables."""
         self.container_radius = container_radius
+        self.inner_radius = (inner_radius if inner_radius is not None
+                             else container_radius)
         self.file_name = initial_state_file_name
         self.num_balls = num_balls
         self.default_mass = default_mass
         self.default_radius = default_radius
         self.rms_speed = rms_speed
+        self.random = random.RandomState(seed)
         
         self.balls = []
         
@@ -58,8 +69,10 @@ class InitialState():
             # Append as a flat array for storage in CSV file
             self.balls.append([i for i in b])
         
-        self.write_to_csv()
-        print("Initial state created successfully. Run App.py module.")
+        # No file is written when the state is generated for a StateCache
+        if self.file_name is not None:
+            self.write_to_csv()
+            print("Initial state created successfully. Run App.py module.")
     
     def generate_ball(self):
         """Generates a single ball."""
@@ -82,7 +95,7 @@ class InitialState():
         # loop, either timeout > 500 or we have generated a valid position.
         while True:
             timeout += 1
-            position = random.uniform(-bounds, bounds, 2)
+            position = self.random.uniform(-bounds, bounds, 2)
             if timeout > 500 or ((self.is_colliding(position, ball_radius) == False
               and self.is_outside_container(position, ball_radius) == False)):
                   break
@@ -104,8 +117,8 @@ class InitialState():
         # use random.normal() for both velocity_x and velocity_y. Then the
         # resultant velocity will have a Rayleigh distribution.
         speed = self.rms_speed
-        multiplier_y = random.choice([-1.0, 1.0])
-        velocity_x = random.uniform(-speed, speed)
+        multiplier_y = self.random.choice([-1.0, 1.0])
+        velocity_x = self.random.uniform(-speed, speed)
         velocity_y = multiplier_y * np.sqrt(self.rms_speed ** 2 - velocity_x ** 2)
         v = [velocity_x, velocity_y]
         return v
@@ -145,16 +158,11 @@ class InitialState():
                                          outside of the container.
         """
         
-        # IMPORTANT: This method will check if a ball is outside of the
-        # container. To generate balls within an inner circle of
-        # radius r (float) (i.e. for diffusion experiments), replace the
-        # last line with:
-        # return position_magnitude + ball_radius >= r
-        
-        # Example: To restrict balls to an inner container of radius 200, use:
-        # return position_magnitude + ball_radius >= 200
+        # Balls are generated within the inner circle, which is the whole
+        # container unless INNER_RADIUS is set in Config.py (i.e. for
+        # diffusion experiments).
         position_magnitude = la.norm(position)
-        return position_magnitude + ball_radius >= self.container_radius
+        return position_magnitude + ball_radius >= self.inner_radius
     
     def write_to_csv(self):
         """Writes contents of `self.balls` to a CSV file."""
@@ -180,7 +188,10 @@ class InitialState():
         for ball in self.balls:
             yield ball
 
-# Initialise the state generator with parameters from Config.py
-InitialState(Config.CONTAINER_RADIUS, Config.INITIAL_STATE_FILE_NAME,
-             Config.NUMBER_OF_BALLS, Config.DEFAULT_MASS,
-             Config.DEFAULT_BALL_RADIUS, Config.RMS_SPEED)
+# Initialise the state generator with parameters from Config.py. The guard
+# allows StateCache to import this module without generating a state.
+if __name__ == "__main__":
+    InitialState(Config.CONTAINER_RADIUS, Config.INITIAL_STATE_FILE_NAME,
+                 Config.NUMBER_OF_BALLS, Config.DEFAULT_MASS,
+                 Config.DEFAULT_BALL_RADIUS, Config.RMS_SPEED,
+                 Config.INNER_RADIUS, Config.RANDOM_SEED)
@@ -0,0 +1,200 @@
+import math
+import numpy as np
+
+from ValidateState import ValidateState
+
+class InvariantMonitor():
+    """Checks that the simulation conserves what it should while it runs.
+
+    Responsible for:
+    - Checking that the total kinetic energy is conserved every
+      `energy_interval` events
+    - Checking that collisions between balls conserve momentum and angular
+      momentum, and that collisions with the wall conserve the speed and
+      angular momentum (about the centre) of the ball, every
+      `collision_interval` events
+    - Scanning for overlapping balls or balls outside the container every
+      `overlap_interval` events (with ValidateState)
+
+    Energy and momenta are compared relative to their size, so `tolerance`
+    is a relative error. Each check only reads the state arrays of App, so
+    the cost of sampled checks is a small fraction of the cost of an event.
+
+    In hard mode a violation raises an exception straight away. In soft mode
+    it is recorded in `violations` (and the first few are printed) and the
+    simulation continues.
+
+    Arguments:
+        App (App): App object containing the state of the simulation.
+        energy_interval (int): The number of events between energy checks.
+        collision_interval (int): The number of events between checks of a
+                                  collision (1 checks every collision).
+        overlap_interval (int): The number of events between overlap scans
+                                (None to never scan).
+        tolerance (float): The largest relative error allowed.
+        should_fail_hard (bool): Should a violation raise an exception?
+
+    Attributes:
+        App (App): App object containing the state of the simulation.
+        initial_energy (float): The total kinetic energy at t = 0.
+        violations (list): A list [event, time, description] of every
+                           violation found in soft mode.
+        num_checks (int): The number of checks performed.
+        __num_events (int): The number of events seen.
+        __velocities (np.array): Velocities of the colliding balls before a
+                                 sampled collision (None if not sampled).
+    """
+    MAX_PRINTED = 10 # Number of soft violations printed
+
+    def __init__(self, App, energy_interval, collision_interval,
+                 overlap_interval, tolerance, should_fail_hard):
+        """Initialises the monitor with the energy of the initial state."""
+        self.App = App
+        self.energy_interval = energy_interval
+        self.collision_interval = collision_interval
+        self.overlap_interval = overlap_interval
+        self.tolerance = tolerance
+        self.should_fail_hard = should_fail_hard
+
+        self.initial_energy = self.total_energy()
+        self.violations = []
+        self.num_checks = 0
+        self.__num_events = 0
+        self.__velocities = None
+
+    def total_energy(self):
+        """Calculates the total kinetic energy from the velocity array."""
+        velocities = self.App.velocities
+        return 0.5 * np.dot(self.App.masses,
+                            np.einsum("ij,ij->i", velocities, velocities))
+
+    def before_collision(self, ball_ids):
+        """Stores the velocities of the colliding balls if this is sampled.
+
+        Must be called before the velocities of the balls are updated.
+
+        Arguments:
+            ball_ids (list): The IDs of the colliding balls.
+        """
+        self.__num_events += 1
+        self.__velocities = None
+        if self.__num_events % self.collision_interval == 0:
+            self.__velocities = self.App.velocities[ball_ids] # Copies rows
+
+    def after_collision(self, ball_ids):
+        """Checks the collision and performs any checks which are due.
+
+        Arguments:
+            ball_ids (list): The IDs of the colliding balls.
+        """
+        if self.__velocities is not None:
+            if len(ball_ids) == 1:
+                self.check_wall_collision(ball_ids[0], self.__velocities[0])
+            else:
+                self.check_ball_collision(ball_ids, self.__velocities)
+
+        if self.__num_events % self.energy_interval == 0:
+            self.check_energy()
+        if (self.overlap_interval is not None and
+            self.__num_events % self.overlap_interval == 0):
+            self.check_overlaps()
+
+    def check_ball_collision(self, ball_ids, u):
+        """Checks a ball collision conserved momentum and angular momentum.
+
+        The balls do not move during the collision, so the change in angular
+        momentum about the centre is r1 x dp1 + r2 x dp2, which is only zero
+        if the impulse acts along the line between the balls.
+
+        Arguments:
+            ball_ids (list): The IDs of the two colliding balls.
+            u (np.array): A (2, 2) array of their velocities before.
+        """
+        # Two balls are checked with floats, which is much faster than
+        # numpy operations on such small arrays
+        self.num_checks += 1
+        ball_ids = [int(i) for i in ball_ids]
+        masses = self.App.masses[ball_ids].tolist()
+        v = self.App.velocities[ball_ids].tolist()
+        r = self.App.positions[ball_ids].tolist()
+        u = u.tolist()
+
+        dp = [[m * (v_k[0] - u_k[0]), m * (v_k[1] - u_k[1])]
+              for m, v_k, u_k in zip(masses, v, u)]
+        momentum_scale = sum(m * math.hypot(*u_k)
+                             for m, u_k in zip(masses, u))
+        momentum_error = math.hypot(dp[0][0] + dp[1][0], dp[0][1] + dp[1][1])
+        if momentum_error > self.tolerance * momentum_scale:
+            self.violation("Momentum not conserved by collision of balls {}"
+                           " (error {:.3g})".format(ball_ids, momentum_error))
+
+        angular_error = abs(sum(r_k[0] * dp_k[1] - r_k[1] * dp_k[0]
+                                for r_k, dp_k in zip(r, dp)))
+        angular_scale = self.App.container_radius() * momentum_scale
+        if angular_error > self.tolerance * angular_scale:
+            self.violation("Angular momentum not conserved by collision of"
+                           " balls {} (error {:.3g})".format(ball_ids,
+                                                             angular_error))
+
+    def check_wall_collision(self, ball_id, u):
+        """Checks a wall collision conserved speed and angular momentum.
+
+        The wall is a circle about the origin, so its impulse on the ball is
+        radial and does not change the angular momentum of the ball.
+
+        Arguments:
+            ball_id (int): The ID of the colliding ball.
+            u (np.array): The velocity of the ball before.
+        """
+        self.num_checks += 1
+        v = self.App.velocities[ball_id].tolist()
+        r = self.App.positions[ball_id].tolist()
+        u = u.tolist()
+        speed_squared = u[0] * u[0] + u[1] * u[1]
+
+        if (abs(v[0] * v[0] + v[1] * v[1] - speed_squared) >
+            self.tolerance * speed_squared):
+            self.violation("Speed not conserved by collision of ball {} with"
+                           " wall".format(ball_id))
+
+        angular_error = abs(r[0] * (v[1] - u[1]) - r[1] * (v[0] - u[0]))
+        if (angular_error > self.tolerance * self.App.container_radius() *
+            math.sqrt(speed_squared)):
+            self.violation("Angular momentum not conserved by collision of"
+                           " ball {} with wall".format(ball_id))
+
+    def check_energy(self):
+        """Checks the total kinetic energy has not drifted."""
+        self.num_checks += 1
+        energy = self.total_energy()
+        if abs(energy - self.initial_energy) > (self.tolerance *
+                                                self.initial_energy):
+            self.violation("Total energy drifted from {:.10g} to {:.10g}"
+                           .format(self.initial_energy, energy))
+
+    def check_overlaps(self):
+        """Scans every ball for overlaps or leaving the container."""
+        self.num_checks += 1
+        App = self.App
+        state = np.column_stack([App.positions, App.velocities,
+                                 App.masses, App.radii])
+        validator = ValidateState(App.container_radius())
+        if not validator.validate(state):
+            self.violation(validator.report())
+
+    def violation(self, description):
+        """Raises or records a violation depending on the failure mode."""
+        if self.should_fail_hard:
+            raise Exception("{} at t = {} in InvariantMonitor module."
+                            .format(description, self.App.time))
+
+        self.violations.append([self.__num_events, self.App.time,
+                                description])
+        if len(self.violations) <= InvariantMonitor.MAX_PRINTED:
+            print("Warning: {} at t = {} (event {})".format(
+                description, self.App.time, self.__num_events))
+
+    def summary(self):
+        """Returns a line describing the checks and violations."""
+        return "Invariant checks: {}, violations: {}".format(
+            self.num_checks, len(self.violations))
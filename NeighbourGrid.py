@@ -0,0 +1,121 @@
+import numpy as np
+
+class NeighbourGrid():
+    """Finds all pairs of balls closer than a cutoff distance in O(N) time.
+
+    Space is divided into square cells with sides equal to the cutoff, so a
+    ball can only be within the cutoff of balls in its own cell or one of the
+    8 neighbouring cells. Every ball is compared with the balls in its own
+    cell and 4 of the neighbouring cells (the other 4 are covered when the
+    neighbour is compared with this cell), so each pair is found once.
+
+    All balls are processed at once: balls are sorted by cell, and every
+    pair of balls from a pair of cells is generated with array arithmetic on
+    the start and size of each cell, rather than a loop over balls. The
+    neighbouring cells are found with a lookup table of every cell when the
+    grid is not much larger than the number of balls, and otherwise by
+    searching the sorted occupied cells.
+
+    Arguments:
+        cutoff (float): The maximum distance between balls in a pair.
+
+    Attributes:
+        cutoff (float): The maximum distance between balls in a pair.
+    """
+    # Offsets of the neighbouring cells each cell is compared with
+    OFFSETS = [(0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+    MAX_CELLS_PER_BALL = 4 # Largest grid (per ball) with a lookup table
+
+    def __init__(self, cutoff):
+        """Initialises the grid with the cell size."""
+        if not np.isfinite(cutoff) or cutoff <= 0:
+            raise Exception("Invalid cutoff in NeighbourGrid module.")
+        self.cutoff = cutoff
+
+    def pairs(self, positions):
+        """Finds every pair of balls whose centres are closer than the cutoff.
+
+        Arguments:
+            positions (np.array): An (N, 2) array of finite ball positions.
+
+        Returns:
+            A list [i, j, distance] of np.arrays, where i < j are the indices
+            of the balls in each pair and distance is their separation.
+        """
+        n = len(positions)
+        if n < 2:
+            empty = np.zeros(0, dtype = np.int64)
+            return [empty, empty, np.zeros(0)]
+
+        # Integer cell coordinates of every ball, starting from 0
+        cell = np.floor((positions - positions.min(axis = 0)) /
+                        self.cutoff).astype(np.int64)
+        width = cell[:, 0].max() + 2 # Leaves a gap so x + 1 never wraps
+        num_cells = (cell[:, 1].max() + 2) * width
+        keys = cell[:, 1] * width + cell[:, 0]
+
+        # Sort balls by cell, so the balls of each occupied cell are the
+        # slice order[start:start + count]
+        order = np.argsort(keys, kind = "stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        occupied = sorted_keys[starts]
+        counts = np.diff(np.r_[starts, n])
+
+        lookup = None
+        if num_cells <= NeighbourGrid.MAX_CELLS_PER_BALL * n:
+            # Index of each cell in `occupied`, or -1 if it is empty
+            lookup = np.full(num_cells, -1, dtype = np.int64)
+            lookup[occupied] = np.arange(len(occupied))
+
+        i_list = []
+        j_list = []
+        d_list = []
+        for dx, dy in NeighbourGrid.OFFSETS:
+            # Find the neighbouring cell of every occupied cell. `occupied` is
+            # sorted, so the neighbour keys are sorted too and the search
+            # (without a lookup table) is fast.
+            neighbour = occupied + dy * width + dx
+            if (dx, dy) == (0, 0):
+                a = np.arange(len(occupied))
+                b = a
+            elif lookup is not None:
+                row = lookup[neighbour]
+                a = np.flatnonzero(row >= 0)
+                b = row[a]
+            else:
+                row = np.minimum(np.searchsorted(occupied, neighbour),
+                                 len(occupied) - 1)
+                a = np.flatnonzero(occupied[row] == neighbour)
+                b = row[a]
+
+            # Generate every pair (k // size_b, k % size_b) of balls from
+            # cells a and b
+            size_a = counts[a]
+            size_b = counts[b]
+            sizes = size_a * size_b
+            cell_pair = np.repeat(np.arange(len(a)), sizes)
+            k = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes,
+                                                   sizes)
+            k_a = k // size_b[cell_pair]
+            k_b = k % size_b[cell_pair]
+            if (dx, dy) == (0, 0):
+                # Within a cell, only take each pair once
+                keep = k_a < k_b
+                cell_pair = cell_pair[keep]
+                k_a = k_a[keep]
+                k_b = k_b[keep]
+            i = order[starts[a][cell_pair] + k_a]
+            j = order[starts[b][cell_pair] + k_b]
+
+            dr = positions[i] - positions[j]
+            distance = np.sqrt(np.einsum("ij,ij->i", dr, dr))
+            close = distance < self.cutoff
+
+            # Pairs may be in either order
+            i_list.append(np.minimum(i[close], j[close]))
+            j_list.append(np.maximum(i[close], j[close]))
+            d_list.append(distance[close])
+
+        return [np.concatenate(i_list), np.concatenate(j_list),
+                np.concatenate(d_list)]
@@ -0,0 +1,124 @@
+import csv
+import numpy as np
+
+from NeighbourGrid import NeighbourGrid
+
+class PairCorrelation():
+    """Accumulates the radial distribution function g(r) at sample times.
+
+    g(r) is the number of balls found at distance r from a ball, relative to
+    the number expected for an ideal gas of the same density. Pair distances
+    up to `cutoff` are found with a NeighbourGrid, so each sample costs O(N)
+    rather than O(N^2).
+
+    Near the wall of the container, part of the ring of radius r around a
+    ball lies outside the region the centres of other balls can reach, so
+    fewer neighbours are expected there. The expected count for each ball is
+    reduced by the fraction of the ring inside that region (see
+    edge_fraction), so g(r) is not biased low at large r.
+
+    Counts and expected counts are summed over all samples, so the result is
+    the average over sample times.
+
+    Arguments:
+        App (App): App object containing the state of the simulation.
+        cutoff (float): The maximum pair distance.
+        num_bins (int): The number of histogram bins between 0 and cutoff.
+
+    Attributes:
+        App (App): App object containing the state of the simulation.
+        file_name (str): The name of the output CSV file.
+        edges (np.array): The edges of the histogram bins.
+        grid (NeighbourGrid): Neighbour search used to find pairs.
+        reachable_radius (float): Radius of the circle which the centres of
+                                  balls can reach (container radius minus the
+                                  mean ball radius).
+        counts (np.array): Number of pairs found in each bin.
+        expected (np.array): Number of pairs expected in each bin for an ideal
+                             gas.
+        num_samples (int): The number of samples taken.
+    """
+    def __init__(self, App, cutoff, num_bins):
+        """Initialises the accumulator."""
+        self.App = App
+        self.file_name = "{}_gr.csv".format(App.run_name)
+        self.edges = np.linspace(0.0, cutoff, num_bins + 1)
+        self.grid = NeighbourGrid(cutoff)
+        self.reachable_radius = App.container_radius() - np.mean(App.radii)
+        self.counts = np.zeros(num_bins)
+        self.expected = np.zeros(num_bins)
+        self.num_samples = 0
+
+    def sample(self, t, positions, velocities):
+        """Adds the pair distances for the state of the system at time t.
+
+        Arguments:
+            t (float): The time of the sample.
+            positions (np.array): An (N, 2) array of ball positions at time t.
+            velocities (np.array): An (N, 2) array of ball velocities.
+        """
+        i, j, distance = self.grid.pairs(positions)
+        self.counts += np.histogram(distance, bins = self.edges)[0]
+
+        # Only balls within `cutoff` of the edge have rings which are cut by
+        # it, so the edge fraction is only calculated for those balls.
+        R = self.reachable_radius
+        n = len(positions)
+        rho = np.sqrt(np.einsum("ij,ij->i", positions, positions))
+        near_edge = rho > R - self.edges[-1]
+        r = 0.5 * (self.edges[1:] + self.edges[:-1]) # Bin centres
+        fraction = (np.count_nonzero(~near_edge) +
+                    PairCorrelation.edge_fraction(r[None, :],
+                                                  rho[near_edge, None],
+                                                  R).sum(axis = 0))
+
+        density = (n - 1) / (np.pi * R ** 2)
+        shell_areas = np.pi * np.diff(self.edges ** 2)
+        self.expected += 0.5 * density * shell_areas * fraction # Unordered
+        self.num_samples += 1
+
+    @classmethod
+    def edge_fraction(cls, r, rho, R):
+        """Fraction of a ring that lies inside a circle centred at the origin.
+
+        Arguments:
+            r (np.array): Radius of the ring.
+            rho (np.array): Distance of the centre of the ring from the origin.
+            R (float): Radius of the circle.
+
+        Returns:
+            An np.array of the fraction of the circumference of the ring
+            inside the circle (1 for rings entirely inside, 0 for rings
+            entirely outside).
+        """
+        # A point on the ring at angle phi from the outward direction is
+        # inside the circle if cos(phi) <= (R^2 - rho^2 - r^2) / (2 rho r)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            c = (R ** 2 - rho ** 2 - r ** 2) / (2 * rho * r)
+        c = np.clip(np.nan_to_num(c, nan = 1.0), -1.0, 1.0)
+        return 1.0 - np.arccos(c) / np.pi
+
+    def g(self):
+        """Calculates g(r) averaged over all samples.
+
+        Returns:
+            A list [r, g] of np.arrays of the bin centres and g(r).
+        """
+        r = 0.5 * (self.edges[1:] + self.edges[:-1])
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            g = np.where(self.expected > 0, self.counts / self.expected, 0.0)
+        return [r, g]
+
+    def save(self):
+        """Writes r and g(r) to a CSV file."""
+        r, g = self.g()
+
+        try:
+            f = open(self.file_name, "wt")
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in PairCorrelation module.")
+
+        with f as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerows(zip(r, g))
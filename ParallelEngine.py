@@ -0,0 +1,880 @@
+import csv
+import heapq
+import math
+import time
+from array import array
+import numpy as np
+from multiprocessing import Pipe, Process
+from multiprocessing import shared_memory
+
+from Ball import Ball
+import Config
+from ValidateState import ValidateState
+
+class SectorGrid():
+    """Square grid of cells over the container, divided into angular sectors.
+
+    Cells are at least `cell_size` wide, so two balls can only collide if
+    they are in the same or neighbouring cells when `cell_size` is at least
+    the largest ball diameter. Each cell is owned by the sector containing
+    its centre (sectors are equal angles around the centre of the container).
+
+    A boundary cell is a cell with a neighbouring cell owned by another
+    sector. The halo of a sector is the set of other sectors' cells next to
+    its own, i.e. the boundary cells of its neighbours.
+
+    Arguments:
+        container_radius (float): The radius of the container.
+        cell_size (float): The minimum width of each cell.
+        num_sectors (int): The number of sectors.
+
+    Attributes:
+        container_radius (float): The radius of the container.
+        num_sectors (int): The number of sectors.
+        n (int): The number of cells along each side of the grid.
+        size (float): The width of each cell.
+        owners (np.array): The sector owning each cell.
+        boundary (np.array): Flag for each cell to indicate if it is a
+                             boundary cell.
+    """
+    def __init__(self, container_radius, cell_size, num_sectors):
+        """Builds the grid and assigns each cell to a sector."""
+        self.container_radius = container_radius
+        self.num_sectors = num_sectors
+        self.n = max(1, int(2 * container_radius // cell_size))
+        self.size = 2 * container_radius / self.n
+
+        centres = (np.arange(self.n) + 0.5) * self.size - container_radius
+        x, y = np.meshgrid(centres, centres)
+        angle = np.arctan2(y, x) + np.pi
+        owners = (angle / (2 * np.pi) * num_sectors).astype(np.int64)
+        self.owners = np.minimum(owners, num_sectors - 1).ravel()
+
+        grid = self.owners.reshape(self.n, self.n)
+        boundary = np.zeros((self.n, self.n), dtype = bool)
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            a, b = SectorGrid.shifted(grid, dx, dy)
+            different = a != b
+            boundary[SectorGrid.window(self.n, dx, dy)] |= different
+            boundary[SectorGrid.window(self.n, -dx, -dy)] |= different
+        self.boundary = boundary.ravel()
+
+    @classmethod
+    def window(cls, n, dx, dy):
+        """Slices of an n x n grid whose cells have a neighbour at (dx, dy)."""
+        rows = slice(max(0, -dy), n - max(0, dy))
+        columns = slice(max(0, -dx), n - max(0, dx))
+        return (rows, columns)
+
+    @classmethod
+    def shifted(cls, grid, dx, dy):
+        """Pairs every cell of `grid` with its neighbour at offset (dx, dy).
+
+        Returns:
+            A list [cells, neighbours] of equally shaped views of `grid`.
+        """
+        n = len(grid)
+        return [grid[SectorGrid.window(n, dx, dy)],
+                grid[SectorGrid.window(n, -dx, -dy)]]
+
+    def halo(self, sector):
+        """Finds the cells of other sectors next to the cells of `sector`.
+
+        Returns:
+            An np.array flag for each cell.
+        """
+        owned = (self.owners == sector).reshape(self.n, self.n)
+        near = np.array(owned)
+        for dx in [-1, 0, 1]:
+            for dy in [-1, 0, 1]:
+                shifted = owned[SectorGrid.window(self.n, -dx, -dy)]
+                near[SectorGrid.window(self.n, dx, dy)] |= shifted
+        return (near & ~owned).ravel()
+
+    def cells_of(self, positions):
+        """Finds the cell containing each position.
+
+        Arguments:
+            positions (np.array): An (N, 2) array of positions.
+
+        Returns:
+            An np.array of the index of the cell of each position.
+        """
+        c = np.floor((positions + self.container_radius) / self.size)
+        c = np.clip(c, 0, self.n - 1).astype(np.int64)
+        return c[:, 1] * self.n + c[:, 0]
+
+    def neighbours(self, cell):
+        """Returns a list of the cell and its neighbouring cells."""
+        n = self.n
+        cx = cell % n
+        cy = cell // n
+        return [y * n + x for y in range(max(cy - 1, 0), min(cy + 2, n))
+                for x in range(max(cx - 1, 0), min(cx + 2, n))]
+
+class ParticleBlock():
+    """Shared memory block holding the state of every ball.
+
+    Each ball has a row of 8 float64 values [x, y, vx, vy, t, mass, radius,
+    cell], where (x, y) is its position at time t, the time of its last
+    event. Positions at later times are extrapolated, so balls which are not
+    involved in an event are never written. Only the worker owning a ball
+    writes its row.
+
+    Arguments:
+        num_balls (int): The number of balls.
+        name (str = None): Name of an existing block to attach to. A new block
+                           is created if no name is given.
+
+    Attributes:
+        data (np.array): An (N, 8) view of the block.
+        flat (memoryview): A flat view of the block, which is faster than
+                           `data` for reading and writing single values.
+    """
+    STRIDE = 8
+    X, Y, VX, VY, T, MASS, RADIUS, CELL = range(8)
+
+    def __init__(self, num_balls, name = None):
+        """Creates or attaches to the shared memory block."""
+        size = 8 * ParticleBlock.STRIDE * num_balls
+        if name is None:
+            self.__shared_memory = shared_memory.SharedMemory(create = True,
+                                                              size = size)
+        else:
+            self.__shared_memory = shared_memory.SharedMemory(name = name)
+
+        self.data = np.ndarray((num_balls, ParticleBlock.STRIDE),
+                               dtype = np.float64,
+                               buffer = self.__shared_memory.buf)
+        self.flat = self.__shared_memory.buf.cast("d")
+
+    def name(self):
+        """Accessor method for the name of the shared memory block."""
+        return self.__shared_memory.name
+
+    def close(self, unlink = False):
+        """Releases the shared memory block.
+
+        Arguments:
+            unlink (bool): Flag to indicate if the block should be destroyed.
+        """
+        # Views into the block must be released before it can be closed
+        self.data = None
+        self.flat.release()
+        self.__shared_memory.close()
+        if unlink:
+            self.__shared_memory.unlink()
+
+class SectorWorker(Process):
+    """Process which simulates the balls in one sector of the container.
+
+    The worker keeps a cell list of its own balls and of the balls in its
+    halo (ghosts, copied from the ParticleBlock), and an event queue of ball,
+    wall and cell-crossing events of its own balls.
+
+    An event is a boundary event if it involves a ball in a boundary cell or
+    moves a ball into one. Every other event (an interior event) only depends
+    on balls deep inside the sector, which cannot be affected by another
+    sector until a boundary event has happened somewhere. So all events
+    before the earliest boundary event of any sector, T*, are exactly the
+    events a serial simulation would execute.
+
+    Each round the ParallelEngine sends "run": the worker executes its
+    interior events in order, keeping an undo log, until it reaches its own
+    first boundary event or the end of the window, and reports that time.
+    The engine then sends "commit" with T*: the worker executes its events at
+    T* (including boundary events) and reports which balls changed, which
+    every worker re-reads at the next "run". Logged events up to T* are then
+    final.
+
+    Logged events after T* are kept, as most of them cannot be affected by
+    the boundary events. Whenever the trajectory of a ball changes at time t
+    (at a boundary event, or when it is re-read), only the events after t of
+    the balls in its own and neighbouring cells are undone, together with
+    the later events of every ball they collided with. Other balls of the
+    sector keep their events, so a worker rarely repeats work.
+
+    Arguments:
+        sector (int): The sector simulated by this worker.
+        container_radius (float): The radius of the container.
+        cell_size (float): The minimum width of each cell.
+        num_sectors (int): The number of sectors.
+        block_name (str): The name of the ParticleBlock.
+        num_balls (int): The number of balls.
+        connection (Connection): Pipe to the ParallelEngine.
+    """
+    BALL = 0
+    WALL = 1
+    CELL = 2
+
+    def __init__(self, sector, container_radius, cell_size, num_sectors,
+                 block_name, num_balls, connection):
+        """Initialises the worker process."""
+        Process.__init__(self)
+        self.sector = sector
+        self.container_radius = container_radius
+        self.cell_size = cell_size
+        self.num_sectors = num_sectors
+        self.block_name = block_name
+        self.num_balls = num_balls
+        self.connection = connection
+
+    def run(self):
+        """Answers messages from the ParallelEngine until told to stop."""
+        block = ParticleBlock(self.num_balls, name = self.block_name)
+        self.setup(block)
+
+        while True:
+            message = self.connection.recv()
+            start = time.process_time()
+            if message[0] == "run":
+                self.refresh(message[2])
+                self.connection.send(self.advance(message[1]))
+                self.round_times.append(time.process_time() - start)
+            elif message[0] == "commit":
+                self.connection.send(self.commit(message[1]))
+                self.round_times[-1] += time.process_time() - start
+            else:
+                self.connection.send([self.totals + [self.num_events,
+                                                     self.num_undone],
+                                      self.round_times])
+                break
+
+        self.flat = None
+        block.close()
+
+    def setup(self, block):
+        """Builds the cell lists and predicts the first event of every ball."""
+        grid = SectorGrid(self.container_radius, self.cell_size,
+                          self.num_sectors)
+        self.grid = grid
+        self.owners = grid.owners.tolist()
+        self.boundary = grid.boundary.tolist()
+        self.flat = block.flat
+        self.time = 0.0
+
+        self.totals = [0, 0, 0.0] # Ball and wall collisions, delta_p
+        self.num_events = 0 # Events executed, including undone events
+        self.num_undone = 0
+        self.round_times = [] # CPU time spent in each round
+
+        self.count = array("q", [0]) * self.num_balls # Invalidates events
+        self.where = array("q", [-1]) * self.num_balls # Local cell of balls
+        self.cells = {}
+        self.ghosts = {}
+        self.queue = []
+        self.sequence = 0 # Breaks ties between events at the same time
+        self.log = []
+        self.frontier = 0.0 # Time of the latest event in the log
+
+        cells = block.data[:, ParticleBlock.CELL].astype(np.int64)
+        owned = np.flatnonzero(grid.owners[cells] == self.sector)
+        halo = np.flatnonzero(grid.halo(self.sector)[cells])
+        for i in halo.tolist():
+            self.add_ghost(i)
+        for i in owned.tolist():
+            self.move(i, int(cells[i]))
+        for i in owned.tolist():
+            self.predict(i)
+
+    def state(self, i):
+        """Returns [x, y, vx, vy, t] of ball i (owned or ghost)."""
+        if i in self.ghosts:
+            return self.ghosts[i]
+        k = i * ParticleBlock.STRIDE
+        return self.flat[k:k + 5].tolist()
+
+    def write(self, i, x, y, vx, vy, t):
+        """Writes the state of an owned ball to the ParticleBlock."""
+        k = i * ParticleBlock.STRIDE
+        flat = self.flat
+        flat[k] = x
+        flat[k + 1] = y
+        flat[k + 2] = vx
+        flat[k + 3] = vy
+        flat[k + 4] = t
+
+    def radius(self, i):
+        return self.flat[i * ParticleBlock.STRIDE + ParticleBlock.RADIUS]
+
+    def mass(self, i):
+        return self.flat[i * ParticleBlock.STRIDE + ParticleBlock.MASS]
+
+    def move(self, i, cell):
+        """Moves ball i to `cell` in the local cell lists."""
+        old = self.where[i]
+        if old != -1:
+            self.cells[old].remove(i)
+        self.where[i] = cell
+        if cell != -1:
+            self.cells.setdefault(cell, []).append(i)
+
+    def add_ghost(self, i):
+        """Copies the state of ball i from the ParticleBlock as a ghost."""
+        k = i * ParticleBlock.STRIDE
+        self.ghosts[i] = self.flat[k:k + 5].tolist()
+        self.move(i, int(self.flat[k + ParticleBlock.CELL]))
+
+    def push(self, t, kind, i, j):
+        """Adds an event to the queue (no earlier than the current time)."""
+        self.sequence += 1
+        heapq.heappush(self.queue, (max(t, self.time), self.sequence, kind,
+                                    i, j,
+                                    self.count[i],
+                                    self.count[j] if kind == 0 else 0))
+
+    def predict(self, i):
+        """Predicts the wall, cell-crossing and ball events of owned ball i."""
+        x, y, vx, vy, t = self.state(i)
+        r = self.radius(i)
+        R = self.container_radius
+
+        # Collision times are calculated as in the Ball module
+        dt = Ball.wall_collision_time(vx * vx + vy * vy,
+                                      2 * (x * vx + y * vy),
+                                      x * x + y * y - (R - r) ** 2, R - r)
+        if dt < math.inf:
+            self.push(t + dt, SectorWorker.WALL, i, -1)
+
+        # Time to leave the current cell through its x or y edge
+        cell = self.where[i]
+        n = self.grid.n
+        s = self.grid.size
+        cx = cell % n
+        cy = cell // n
+        tx = ty = math.inf
+        if vx > 0 and cx < n - 1:
+            tx = ((cx + 1) * s - R - x) / vx
+        elif vx < 0 and cx > 0:
+            tx = (cx * s - R - x) / vx
+        if vy > 0 and cy < n - 1:
+            ty = ((cy + 1) * s - R - y) / vy
+        elif vy < 0 and cy > 0:
+            ty = (cy * s - R - y) / vy
+        if tx < ty:
+            self.push(t + max(tx, 0.0), SectorWorker.CELL, i,
+                      cell + (1 if vx > 0 else -1))
+        elif ty < math.inf:
+            self.push(t + max(ty, 0.0), SectorWorker.CELL, i,
+                      cell + (n if vy > 0 else -n))
+
+        neighbours = self.grid.neighbours(cell)
+        if self.frontier > self.time:
+            # Ball i may now collide with balls which have been simulated
+            # past this time, so their later events are undone first
+            self.rollback(self.balls_near(neighbours), self.time)
+        for c in neighbours:
+            for j in self.cells.get(c, ()):
+                if j != i:
+                    self.predict_pair(i, j)
+
+    def balls_near(self, cells):
+        """Finds the balls which are in `cells` now or after this time.
+
+        Returns:
+            A set of the owned balls in `cells` now, or in `cells` before any
+            of their logged events after this time.
+        """
+        cells = set(cells)
+        balls = {i for c in cells for i in self.cells.get(c, ())
+                 if i not in self.ghosts}
+        for t, _, owned, saved in self.log:
+            if t > self.time:
+                balls.update(i for i, values in zip(owned, saved)
+                             if values[5] in cells)
+        return balls
+
+    def predict_pair(self, i, j):
+        """Predicts the collision of owned ball i with ball j."""
+        xi, yi, vxi, vyi, ti = self.state(i)
+        xj, yj, vxj, vyj, tj = self.state(j)
+        t = max(ti, tj)
+        dx = (xi + vxi * (t - ti)) - (xj + vxj * (t - tj))
+        dy = (yi + vyi * (t - ti)) - (yj + vyj * (t - tj))
+        dvx = vxi - vxj
+        dvy = vyi - vyj
+        contact = self.radius(i) + self.radius(j)
+
+        dt = Ball.ball_collision_time(dvx * dvx + dvy * dvy,
+                                      2 * (dx * dvx + dy * dvy),
+                                      dx * dx + dy * dy - contact * contact,
+                                      contact)
+        if dt < math.inf and t + dt >= self.time:
+            self.push(t + dt, SectorWorker.BALL, i, j)
+
+    def next_event(self):
+        """Removes invalid events and returns the next valid event (or None)."""
+        queue = self.queue
+        count = self.count
+        while queue:
+            event = queue[0]
+            t, _, kind, i, j, ci, cj = event
+            if count[i] == ci and (kind != 0 or count[j] == cj):
+                return event
+            heapq.heappop(queue)
+        return None
+
+    def is_boundary_event(self, event):
+        """Checks if the event involves or creates a ball in a boundary cell."""
+        t, _, kind, i, j, ci, cj = event
+        if self.boundary[self.where[i]]:
+            return True
+        if kind == SectorWorker.BALL:
+            return self.boundary[self.where[j]]
+        if kind == SectorWorker.CELL:
+            return self.boundary[j] or self.owners[j] != self.sector
+        return False
+
+    def execute(self, event, changed):
+        """Executes an event of owned balls.
+
+        Arguments:
+            event (tuple): The event.
+            changed (list): Balls changed by the event are appended to this
+                            list, or None to record the event in the undo log
+                            instead.
+        """
+        t, _, kind, i, j, ci, cj = event
+        if kind == SectorWorker.BALL and j not in self.ghosts:
+            owned = [i, j]
+        else:
+            owned = [i]
+
+        if changed is None:
+            # The collisions and impulse of a logged event are only added to
+            # the totals once it is final
+            totals = [0, 0, 0.0]
+            saved = [self.state(k) + [self.where[k]] for k in owned]
+            self.log.append([t, totals, owned, saved])
+            self.frontier = max(self.frontier, t)
+        else:
+            totals = self.totals
+            changed.extend(owned)
+        self.num_events += 1
+        self.time = t
+
+        if kind == SectorWorker.WALL:
+            x, y, vx, vy, t0 = self.state(i)
+            x += vx * (t - t0)
+            y += vy * (t - t0)
+            # Same calculation as Ball.velocity_after_wall_collision
+            s = 2 * (vx * x + vy * y) / (x * x + y * y)
+            nvx = vx - x * s
+            nvy = vy - y * s
+            self.write(i, x, y, nvx, nvy, t)
+            totals[2] += self.mass(i) * math.hypot(nvx - vx, nvy - vy)
+            totals[1] += 1
+        elif kind == SectorWorker.BALL:
+            x1, y1, u1x, u1y, t1 = self.state(i)
+            x2, y2, u2x, u2y, t2 = self.state(j)
+            x1 += u1x * (t - t1)
+            y1 += u1y * (t - t1)
+            x2 += u2x * (t - t2)
+            y2 += u2y * (t - t2)
+            m1 = self.mass(i)
+            m2 = self.mass(j)
+            # Same calculation as Ball.velocity_after_ball_collision
+            dx = x1 - x2
+            dy = y1 - y2
+            s = (2 * (dx * (u1x - u2x) + dy * (u1y - u2y)) /
+                 ((m1 + m2) * (dx * dx + dy * dy)))
+            self.write(i, x1, y1, u1x - dx * m2 * s, u1y - dy * m2 * s, t)
+            if j in self.ghosts:
+                # The owner of j makes the same change to it
+                self.ghosts[j] = [x2, y2, u2x + dx * m1 * s,
+                                  u2y + dy * m1 * s, t]
+                self.count[j] += 1
+                if i < j:
+                    totals[0] += 1 # Counted by one worker only
+            else:
+                self.write(j, x2, y2, u2x + dx * m1 * s, u2y + dy * m1 * s,
+                           t)
+                totals[0] += 1
+        else:
+            self.move(i, j)
+            self.flat[i * ParticleBlock.STRIDE + ParticleBlock.CELL] = j
+            if self.owners[j] != self.sector:
+                # The ball now belongs to the next sector, but it is still in
+                # the halo of this one
+                self.ghosts[i] = self.state(i)
+                self.count[i] += 1
+                return
+
+        for k in owned:
+            self.count[k] += 1
+        for k in owned:
+            self.predict(k)
+
+    def advance(self, end):
+        """Executes interior events until the first boundary event.
+
+        Arguments:
+            end (float): The end of the window of this round.
+
+        Returns:
+            The time (float) of the first boundary event, or `end` if there
+            is none before it.
+        """
+        while True:
+            event = self.next_event()
+            if event is None or event[0] >= end:
+                return end
+            if self.is_boundary_event(event):
+                return event[0]
+            heapq.heappop(self.queue)
+            self.execute(event, None)
+
+    def rollback(self, balls, end):
+        """Undoes the logged events of some balls after time `end`.
+
+        The later events of every ball they collided with after `end` are
+        undone too. The events of each ball are logged in time order, so one
+        pass through the log finds them all.
+
+        Arguments:
+            balls (set): The balls whose events are undone.
+            end (float): The time after which events are undone.
+        """
+        balls = set(balls)
+        kept = []
+        undone = []
+        for entry in self.log:
+            if entry[0] > end and not balls.isdisjoint(entry[2]):
+                balls.update(entry[2])
+                undone.append(entry)
+            else:
+                kept.append(entry)
+        if len(undone) == 0:
+            return
+
+        self.log = kept
+        self.frontier = max([entry[0] for entry in kept], default = 0.0)
+        restored = set()
+        for t, totals, owned, saved in reversed(undone):
+            for i, values in zip(owned, saved):
+                self.write(i, *values[:5])
+                if self.where[i] != values[5]:
+                    self.move(i, values[5])
+                    self.flat[i * ParticleBlock.STRIDE +
+                              ParticleBlock.CELL] = values[5]
+                restored.add(i)
+        self.num_undone += len(undone)
+
+        for i in restored:
+            self.count[i] += 1
+        for i in restored:
+            self.predict(i)
+
+    def commit(self, end):
+        """Executes the events at T* = `end` and finalises earlier events.
+
+        Returns:
+            A list of the balls changed by the executed events.
+        """
+        kept = []
+        for entry in self.log:
+            if entry[0] <= end:
+                for k, value in enumerate(entry[1]):
+                    self.totals[k] += value
+            else:
+                kept.append(entry)
+        self.log = kept
+        self.time = end
+
+        changed = []
+        while True:
+            event = self.next_event()
+            if event is None or event[0] > end:
+                break
+            heapq.heappop(self.queue)
+            self.execute(event, changed)
+        self.time = end
+        return changed
+
+    def refresh(self, changed):
+        """Re-reads balls changed by other workers from the ParticleBlock.
+
+        Arguments:
+            changed (list): The balls changed in the last commit.
+        """
+        halo = set()
+        for i in set(changed):
+            k = i * ParticleBlock.STRIDE
+            cell = int(self.flat[k + ParticleBlock.CELL])
+            owner = self.owners[cell]
+
+            if owner == self.sector:
+                if i in self.ghosts or self.where[i] == -1:
+                    # Ball has moved into this sector
+                    self.ghosts.pop(i, None)
+                    self.move(i, cell)
+                    self.count[i] += 1
+                    self.predict(i)
+            elif self.is_halo(cell):
+                self.add_ghost(i)
+                self.count[i] += 1
+                halo.add(i)
+            elif self.where[i] != -1:
+                # Ball has left the halo
+                self.ghosts.pop(i, None)
+                self.move(i, -1)
+                self.count[i] += 1
+
+        # Predict collisions of owned balls with the changed ghosts
+        for j in halo:
+            for c in self.grid.neighbours(self.where[j]):
+                for i in self.cells.get(c, ()):
+                    if i not in self.ghosts:
+                        self.predict_pair(i, j)
+
+    def is_halo(self, cell):
+        """Checks if a cell of another sector neighbours this sector."""
+        return any(self.owners[c] == self.sector
+                   for c in self.grid.neighbours(cell))
+
+class ParallelEngine():
+    """Runs very large simulations on several processes at once.
+
+    This is an opt-in alternative to App for systems which are too large for
+    its N x N collision table (e.g. 1e6 balls). The container is divided into
+    equal angular sectors, each simulated by a SectorWorker process with a
+    cell list, and the state of every ball is kept in one shared memory
+    ParticleBlock.
+
+    Sectors only need to agree at boundary events. Each round, every worker
+    runs ahead to its own first boundary event, the earliest of these (T*)
+    is found, and workers undo the events after T* which the boundary events
+    at T* can affect (see SectorWorker). So every event is executed
+    at the same time and in the same order (for each ball) as in a serial
+    simulation, up to floating point rounding. Rounds happen about once per
+    boundary event, so the speed-up depends on the fraction of balls in
+    boundary cells, which falls as the system grows. No speed-up should be
+    expected for small systems. Set PARALLEL_BENCHMARK_WORKERS in Config.py
+    to time a run with different numbers of workers (see benchmark()).
+
+    To run this module, set PARALLEL_NUM_WORKERS and PARALLEL_END_TIME in
+    Config.py and execute this file. The initial state is read like App.py
+    (from INITIAL_STATE_FILE_NAME, or the StateCache), and the final state is
+    written in the same format to a CSV file (e.g. `1542627068_state.csv`),
+    so it can be used as an initial state.
+
+    Arguments:
+        container_radius (float): The radius of the container.
+        state (np.array): An (N, 6) array of [x, y, vx, vy, mass, radius] of
+                          every ball, as in the initial state CSV file.
+        num_workers (int): The number of worker processes (sectors).
+        cell_size (float = None): The minimum width of each cell (the largest
+                                  ball diameter by default).
+
+    Attributes:
+        container_radius (float): The radius of the container.
+        num_balls (int): The number of balls.
+        time (float): The time of the simulation.
+        window (float): The length of the next round's window.
+        num_rounds (int): The number of rounds.
+        block (ParticleBlock): The shared state of every ball.
+        workers (list): The SectorWorker processes.
+        connections (list): Pipes to the workers.
+        round_times (np.array): A (rounds, workers) array of the CPU time
+                                each worker spent in each round (set by
+                                close()).
+        __changed (list): Balls changed in the last commit.
+    """
+    def __init__(self, container_radius, state, num_workers, cell_size = None):
+        """Shares the state of the balls and starts the workers."""
+        state = np.asarray(state, dtype = float)
+        self.container_radius = container_radius
+        self.num_balls = len(state)
+        self.time = 0.0
+        self.num_rounds = 0
+        self.round_times = None
+        self.__changed = []
+
+        if cell_size is None:
+            cell_size = 2 * state[:, 5].max()
+        grid = SectorGrid(container_radius, cell_size, num_workers)
+
+        self.block = ParticleBlock(self.num_balls)
+        data = self.block.data
+        data[:, :4] = state[:, :4]
+        data[:, ParticleBlock.T] = 0.0
+        data[:, ParticleBlock.MASS] = state[:, 4]
+        data[:, ParticleBlock.RADIUS] = state[:, 5]
+        data[:, ParticleBlock.CELL] = grid.cells_of(state[:, :2])
+
+        # Start with a window of about the time to cross a cell
+        rms_speed = np.sqrt(np.mean(np.sum(state[:, 2:4] ** 2, axis = 1)))
+        self.window = grid.size / rms_speed if rms_speed > 0 else 1.0
+
+        self.workers = []
+        self.connections = []
+        for sector in range(num_workers):
+            connection, worker_connection = Pipe()
+            worker = SectorWorker(sector, container_radius, cell_size,
+                                  num_workers, self.block.name(),
+                                  self.num_balls, worker_connection)
+            worker.start()
+            worker_connection.close() # Recv raises EOFError if worker dies
+            self.workers.append(worker)
+            self.connections.append(connection)
+
+    def run(self, end_time):
+        """Simulates the balls until `end_time`.
+
+        Arguments:
+            end_time (float): The time to simulate until.
+        """
+        while self.time < end_time:
+            window_end = min(self.time + self.window, end_time)
+            for connection in self.connections:
+                connection.send(["run", window_end, self.__changed])
+            first = min(connection.recv() for connection in self.connections)
+
+            for connection in self.connections:
+                connection.send(["commit", first])
+            self.__changed = [i for connection in self.connections
+                              for i in connection.recv()]
+
+            # Aim for windows about twice as long as the time between
+            # boundary events, so few rounds end without one and little work
+            # is undone.
+            if first < window_end:
+                self.window = 0.9 * self.window + 0.2 * (first - self.time)
+            else:
+                self.window *= 2
+            self.time = first
+            self.num_rounds += 1
+
+    def positions(self):
+        """Returns an (N, 2) array of the positions of the balls now."""
+        data = self.block.data
+        return data[:, :2] + data[:, 2:4] * (self.time -
+                                             data[:, ParticleBlock.T, None])
+
+    def velocities(self):
+        """Returns an (N, 2) array of the velocities of the balls."""
+        return np.array(self.block.data[:, 2:4])
+
+    def state(self):
+        """Returns the state now as an (N, 6) array like the initial state."""
+        data = self.block.data
+        return np.column_stack([self.positions(), self.velocities(),
+                                data[:, ParticleBlock.MASS],
+                                data[:, ParticleBlock.RADIUS]])
+
+    def close(self):
+        """Stops the workers and releases the shared memory.
+
+        Returns:
+            A list [ball collisions, wall collisions, pressure, events
+            executed, events undone] summed over the workers.
+        """
+        for connection in self.connections:
+            connection.send(["stop"])
+        replies = [connection.recv() for connection in self.connections]
+        totals = np.sum([reply[0] for reply in replies], axis = 0)
+        self.round_times = np.array([reply[1] for reply in replies]).T
+        for worker in self.workers:
+            worker.join()
+        self.block.close(unlink = True)
+
+        ball_collisions, wall_collisions, delta_p, executed, undone = totals
+        circumference = 2 * np.pi * self.container_radius
+        pressure = delta_p / (circumference * self.time) if self.time > 0 else 0
+        return [int(ball_collisions), int(wall_collisions), pressure,
+                int(executed), int(undone)]
+
+    @classmethod
+    def benchmark(cls, container_radius, state, end_time, worker_counts):
+        """Times the same run with each number of workers.
+
+        Every run must give exactly the same final state. Besides the wall
+        clock time, the time on one core per worker is estimated by adding
+        up the CPU time of the slowest worker in each round. This leaves out
+        the time spent passing messages between rounds, but it can be
+        measured on a machine with fewer cores than workers.
+
+        Arguments:
+            container_radius (float): The radius of the container.
+            state (np.array): An (N, 6) array of the initial state.
+            end_time (float): The time each run simulates until.
+            worker_counts (list): The numbers of workers to time.
+
+        Returns:
+            A list of rows [workers, rounds, events undone, events executed,
+            wall clock time, total CPU time of workers, estimated time on
+            one core per worker] for each run.
+        """
+        rows = []
+        first_state = None
+        for num_workers in worker_counts:
+            start = time.perf_counter()
+            engine = ParallelEngine(container_radius, state, num_workers)
+            engine.run(end_time)
+            final_state = engine.state()
+            totals = engine.close()
+            elapsed = time.perf_counter() - start
+
+            if first_state is None:
+                first_state = final_state
+            elif not np.array_equal(final_state, first_state):
+                raise Exception("Final state depends on the number of workers"
+                                " in ParallelEngine module.")
+            rows.append([num_workers, engine.num_rounds, totals[4],
+                         totals[3], elapsed, engine.round_times.sum(),
+                         engine.round_times.max(axis = 1).sum()])
+        return rows
+
+# Runs the simulation with parameters from Config.py. The guard stops the
+# simulation from running again when a worker process imports this module.
+if __name__ == "__main__":
+    if Config.SHOULD_USE_STATE_CACHE:
+        from StateCache import StateCache
+        initial_state = StateCache(Config.STATE_CACHE_DIRECTORY,
+                                   Config.STATE_CACHE_MAX_SIZE * 1e6).get({
+            "container_radius": Config.CONTAINER_RADIUS,
+            "num_balls": Config.NUMBER_OF_BALLS,
+            "default_mass": Config.DEFAULT_MASS,
+            "default_radius": Config.DEFAULT_BALL_RADIUS,
+            "rms_speed": Config.RMS_SPEED,
+            "inner_radius": Config.INNER_RADIUS,
+            "seed": Config.RANDOM_SEED})
+    else:
+        try:
+            initial_state = np.loadtxt(Config.INITIAL_STATE_FILE_NAME,
+                                       delimiter = ",", ndmin = 2)
+        except IOError:
+            raise Exception("File not found: create an initial state file in"
+                            " InitialState module.")
+    ValidateState(Config.CONTAINER_RADIUS).check(initial_state)
+
+    if Config.PARALLEL_BENCHMARK_WORKERS is not None:
+        # Time the run with each number of workers instead
+        print("Workers  Rounds  Undone  Executed  Wall (s)  CPU (s)  "
+              "Estimated (s)")
+        for row in ParallelEngine.benchmark(
+            Config.CONTAINER_RADIUS, initial_state, Config.PARALLEL_END_TIME,
+            Config.PARALLEL_BENCHMARK_WORKERS):
+            print("{:7d} {:7d} {:7d} {:9d} {:9.2f} {:8.2f} {:14.2f}".format(
+                *row))
+    else:
+        start = time.perf_counter()
+        engine = ParallelEngine(Config.CONTAINER_RADIUS, initial_state,
+                                Config.PARALLEL_NUM_WORKERS)
+        engine.run(Config.PARALLEL_END_TIME)
+        final_state = engine.state()
+        totals = engine.close()
+        ball_collisions, wall_collisions, pressure, executed, undone = totals
+        elapsed = time.perf_counter() - start
+
+        file_name = "{}_state.csv".format(int(time.time()))
+        with open(file_name, "wt") as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerows(final_state.tolist())
+
+        print("Time: {:.2f}s\nBall Collisions: {}\nWall Collisions: {}\n"
+              "Pressure: {:.4g}Pa\nRounds: {}\nEvents undone: {} of {}\n"
+              "Collisions / second: {:.0f}\nFinal state: {}".format(
+                  engine.time, ball_collisions, wall_collisions, pressure,
+                  engine.num_rounds, undone, executed,
+                  (ball_collisions + wall_collisions) / elapsed, file_name))
@@ -1,12 +1,15 @@
 import csv
+import numpy as np
 
 from Ball import Ball
+from ValidateState import ValidateState
 
 class ParseState():
     """Reads initial conditions from file and parses as an array of balls
 
     Responsible for:
     - Reading an initial state from file
+    - Checking the state with ValidateState
     - Parsing variables for each ball to produce Ball object
     - Returning list of Ball objects
 
@@ -19,14 +22,33 @@ class ParseState():
         file_name (str): The name of the initial conditions file to read from.
     """
     def __init__(self, App):
-        """Class reads and parses initial conditions from CSV file."""
+        """Class reads and parses initial conditions from CSV file.
+
+        If App has a StateCache, the state is loaded from the cache (or
+        generated and stored) with `App.initial_state_parameters` instead.
+
+        The whole state is validated before any ball is created, so an
+        invalid state raises an exception listing the offending rows.
+        """
         self.file_name = App.initial_state_file_name
         self.__balls = [] # Private attribute
+
+        if App.state_cache is not None:
+            rows = App.state_cache.get(App.initial_state_parameters)
+        else:
+            rows = self.read_file(self.file_name)
+
+        try:
+            state = np.array(list(rows), dtype = float)
+        except ValueError:
+            raise Exception("Initial state file must contain six numbers in"
+                            " each row in ParseState module.")
+        ValidateState(App.container_radius()).check(state)
         
-        for ball in self.read_file(self.file_name):
+        for ball in state:
             # Extract each of the parameters in the CSV file
-            position = [float(ball[0]), float(ball[1])]
-            velocity = [float(ball[2]), float(ball[3])]
+            position = ball[0:2]
+            velocity = ball[2:4]
             mass = float(ball[4])
             radius = float(ball[5])
             
@@ -0,0 +1,225 @@
+import numpy as np
+from multiprocessing import Process
+from multiprocessing import shared_memory
+from matplotlib.collections import EllipseCollection
+import pylab as pl
+
+class SnapshotBuffer():
+    """Double buffer of simulation snapshots held in shared memory.
+
+    The simulation writes each snapshot into the back slot and then flips the
+    front index, so a reader always finds the most recently completed snapshot
+    in the front slot. Readers use views directly into the shared block, so no
+    state is copied between processes.
+
+    Each slot starts with a sequence number which is odd while the slot is
+    being written (a seqlock). A reader which sees the sequence number change
+    while it was drawing knows that the snapshot was overwritten underneath it.
+
+    Layout of the shared block (all values are float64):
+        [front slot, finished flag]
+        2 x [sequence, time, ball collisions, wall collisions, kinetic energy,
+             RMS speed, pressure, (unused), x, y, vx, vy for every ball]
+
+    Arguments:
+        num_balls (int): The number of balls in each snapshot.
+        name (str = None): Name of an existing buffer to attach to. A new
+                           buffer is created if no name is given.
+
+    Attributes:
+        num_balls (int): The number of balls in each snapshot.
+        __shared_memory (SharedMemory): The shared memory block.
+        __control (np.array): View of [front slot, finished flag].
+        __slots (np.array): View of the two snapshot slots.
+    """
+    HEADER_SIZE = 8 # Number of values stored before the ball states
+
+    def __init__(self, num_balls, name = None):
+        """Creates or attaches to the shared memory block."""
+        self.num_balls = num_balls
+        slot_size = SnapshotBuffer.HEADER_SIZE + 4 * num_balls
+        size = 8 * (2 + 2 * slot_size)
+
+        if name is None:
+            self.__shared_memory = shared_memory.SharedMemory(create = True,
+                                                              size = size)
+        else:
+            self.__shared_memory = shared_memory.SharedMemory(name = name)
+
+        data = np.ndarray((2 + 2 * slot_size,), dtype = np.float64,
+                          buffer = self.__shared_memory.buf)
+        if name is None:
+            data[:] = 0.0
+
+        self.__control = data[:2]
+        self.__slots = data[2:].reshape(2, slot_size)
+
+    def name(self):
+        """Accessor method for the name of the shared memory block."""
+        return self.__shared_memory.name
+
+    def write(self, stats, positions, velocities):
+        """Writes a snapshot into the back slot and makes it the front slot.
+
+        Arguments:
+            stats (list): [time, ball collisions, wall collisions, kinetic
+                          energy, RMS speed, pressure] of the snapshot.
+            positions (np.array): An (N, 2) array of ball positions.
+            velocities (np.array): An (N, 2) array of ball velocities.
+        """
+        h = SnapshotBuffer.HEADER_SIZE
+        back = 1 - int(self.__control[0])
+        slot = self.__slots[back]
+        state = slot[h:].reshape(self.num_balls, 4)
+
+        slot[0] += 1 # Odd sequence number marks the slot as being written
+        slot[1:1 + len(stats)] = stats
+        state[:, :2] = positions
+        state[:, 2:] = velocities
+        slot[0] += 1 # Even sequence number marks the slot as complete
+
+        self.__control[0] = back
+
+    def read(self):
+        """Returns views of the most recently completed snapshot.
+
+        Returns:
+            A list [key, header, state] where `key` identifies the snapshot
+            (see is_valid), `header` is a view of the values listed in write()
+            and `state` is an (N, 4) view of [x, y, vx, vy] of every ball.
+        """
+        h = SnapshotBuffer.HEADER_SIZE
+        while True:
+            front = int(self.__control[0])
+            slot = self.__slots[front]
+            sequence = slot[0]
+
+            # An odd sequence number means the writer has flipped twice since
+            # we read the front index and is overwriting this slot, so retry.
+            if sequence % 2 == 0:
+                state = slot[h:].reshape(self.num_balls, 4)
+                return [(front, sequence), slot[1:h], state]
+
+    def is_valid(self, key):
+        """Checks that a snapshot returned by read() has not been overwritten.
+
+        Arguments:
+            key (tuple): The key returned by read().
+
+        Returns:
+            A bool which is True if the snapshot is still intact.
+        """
+        front, sequence = key
+        return self.__slots[front][0] == sequence
+
+    def finish(self):
+        """Marks that no further snapshots will be written."""
+        self.__control[1] = 1.0
+
+    def is_finished(self):
+        """Checks if the writer has published its final snapshot."""
+        return self.__control[1] == 1.0
+
+    def close(self, unlink = False):
+        """Releases the shared memory block.
+
+        Arguments:
+            unlink (bool): Flag to indicate if the block should be destroyed.
+                           Only the process which created the buffer should
+                           unlink it.
+        """
+        # Views into the block must be released before it can be closed
+        self.__control = None
+        self.__slots = None
+        self.__shared_memory.close()
+        if unlink:
+            self.__shared_memory.unlink()
+
+class Renderer(Process):
+    """Process which animates the simulation from a SnapshotBuffer.
+
+    Responsible for:
+    - Drawing the container, balls and velocity vectors
+    - Redrawing the latest completed snapshot once per animation frame
+    - Keeping the window open after the final snapshot has been drawn
+
+    The renderer never blocks the simulation: snapshots written faster than
+    the animation frame rate are simply skipped.
+
+    Arguments:
+        buffer_name (str): The name of the SnapshotBuffer to attach to.
+        radii (list): The radius of each ball.
+        container_radius (float): The radius of the container.
+        frame_pause (float): The pause time in seconds between frames.
+    """
+    def __init__(self, buffer_name, radii, container_radius, frame_pause):
+        """Initialises the renderer process."""
+        Process.__init__(self)
+        self.buffer_name = buffer_name
+        self.radii = list(radii)
+        self.container_radius = container_radius
+        self.frame_pause = frame_pause
+
+    def run(self):
+        """Draws snapshots until the simulation finishes or window is closed."""
+        num_balls = len(self.radii)
+        buffer = SnapshotBuffer(num_balls, name = self.buffer_name)
+        diameters = 2 * np.array(self.radii)
+
+        bounds = self.container_radius + 5 # Defines bounds of axis
+        fig = pl.figure()
+        ax = pl.axes(xlim = (-bounds, bounds), ylim = (-bounds, bounds))
+        ax.set_aspect("equal") # Sets equal aspect ratio
+        ax.add_artist(pl.Circle([0, 0], self.container_radius, ec = "b",
+                                fill = False, ls = "solid"))
+
+        key, header, state = buffer.read()
+        balls = EllipseCollection(diameters, diameters, np.zeros(num_balls),
+                                  units = "xy", offsets = state[:, :2],
+                                  offset_transform = ax.transData,
+                                  facecolors = "none", edgecolors = "r")
+        ax.add_collection(balls)
+        arrows = ax.quiver(state[:, 0], state[:, 1], state[:, 2], state[:, 3],
+                           angles = "xy", scale_units = "xy", scale = 1,
+                           color = "b", width = 0.004)
+        time_txt = ax.text(0.05, 0.01, "", fontsize = 7,
+                           transform = ax.transAxes)
+
+        last_key = None
+        while pl.fignum_exists(fig.number):
+            key, header, state = buffer.read()
+            if key != last_key:
+                rms_speed = header[4] if header[4] > 0 else 1.0
+                balls.set_offsets(state[:, :2])
+                arrows.set_offsets(state[:, :2])
+                arrows.set_UVC(state[:, 2] / rms_speed, state[:, 3] / rms_speed)
+                time_txt.set_text(Renderer.format_debug_text(num_balls,
+                                                             *header[:6]))
+
+                # A torn snapshot is simply redrawn on the next frame
+                if buffer.is_valid(key):
+                    last_key = key
+            elif buffer.is_finished():
+                break
+            pl.pause(self.frame_pause)
+
+        if pl.fignum_exists(fig.number):
+            pl.show() # Keep the final frame on screen until window is closed
+
+        buffer.close()
+
+    @classmethod
+    def format_debug_text(cls, num_balls, time, ball_collisions,
+                          wall_collisions, kinetic_energy, rms_speed, pressure):
+        """Formats debug string for rendering on animation.
+
+        Returns:
+            A formatted string containing the state variables for a frame.
+        """
+        total_collisions = wall_collisions + ball_collisions
+        txt_str = ("Time: {:.2f}s\nBalls: {:d}\nBall Collisions: {:d}"
+                   "\nWall Collisions: {:d}\nTotal Collisions: {:d}"
+                   "\nKE: {:.2f}J\nRMS Speed: {:.2f}m/s\nPressure: {:.2f}Pa")
+        return txt_str.format(time, int(num_balls), int(ball_collisions),
+                              int(wall_collisions), int(total_collisions),
+                              kinetic_energy, rms_speed, pressure)
@@ -0,0 +1,376 @@
+import csv
+import time
+import numpy as np
+
+from Ball import Ball
+import Config
+from InitialState import InitialState
+from ValidateState import ValidateState
+
+class ReplicaEngine():
+    """Simulates many independent small systems at once in lockstep.
+
+    Responsible for:
+    - Storing the state of K replicas of N balls in stacked arrays
+    - Advancing every replica to its own next collision in each step
+    - Measuring the same observables as App for every replica
+
+    Each replica has its own clock. In each step, every replica moves its
+    balls to the time of its own next collision and executes it, so a step
+    executes K collisions with a few array operations rather than K loops
+    over Ball objects. Collisions are predicted and executed with the same
+    formulas as Ball, applied to whole arrays.
+
+    The collision times are stored as absolute times in a full (K, N, N)
+    table (both halves), together with the earliest collision of each ball.
+    After a collision only the rows and columns of the colliding balls are
+    recalculated, and the earliest collision of a ball is only searched for
+    again if it involved one of them, so each step takes O(K N) time.
+
+    Arguments:
+        container_radius (float): The radius of the container.
+        states (np.array): A (K, N, 6) array of the initial state of every
+                           ball of every replica, with the columns of the
+                           initial state CSV file (x, y, vx, vy, mass,
+                           radius).
+        inner_radius (float = None): Radius of the inner circle used to
+                                     measure the inner concentration (the
+                                     container radius by default).
+
+    Attributes:
+        num_replicas (int): The number of replicas K.
+        num_balls (int): The number of balls N in each replica.
+        positions (np.array): A (K, N, 2) array of ball positions at the time
+                              of each replica.
+        velocities (np.array): A (K, N, 2) array of ball velocities.
+        masses (np.array): A (K, N) array of ball masses.
+        radii (np.array): A (K, N) array of ball radii.
+        time (np.array): The time of each replica.
+        delta_p (np.array): The total impulse on the wall in each replica.
+        ball_collisions (np.array): Ball collisions in each replica.
+        wall_collisions (np.array): Wall collisions in each replica.
+        b2b_table (np.array): A (K, N, N) array of the time of the next
+                              collision of each pair of balls.
+        b2w_table (np.array): A (K, N) array of the time of the next wall
+                              collision of each ball.
+        next_time (np.array): A (K, N) array of the earliest time in each row
+                              of b2b_table.
+        next_ball (np.array): A (K, N) array of the column of next_time.
+    """
+    def __init__(self, container_radius, states, inner_radius = None):
+        """Validates the states and builds the collision time tables."""
+        states = np.array(states, dtype = float)
+        if states.ndim != 3 or states.shape[2] != 6:
+            raise Exception("States must have shape (K, N, 6) in ReplicaEngine"
+                            " module.")
+        validator = ValidateState(container_radius)
+        for k, state in enumerate(states):
+            if not validator.validate(state):
+                raise Exception("Invalid state of replica {} in ReplicaEngine"
+                                " module:\n{}".format(k, validator.report()))
+
+        self.container_radius = container_radius
+        self.inner_radius = (inner_radius if inner_radius is not None
+                             else container_radius)
+        self.num_replicas, self.num_balls = states.shape[:2]
+        self.positions = np.ascontiguousarray(states[:, :, 0:2])
+        self.velocities = np.ascontiguousarray(states[:, :, 2:4])
+        self.masses = np.ascontiguousarray(states[:, :, 4])
+        self.radii = np.ascontiguousarray(states[:, :, 5])
+
+        K = self.num_replicas
+        N = self.num_balls
+        self.time = np.zeros(K)
+        self.delta_p = np.zeros(K)
+        self.ball_collisions = np.zeros(K, dtype = np.int64)
+        self.wall_collisions = np.zeros(K, dtype = np.int64)
+        self.__replicas = np.arange(K)
+
+        self.b2w_table = np.full((K, N), np.inf)
+        self.b2b_table = np.full((K, N, N), np.inf)
+        balls = np.arange(N)
+        for k in range(K):
+            # One replica at a time keeps the temporary arrays small
+            replicas = np.full(N, k)
+            self.b2w_table[k] = self.wall_times(replicas, balls)
+            self.b2b_table[k] = self.ball_times(replicas, balls)
+        self.next_ball = np.argmin(self.b2b_table, axis = 2)
+        self.next_time = np.take_along_axis(self.b2b_table,
+                                            self.next_ball[:, :, None],
+                                            axis = 2)[:, :, 0]
+
+    def wall_times(self, replicas, balls):
+        """Calculates the time of the next wall collision of some balls.
+
+        Arguments:
+            replicas (np.array): The replica of each ball.
+            balls (np.array): The index of each ball in its replica.
+
+        Returns:
+            An np.array of the absolute time of each collision.
+        """
+        x = self.positions[replicas, balls]
+        v = self.velocities[replicas, balls]
+        distance = self.container_radius - self.radii[replicas, balls]
+        a = v[:, 0] * v[:, 0] + v[:, 1] * v[:, 1]
+        b = 2 * (x[:, 0] * v[:, 0] + x[:, 1] * v[:, 1])
+        c = x[:, 0] * x[:, 0] + x[:, 1] * x[:, 1] - distance ** 2
+        return (self.time[replicas] +
+                ReplicaEngine.wall_collision_times(a, b, c))
+
+    def ball_times(self, replicas, balls):
+        """Calculates the times of the next collisions of some balls.
+
+        Arguments:
+            replicas (np.array): The replica of each ball.
+            balls (np.array): The index of each ball in its replica.
+
+        Returns:
+            An (M, N) np.array of the absolute time at which each ball will
+            collide with every ball of its replica (np.inf with itself).
+        """
+        dx = (self.positions[replicas, balls][:, None, :] -
+              self.positions[replicas])
+        dv = (self.velocities[replicas, balls][:, None, :] -
+              self.velocities[replicas])
+        contact = self.radii[replicas, balls][:, None] + self.radii[replicas]
+        a = dv[:, :, 0] * dv[:, :, 0] + dv[:, :, 1] * dv[:, :, 1]
+        b = 2 * (dx[:, :, 0] * dv[:, :, 0] + dx[:, :, 1] * dv[:, :, 1])
+        c = (dx[:, :, 0] * dx[:, :, 0] + dx[:, :, 1] * dx[:, :, 1] -
+             contact ** 2)
+
+        t = (self.time[replicas][:, None] +
+             ReplicaEngine.ball_collision_times(a, b, c, contact))
+        t[np.arange(len(balls)), balls] = np.inf
+        return t
+
+    @classmethod
+    def wall_collision_times(cls, a, b, c):
+        """Array version of Ball.wall_collision_time (see its docstring)."""
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            discriminant = b * b - 4 * a * c
+            root = np.sqrt(np.maximum(discriminant, 0.0))
+            t = np.where(b > 0.0, -2 * c / (b + root), (root - b) / (2 * a))
+            t = np.maximum(t, 0.0)
+        t[discriminant < 0.0] = np.inf
+        t[(c >= 0.0) & (b > 0.0)] = 0.0
+        t[a == 0.0] = np.inf
+        return t
+
+    @classmethod
+    def ball_collision_times(cls, a, b, c, contact):
+        """Array version of Ball.ball_collision_time (see its docstring)."""
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            discriminant = b * b - 4 * a * c
+            q = -0.5 * (b + np.copysign(np.sqrt(np.maximum(discriminant, 0.0)),
+                                        b))
+            first = q / a
+            second = c / q
+            first[~(first >= 0.0)] = np.inf # Also removes NaN
+            second[~(second >= 0.0) | (q == 0.0)] = np.inf
+            t = np.minimum(first, second)
+        t[(a == 0.0) | (discriminant < 0.0)] = np.inf
+        t[c <= 0.0] = 0.0
+        t[(a == 0.0) |
+          (b >= -2 * Ball.TOLERANCE * contact * np.sqrt(a))] = np.inf
+        return t
+
+    def step(self):
+        """Executes the next collision of every replica."""
+        replicas = self.__replicas
+        ball = np.argmin(self.next_time, axis = 1)
+        ball_time = self.next_time[replicas, ball]
+        wall = np.argmin(self.b2w_table, axis = 1)
+        wall_time = self.b2w_table[replicas, wall]
+
+        # As in App, a wall collision is only chosen if it is strictly first
+        is_wall = wall_time < ball_time
+        t = np.where(is_wall, wall_time, ball_time)
+        if not np.all(np.isfinite(t)):
+            raise Exception("No further collisions in a replica in"
+                            " ReplicaEngine module.")
+
+        # Move every ball of each replica to the time of its collision
+        dt = t - self.time
+        self.positions += self.velocities * dt[:, None, None]
+        self.time = t
+
+        # Wall collisions
+        w = np.flatnonzero(is_wall)
+        i = wall[w]
+        r = self.positions[w, i]
+        u = self.velocities[w, i]
+        v = u - r * ((2 * np.einsum("ij,ij->i", u, r)) /
+                     np.einsum("ij,ij->i", r, r))[:, None]
+        impulse = self.masses[w, i][:, None] * (v - u)
+        self.delta_p[w] += np.sqrt(np.einsum("ij,ij->i", impulse, impulse))
+        self.velocities[w, i] = v
+        self.wall_collisions[w] += 1
+
+        # Ball collisions, ordered as in App so the arithmetic is the same
+        b = np.flatnonzero(~is_wall)
+        first = ball[b]
+        second = self.next_ball[b, first]
+        i = np.minimum(first, second)
+        j = np.maximum(first, second)
+        m1 = self.masses[b, i][:, None]
+        m2 = self.masses[b, j][:, None]
+        u1 = self.velocities[b, i]
+        u2 = self.velocities[b, j]
+        dx = self.positions[b, i] - self.positions[b, j]
+        s = ((2 * np.einsum("ij,ij->i", dx, u1 - u2)) /
+             ((m1[:, 0] + m2[:, 0]) * np.einsum("ij,ij->i", dx, dx)))[:, None]
+        self.velocities[b, i] = u1 - (dx * m2 * s)
+        self.velocities[b, j] = u2 + (dx * m1 * s)
+        self.ball_collisions[b] += 1
+
+        self.recalculate(np.r_[w, b], np.r_[wall[w], i], b, j)
+
+    def recalculate(self, replicas, balls, second_replicas, second_balls):
+        """Recalculates the collision times of the balls which collided.
+
+        Arguments:
+            replicas (np.array): Every replica (in any order).
+            balls (np.array): The first colliding ball of each replica.
+            second_replicas (np.array): The replicas with ball collisions.
+            second_balls (np.array): The second colliding ball of each of
+                                     these replicas.
+        """
+        all_replicas = np.r_[replicas, second_replicas]
+        all_balls = np.r_[balls, second_balls]
+        self.b2w_table[all_replicas, all_balls] = self.wall_times(all_replicas,
+                                                                  all_balls)
+        times = self.ball_times(all_replicas, all_balls)
+        self.b2b_table[all_replicas, all_balls, :] = times
+        self.b2b_table[all_replicas, :, all_balls] = times
+
+        # Each group has at most one ball per replica, so the updates below
+        # do not repeat an index
+        stale = np.zeros((self.num_replicas, self.num_balls), dtype = bool)
+        groups = [[replicas, balls, times[:len(balls)]],
+                  [second_replicas, second_balls, times[len(balls):]]]
+        for k, c, column in groups:
+            next_time = self.next_time[k]
+            next_ball = self.next_ball[k]
+            # Balls whose earliest collision was with c must search again
+            stale[k] |= next_ball == c[:, None]
+            earlier = column < next_time
+            next_time[earlier] = column[earlier]
+            next_ball[earlier] = np.broadcast_to(c[:, None],
+                                                 next_ball.shape)[earlier]
+            self.next_time[k] = next_time
+            self.next_ball[k] = next_ball
+        stale[all_replicas, all_balls] = True
+
+        k, i = np.nonzero(stale)
+        rows = self.b2b_table[k, i]
+        self.next_ball[k, i] = np.argmin(rows, axis = 1)
+        self.next_time[k, i] = rows[np.arange(len(k)), self.next_ball[k, i]]
+
+    @classmethod
+    def replica_seeds(cls, seed, num_replicas):
+        """Derives an independent seed for each replica from a single seed.
+
+        Seeds are spawned from a SeedSequence rather than counted up from
+        `seed`, so they are always valid seeds of RandomState (below 2 ** 32)
+        and runs with neighbouring seeds (e.g. 42 and 43) do not share the
+        states of any replicas.
+
+        Arguments:
+            seed (int): The seed of the whole run (None for random seeds).
+            num_replicas (int): The number of replicas.
+
+        Returns:
+            A list of the seed (int or None) of each replica.
+        """
+        if seed is None:
+            return [None] * num_replicas
+        return [int(child.generate_state(1)[0]) for child in
+                np.random.SeedSequence(seed).spawn(num_replicas)]
+
+    def run(self, num_events):
+        """Executes `num_events` collisions in every replica."""
+        for _ in range(num_events):
+            self.step()
+
+    def kinetic_energy(self):
+        """Returns the total kinetic energy of each replica."""
+        speed_squared = np.einsum("kij,kij->ki", self.velocities,
+                                  self.velocities)
+        return 0.5 * np.einsum("ki,ki->k", self.masses, speed_squared)
+
+    def rms_speed(self):
+        """Returns the RMS speed of each replica."""
+        speed_squared = np.einsum("kij,kij->ki", self.velocities,
+                                  self.velocities)
+        return np.sqrt(np.mean(speed_squared, axis = 1))
+
+    def pressure(self):
+        """Returns the pressure of each replica (as calculated by App)."""
+        circumference = 2 * np.pi * self.container_radius
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            pressure = self.delta_p / (circumference * self.time)
+        return np.where(self.time > 0.0, pressure, 0.0)
+
+    def inner_concentration(self):
+        """Returns the number of balls within the inner radius of each."""
+        distance_squared = np.einsum("kij,kij->ki", self.positions,
+                                     self.positions)
+        return np.count_nonzero(distance_squared <= self.inner_radius ** 2,
+                                axis = 1)
+
+    def observables(self):
+        """Measures the observables of every replica.
+
+        Returns:
+            A dict of np.arrays with one value per replica, with the names
+            used by App and WriteOutput.
+        """
+        return {"time": self.time,
+                "ball_collisions": self.ball_collisions,
+                "wall_collisions": self.wall_collisions,
+                "kinetic_energy": self.kinetic_energy(),
+                "rms_speed": self.rms_speed(),
+                "pressure": self.pressure(),
+                "inner_concentration": self.inner_concentration()}
+
+    def save(self, file_name):
+        """Writes the observables of every replica to a CSV file."""
+        observables = self.observables()
+        try:
+            f = open(file_name, "wt")
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in ReplicaEngine module.")
+
+        with f as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerow(["replica"] + list(observables))
+            writer.writerows(zip(range(self.num_replicas),
+                                 *observables.values()))
+
+# Simulates REPLICA_COUNT replicas of the system in Config.py and saves their
+# observables to a CSV file (e.g. `1542627068_replicas.csv`)
+if __name__ == "__main__":
+    states = []
+    for seed in ReplicaEngine.replica_seeds(Config.RANDOM_SEED,
+                                            Config.REPLICA_COUNT):
+        states.append(InitialState(Config.CONTAINER_RADIUS, None,
+                                   Config.NUMBER_OF_BALLS,
+                                   Config.DEFAULT_MASS,
+                                   Config.DEFAULT_BALL_RADIUS,
+                                   Config.RMS_SPEED, Config.INNER_RADIUS,
+                                   seed).balls)
+
+    start = time.perf_counter()
+    engine = ReplicaEngine(Config.CONTAINER_RADIUS, states,
+                           Config.INNER_RADIUS)
+    engine.run(Config.REPLICA_NUM_EVENTS)
+    elapsed = time.perf_counter() - start
+
+    engine.save("{}_replicas.csv".format(int(time.time())))
+    print("{} replicas of {} balls, {} collisions each in {:.2f} s ({:.0f}"
+          " collisions/s)".format(engine.num_replicas, engine.num_balls,
+                                  Config.REPLICA_NUM_EVENTS, elapsed,
+                                  engine.num_replicas *
+                                  Config.REPLICA_NUM_EVENTS / elapsed))
@@ -0,0 +1,166 @@
+import numpy as np
+
+class RunController():
+    """Detects equilibration and stops the run once the pressure is precise.
+
+    Equilibration: in two dimensions the kinetic energy of each ball in
+    equilibrium follows an exponential distribution with mean kT (for any
+    mass), which is the Maxwell-Boltzmann distribution of speeds. Every
+    `check_interval` events the Kolmogorov-Smirnov (KS) distance D between
+    the kinetic energies of the balls (scaled by their mean) and the
+    exponential distribution is calculated from the velocity array. The
+    system is marked as equilibrated once the scaled distance is below
+    `ks_threshold` for `num_checks` checks in a row.
+
+    The mean kT is estimated from the same kinetic energies, so the usual KS
+    critical values (e.g. 1.36 at 5%) are far too lax (the Lilliefors case).
+    Instead D is scaled as (D - 0.2 / N) * (sqrt(N) + 0.26 + 0.5 / sqrt(N))
+    (Stephens, 1974), whose critical values for an exponential distribution
+    with an estimated mean hardly depend on N: 0.990 at 10%, 1.094 at 5% and
+    1.308 at 1%.
+
+    Production: after equilibration, the pressure is measured over blocks of
+    `block_size` events. Once there are at least `min_blocks` blocks, the
+    relative standard error of the mean of the block pressures is compared
+    with `pressure_tolerance`, and `should_stop` is set when it is met.
+
+    Arguments:
+        App (App): App object containing the state of the simulation.
+        check_interval (int): The number of events between KS checks.
+        ks_threshold (float): The scaled KS distance below which the system
+                              is considered equilibrated (1.094 is the 5%
+                              critical value).
+        num_checks (int): The number of checks in a row which must pass.
+        block_size (int): The number of events in each pressure block.
+        min_blocks (int): The minimum number of blocks before stopping.
+        pressure_tolerance (float): The relative standard error of the
+                                    pressure at which the run stops (None to
+                                    never stop early).
+
+    Attributes:
+        App (App): App object containing the state of the simulation.
+        ks_distance (float): The scaled KS distance at the last check.
+        num_passed (int): The number of checks in a row which have passed.
+        is_equilibrated (bool): Has the system equilibrated?
+        equilibration_time (float): The time at which the system equilibrated.
+        equilibration_event (int): The number of events at equilibration.
+        block_pressures (list): The pressure measured over each block.
+        should_stop (bool): Has the precision target been met?
+        __num_events (int): The number of events seen.
+        __block_start (list): The [time, delta_p] at the start of the block.
+    """
+    def __init__(self, App, check_interval, ks_threshold, num_checks,
+                 block_size, min_blocks, pressure_tolerance):
+        """Initialises the run controller."""
+        self.App = App
+        self.check_interval = check_interval
+        self.ks_threshold = ks_threshold
+        self.num_checks = num_checks
+        self.block_size = block_size
+        self.min_blocks = min_blocks
+        self.pressure_tolerance = pressure_tolerance
+
+        self.ks_distance = np.inf
+        self.num_passed = 0
+        self.is_equilibrated = False
+        self.equilibration_time = None
+        self.equilibration_event = None
+        self.block_pressures = []
+        self.should_stop = False
+        self.__num_events = 0
+        self.__block_start = None
+
+    def update(self):
+        """Updates the controller after each event."""
+        self.__num_events += 1
+
+        if not self.is_equilibrated:
+            if self.__num_events % self.check_interval == 0:
+                self.check_equilibrium()
+        elif ((self.__num_events - self.equilibration_event) %
+              self.block_size == 0):
+            self.end_block()
+
+    def check_equilibrium(self):
+        """Compares the kinetic energy distribution with Maxwell-Boltzmann."""
+        self.ks_distance = RunController.ks_distance_from_equilibrium(
+            self.App.masses, self.App.velocities)
+
+        if self.ks_distance < self.ks_threshold:
+            self.num_passed += 1
+        else:
+            self.num_passed = 0
+
+        if self.num_passed >= self.num_checks:
+            self.is_equilibrated = True
+            self.equilibration_time = self.App.time
+            self.equilibration_event = self.__num_events
+            self.__block_start = [self.App.time, self.App.delta_p]
+
+    @classmethod
+    def ks_distance_from_equilibrium(cls, masses, velocities):
+        """Calculates the scaled KS distance of the kinetic energies.
+
+        Arguments:
+            masses (np.array): The mass of each ball.
+            velocities (np.array): An (N, 2) array of ball velocities.
+
+        Returns:
+            The KS distance D between the distribution of kinetic energies
+            (scaled by their mean) and the exponential distribution, scaled
+            by Stephens' correction for an estimated mean.
+        """
+        n = len(masses)
+        kinetic_energy = 0.5 * masses * np.einsum("ij,ij->i", velocities,
+                                                  velocities)
+        x = np.sort(kinetic_energy / np.mean(kinetic_energy))
+        cdf = 1.0 - np.exp(-x)
+
+        # The empirical CDF steps from i / n to (i + 1) / n at x[i]
+        steps = np.arange(n + 1) / n
+        distance = max(np.max(steps[1:] - cdf), np.max(cdf - steps[:-1]))
+        return (distance - 0.2 / n) * (np.sqrt(n) + 0.26 + 0.5 / np.sqrt(n))
+
+    def end_block(self):
+        """Measures the pressure over the last block and checks precision."""
+        t, delta_p = self.__block_start
+        duration = self.App.time - t
+        if duration > 0:
+            self.block_pressures.append(
+                (self.App.delta_p - delta_p) /
+                (self.App.container_circumference * duration))
+        self.__block_start = [self.App.time, self.App.delta_p]
+
+        if (self.pressure_tolerance is not None and
+            len(self.block_pressures) >= self.min_blocks):
+            pressure, error = self.pressure()
+            if pressure > 0 and error / pressure < self.pressure_tolerance:
+                self.should_stop = True
+
+    def pressure(self):
+        """Calculates the mean production pressure and its standard error.
+
+        Returns:
+            A list [pressure, standard error] (NaN before two blocks).
+        """
+        blocks = np.array(self.block_pressures)
+        if len(blocks) < 2:
+            return [np.nan, np.nan]
+        return [np.mean(blocks),
+                np.std(blocks, ddof = 1) / np.sqrt(len(blocks))]
+
+    def summary(self):
+        """Formats the equilibration time and production pressure.
+
+        Returns:
+            A formatted string for printing at the end of the run.
+        """
+        if not self.is_equilibrated:
+            return "Not equilibrated (KS distance: {:.2f})".format(
+                self.ks_distance)
+
+        pressure, error = self.pressure()
+        return ("Equilibrated at: {:.2f}s (event {})\n"
+                "Pressure: {:.4g} +/- {:.2g}Pa ({} blocks)".format(
+                    self.equilibration_time, self.equilibration_event,
+                    pressure, error, len(self.block_pressures)))
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+from InitialState import InitialState
+
+class StateCache():
+    """Stores generated initial states so identical configurations load at once.
+
+    Each state is stored in a binary `.npy` file of shape (N, 6), with the
+    same columns as the initial state CSV file (x, y, vx, vy, mass, radius).
+    The file is named by the SHA-256 hash of the generation parameters and
+    random seed, so the same parameters always find the same state and any
+    change to them generates a new one.
+
+    When the files in the cache directory exceed `max_bytes`, the least
+    recently used states are deleted. Loading a state updates the
+    modification time of its file, which records when it was last used.
+
+    Only states generated with a seed are cached, since without a seed the
+    same parameters should give a different state each time.
+
+    Arguments:
+        directory (str): The directory the states are stored in.
+        max_bytes (int): The maximum total size of the stored states.
+
+    Attributes:
+        directory (str): The directory the states are stored in.
+        max_bytes (int): The maximum total size of the stored states.
+    """
+    VERSION = 1 # Change when InitialState generates states differently
+
+    def __init__(self, directory, max_bytes):
+        """Creates the cache directory if it does not exist."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        try:
+            os.makedirs(directory, exist_ok = True)
+        except OSError:
+            raise Exception("Cache directory cannot be created: ensure"
+                            " STATE_CACHE_DIRECTORY is valid in Config module.")
+
+    @classmethod
+    def key(cls, parameters):
+        """Calculates the key of a state from its generation parameters.
+
+        Arguments:
+            parameters (dict): The arguments of InitialState (other than the
+                               file name), including the seed.
+
+        Returns:
+            A hexadecimal string of the SHA-256 hash of the parameters.
+        """
+        text = json.dumps([StateCache.VERSION, parameters], sort_keys = True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def file_name(self, key):
+        """Returns the name of the file storing the state with `key`."""
+        return os.path.join(self.directory, "{}.npy".format(key))
+
+    def get(self, parameters):
+        """Loads the state with these parameters, generating it if needed.
+
+        Arguments:
+            parameters (dict): The keyword arguments of InitialState (other
+                               than the file name), including the seed.
+
+        Returns:
+            An np.array of shape (N, 6) of the initial state of every ball.
+        """
+        if parameters.get("seed") is None:
+            return StateCache.generate(parameters)
+
+        key = StateCache.key(parameters)
+        state = self.load(key)
+        if state is None:
+            state = StateCache.generate(parameters)
+            self.store(key, state)
+        return state
+
+    @classmethod
+    def generate(cls, parameters):
+        """Generates a state with InitialState without writing a CSV file."""
+        return np.array(InitialState(initial_state_file_name = None,
+                                     **parameters).balls, dtype = float)
+
+    def load(self, key):
+        """Loads a stored state.
+
+        Returns:
+            The stored np.array, or None if it is not in the cache.
+        """
+        file_name = self.file_name(key)
+        try:
+            state = np.load(file_name)
+        except (IOError, ValueError):
+            return None # Missing or incomplete file
+        os.utime(file_name) # Mark as most recently used
+        return state
+
+    def store(self, key, state):
+        """Stores a state and evicts old states if the cache is too large."""
+        file_name = self.file_name(key)
+        temp_file_name = "{}.{}.tmp".format(file_name, os.getpid())
+        try:
+            # Write to a temporary file first so other runs never load a
+            # partly written state
+            with open(temp_file_name, "wb") as f:
+                np.save(f, state)
+            os.replace(temp_file_name, file_name)
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in StateCache module.")
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used states until under max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append([stat.st_mtime, stat.st_size, entry.path])
+
+        total = sum(size for _, size, _ in entries)
+        # The newest state is always kept, even if it is too large
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass # Already removed by another run
+            total -= size
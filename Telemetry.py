@@ -0,0 +1,175 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+class Telemetry():
+    """Local server which publishes the progress of a running simulation.
+
+    The server runs an asyncio event loop in a background thread and answers
+    every HTTP request (e.g. `curl http://127.0.0.1:8000/`) with a JSON
+    snapshot of the quantities shown by App.format_debug_text, plus the
+    number of events simulated, events per second and the estimated time
+    remaining. It can listen on a local TCP port or a Unix socket.
+
+    The simulation never waits on clients. publish() builds a new snapshot
+    dictionary and replaces the reference to the old one, which is a single
+    atomic assignment, so no lock is shared between the simulation and the
+    server. The server only ever reads whole snapshots.
+
+    Responsible for:
+    - Running the server without blocking the simulation
+    - Converting the state of App into a snapshot
+    - Answering requests with the latest snapshot
+
+    Arguments:
+        num_events (int): The total number of events in the simulation, used
+                          to estimate the time remaining.
+        port (int = None): The TCP port to listen on (0 picks a free port).
+        socket_path (str = None): The path of a Unix socket to listen on
+                                  instead of a TCP port.
+
+    Attributes:
+        num_events (int): The total number of events in the simulation.
+        host (str): The address the server listens on.
+        port (int): The TCP port the server is listening on (or None).
+        socket_path (str): The Unix socket the server listens on (or None).
+        start_time (float): Wall-clock time at which the server started.
+        __snapshot (dict): The latest published snapshot.
+        __loop (asyncio.AbstractEventLoop): The event loop of the server.
+        __stop (asyncio.Event): Set to stop the server.
+        __ready (threading.Event): Set once the server is listening.
+        __error (Exception): Error raised while starting the server.
+        __thread (threading.Thread): The thread running the event loop.
+    """
+    HOST = "127.0.0.1" # Only local clients can connect
+
+    def __init__(self, num_events, port = None, socket_path = None):
+        """Starts the server in a background thread."""
+        self.num_events = num_events
+        self.host = Telemetry.HOST
+        self.port = port
+        self.socket_path = socket_path
+        self.start_time = time.perf_counter()
+        self.__snapshot = {}
+        self.__loop = None
+        self.__stop = None
+        self.__ready = threading.Event()
+        self.__error = None
+
+        self.__thread = threading.Thread(target = self.run, daemon = True)
+        self.__thread.start()
+        self.__ready.wait()
+        if self.__error is not None:
+            raise Exception("Telemetry server could not be started in "
+                            "Telemetry module: {}".format(self.__error))
+
+    def run(self):
+        """Runs the event loop of the server (in the background thread)."""
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        """Listens for clients until close() is called."""
+        self.__loop = asyncio.get_running_loop()
+        self.__stop = asyncio.Event()
+
+        try:
+            if self.socket_path is not None:
+                server = await asyncio.start_unix_server(
+                    self.handle, path = self.socket_path)
+            else:
+                server = await asyncio.start_server(self.handle, self.host,
+                                                    self.port)
+                self.port = server.sockets[0].getsockname()[1]
+        except OSError as error:
+            self.__error = error
+            self.__ready.set()
+            return
+
+        self.__ready.set()
+        async with server:
+            await self.__stop.wait()
+
+    async def handle(self, reader, writer):
+        """Answers a single HTTP request with the latest snapshot."""
+        try:
+            # The request is ignored apart from reading it to the blank line
+            # that ends the headers
+            line = await reader.readline()
+            while line not in [b"\r\n", b"\n", b""]:
+                line = await reader.readline()
+
+            body = json.dumps(self.__snapshot).encode()
+            header = ("HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n"
+                      "Content-Length: {}\r\n\r\n".format(len(body)))
+            writer.write(header.encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass # Client went away, nothing to do
+        finally:
+            writer.close()
+
+    def publish(self, App):
+        """Replaces the published snapshot with the current state of App.
+
+        Arguments:
+            App (App): App object containing the state of the simulation.
+        """
+        events = App.ball_collisions + App.wall_collisions
+        elapsed = time.perf_counter() - self.start_time
+        events_per_second = events / elapsed if elapsed > 0 else 0.0
+        eta = ((self.num_events - events) / events_per_second
+               if events_per_second > 0 else None)
+
+        self.__snapshot = {"time": App.time,
+                           "balls": App.num_balls,
+                           "ball_collisions": App.ball_collisions,
+                           "wall_collisions": App.wall_collisions,
+                           "total_collisions": events,
+                           "kinetic_energy": App.kinetic_energy,
+                           "rms_speed": App.rms_speed,
+                           "pressure": App.pressure,
+                           "overlaps": App.overlaps,
+                           "repeated_events": App.repeated_events,
+                           "events_per_second": events_per_second,
+                           "eta_seconds": eta,
+                           "debug_text": App.format_debug_text()}
+
+    def close(self):
+        """Stops the server and waits for its thread to finish."""
+        if self.__loop is not None and self.__thread.is_alive():
+            self.__loop.call_soon_threadsafe(self.__stop.set)
+        self.__thread.join()
+
+    @classmethod
+    def fetch(cls, port = None, socket_path = None, timeout = 5.0):
+        """Requests the latest snapshot from a running Telemetry server.
+
+        Arguments:
+            port (int = None): The TCP port of the server.
+            socket_path (str = None): The Unix socket of the server.
+            timeout (float = 5.0): Time in seconds to wait for the server.
+
+        Returns:
+            The snapshot (dict) published by the server.
+        """
+        if socket_path is not None:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address = socket_path
+        else:
+            client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = (Telemetry.HOST, port)
+
+        with client:
+            client.settimeout(timeout)
+            client.connect(address)
+            client.sendall(b"GET / HTTP/1.0\r\n\r\n")
+            response = b""
+            data = client.recv(4096)
+            while data:
+                response += data
+                data = client.recv(4096)
+
+        body = response.split(b"\r\n\r\n", 1)[1]
+        return json.loads(body.decode())
@@ -0,0 +1,76 @@
+import numpy as np
+
+class TrajectorySampler():
+    """Writes the displacement and velocity of every ball to chunked files.
+
+    At each sample time the displacement since t = 0 and the velocity of
+    every ball is stored. Every `chunk_size` samples the stored samples are
+    written to a `.npy` file (e.g. `1542627068_trajectory_0000.npy`) of shape
+    (samples, N, 4) holding [dx, dy, vx, vy], so memory use does not grow with
+    the length of the simulation. The sample times are written to
+    `1542627068_trajectory_times.npy` at the end.
+
+    The files are read by the Transport module, which calculates the mean
+    squared displacement and velocity autocorrelation function.
+
+    Arguments:
+        App (App): App object containing the state of the simulation.
+        chunk_size (int): The number of samples in each file.
+
+    Attributes:
+        file_name (str): The base name of the output files.
+        initial_positions (np.array): An (N, 2) array of positions at t = 0.
+        num_chunks (int): The number of chunk files written.
+        __times (list): The time of every sample.
+        __chunk (np.array): The samples which have not yet been written.
+        __num_samples (int): The number of samples in `__chunk`.
+    """
+    def __init__(self, App, chunk_size):
+        """Initialises the trajectory sampler."""
+        self.file_name = "{}_trajectory".format(App.run_name)
+        self.initial_positions = np.copy(App.positions)
+        self.num_chunks = 0
+        self.__times = []
+        self.__chunk = np.zeros((chunk_size, App.num_balls, 4))
+        self.__num_samples = 0
+
+    def sample(self, t, positions, velocities):
+        """Stores the displacements and velocities at time t.
+
+        Arguments:
+            t (float): The time of the sample.
+            positions (np.array): An (N, 2) array of ball positions at time t.
+            velocities (np.array): An (N, 2) array of ball velocities.
+        """
+        sample = self.__chunk[self.__num_samples]
+        sample[:, :2] = positions - self.initial_positions
+        sample[:, 2:] = velocities
+        self.__times.append(t)
+        self.__num_samples += 1
+
+        if self.__num_samples == len(self.__chunk):
+            self.write_chunk()
+
+    def write_chunk(self):
+        """Writes the stored samples to the next chunk file."""
+        if self.__num_samples == 0:
+            return
+
+        file_name = "{}_{:04d}.npy".format(self.file_name, self.num_chunks)
+        try:
+            np.save(file_name, self.__chunk[:self.__num_samples])
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in TrajectorySampler module.")
+        self.num_chunks += 1
+        self.__num_samples = 0
+
+    def save(self):
+        """Writes the remaining samples and the sample times."""
+        self.write_chunk()
+        try:
+            np.save("{}_times.npy".format(self.file_name),
+                    np.array(self.__times))
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in TrajectorySampler module.")
@@ -0,0 +1,168 @@
+import csv
+import glob
+import sys
+import numpy as np
+
+class Transport():
+    """Calculates transport properties from TrajectorySampler output files.
+
+    This is a standalone post-processing module. To run it, execute this file
+    with the run name (the timestamp of the output files) as its argument,
+    e.g. `python Transport.py 1542627068`. This writes the mean squared
+    displacement (MSD) and velocity autocorrelation function (VACF) against
+    lag time to `1542627068_transport.csv` and prints the diffusion
+    coefficients estimated from each.
+
+    Both functions are calculated with the FFT algorithm, which is
+    O(T log T) in the number of samples T rather than O(T^2), for a batch of
+    balls at once. Only one batch of balls is read from the chunk files at a
+    time (the files are memory-mapped), so runs much larger than memory can
+    be analysed.
+
+    In two dimensions, MSD(t) -> 4Dt and D = 1/2 * integral of VACF(t) dt.
+    Balls are confined to the container, so the MSD levels off at long lag
+    times and only lags up to `max_lag_fraction` of the run are used to
+    estimate D.
+
+    Arguments:
+        run_name (str): The timestamp at the start of the output file names.
+        batch_size (int = 1000): The number of balls read at once.
+        max_lag_fraction (float = 0.1): Fraction of the run used as the
+                                        maximum lag time when estimating D.
+
+    Attributes:
+        run_name (str): The timestamp at the start of the output file names.
+        batch_size (int): The number of balls read at once.
+        max_lag_fraction (float): Fraction of the run used to estimate D.
+        times (np.array): The time of every sample.
+        chunks (list): The memory-mapped chunk files in time order.
+        num_balls (int): The number of balls.
+    """
+    def __init__(self, run_name, batch_size = 1000, max_lag_fraction = 0.1):
+        """Finds and maps the chunk files of a run."""
+        self.run_name = run_name
+        self.batch_size = batch_size
+        self.max_lag_fraction = max_lag_fraction
+
+        try:
+            self.times = np.load("{}_trajectory_times.npy".format(run_name))
+        except IOError:
+            raise Exception("Trajectory files not found: run App.py with "
+                            "SHOULD_SAMPLE_TRAJECTORIES in Config module.")
+
+        file_names = sorted(glob.glob("{}_trajectory_[0-9]*.npy".format(
+            run_name)))
+        if len(file_names) == 0:
+            raise Exception("Trajectory files not found: run App.py with "
+                            "SHOULD_SAMPLE_TRAJECTORIES in Config module.")
+        self.chunks = [np.load(f, mmap_mode = "r") for f in file_names]
+        self.num_balls = self.chunks[0].shape[1]
+
+    def read_batch(self, start, end):
+        """Reads the samples of balls start to end - 1 from every chunk.
+
+        Returns:
+            An np.array of shape (T, end - start, 4) of [dx, dy, vx, vy].
+        """
+        return np.concatenate([chunk[:, start:end] for chunk in self.chunks])
+
+    @classmethod
+    def autocorrelation(cls, x):
+        """Calculates the time autocorrelation of vectors with the FFT.
+
+        Arguments:
+            x (np.array): An array of shape (T, B, 2) of B vector time series.
+
+        Returns:
+            An np.array of shape (T, B) whose element m is the mean over k of
+            x[k] . x[k + m].
+        """
+        T = len(x)
+        # Zero-padding to 2T makes the circular correlation of the FFT equal
+        # to the linear correlation
+        f = np.fft.rfft(x, n = 2 * T, axis = 0)
+        correlation = np.fft.irfft(f * np.conj(f), axis = 0)[:T].sum(axis = 2)
+        return correlation / (T - np.arange(T))[:, None]
+
+    @classmethod
+    def mean_squared_displacement(cls, x):
+        """Calculates the MSD of position time series with the FFT algorithm.
+
+        MSD(m) = S1(m) - 2 S2(m), where S2 is the autocorrelation of x and
+        S1(m) is the mean of x[k]^2 + x[k + m]^2, which is found from
+        cumulative sums.
+
+        Arguments:
+            x (np.array): An array of shape (T, B, 2) of B position series.
+
+        Returns:
+            An np.array of shape (T, B) of the MSD at each lag.
+        """
+        T = len(x)
+        d = np.einsum("tbi,tbi->tb", x, x)
+
+        # Sum over k < m of d[k] + d[T - 1 - k], with a leading zero
+        removed = np.cumsum(d + d[::-1], axis = 0)
+        removed = np.concatenate([np.zeros((1, d.shape[1])), removed[:-1]])
+        s1 = (2 * d.sum(axis = 0) - removed) / (T - np.arange(T))[:, None]
+
+        return s1 - 2 * Transport.autocorrelation(x)
+
+    def calculate(self):
+        """Calculates the MSD and VACF averaged over every ball.
+
+        Returns:
+            A list [lag_times, msd, vacf] of np.arrays.
+        """
+        T = len(self.times)
+        msd = np.zeros(T)
+        vacf = np.zeros(T)
+
+        for start in range(0, self.num_balls, self.batch_size):
+            end = min(start + self.batch_size, self.num_balls)
+            batch = self.read_batch(start, end)
+            msd += Transport.mean_squared_displacement(batch[:, :, :2]).sum(
+                axis = 1)
+            vacf += Transport.autocorrelation(batch[:, :, 2:]).sum(axis = 1)
+
+        lag_times = self.times - self.times[0]
+        return [lag_times, msd / self.num_balls, vacf / self.num_balls]
+
+    def diffusion_coefficients(self, lag_times, msd, vacf):
+        """Estimates the diffusion coefficient from the MSD and the VACF.
+
+        Returns:
+            A list [D from MSD slope, D from VACF integral].
+        """
+        m = max(2, int(self.max_lag_fraction * len(lag_times)))
+        slope = np.polyfit(lag_times[:m], msd[:m], 1)[0]
+        integral = np.sum(0.5 * (vacf[1:m] + vacf[:m - 1]) *
+                          np.diff(lag_times[:m])) # Trapezium rule
+        return [slope / 4, integral / 2]
+
+    def save(self):
+        """Calculates the MSD and VACF and writes them to a CSV file.
+
+        Returns:
+            A list [D from MSD slope, D from VACF integral].
+        """
+        lag_times, msd, vacf = self.calculate()
+
+        try:
+            f = open("{}_transport.csv".format(self.run_name), "wt")
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in Transport module.")
+
+        with f as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerows(zip(lag_times, msd, vacf))
+
+        return self.diffusion_coefficients(lag_times, msd, vacf)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        raise Exception("Usage: python Transport.py <run name>")
+    d_msd, d_vacf = Transport(sys.argv[1]).save()
+    print("D (MSD): {:.4g} m^2/s\nD (VACF): {:.4g} m^2/s".format(d_msd,
+                                                                  d_vacf))
@@ -0,0 +1,133 @@
+import numpy as np
+
+from Ball import Ball
+from NeighbourGrid import NeighbourGrid
+
+class ValidateState():
+    """Checks that an initial state can be simulated before it is used.
+
+    Responsible for:
+    - Finding balls with non-finite values (e.g. NaN or inf)
+    - Finding balls with a mass or radius which is not positive
+    - Finding balls which are not entirely inside the container
+    - Finding pairs of balls which overlap
+
+    Every check is performed on the whole (N, 6) state array at once, and
+    overlapping pairs are found with a NeighbourGrid, so validation takes
+    O(N) time. Positions are allowed the same relative rounding error as in
+    the simulation (Ball.TOLERANCE), so balls which touch are valid.
+
+    Arguments:
+        container_radius (float): The radius of the container.
+
+    Attributes:
+        container_radius (float): The radius of the container.
+        problems (list): A list [description, rows] of every problem found by
+                         the last call to validate(), where rows is an
+                         np.array of the offending rows (pairs of rows for
+                         overlaps).
+    """
+    MAX_ROWS_SHOWN = 10 # Number of offending rows listed for each problem
+
+    def __init__(self, container_radius):
+        """Initialises the validator with the size of the container."""
+        self.container_radius = container_radius
+        self.problems = []
+
+    def validate(self, state):
+        """Finds every problem with a state.
+
+        Arguments:
+            state (np.array): An (N, 6) array of the state of every ball, with
+                              the columns of the initial state CSV file
+                              (x, y, vx, vy, mass, radius).
+
+        Returns:
+            True if the state is valid, otherwise False (see `problems`).
+        """
+        state = np.asarray(state, dtype = float)
+        self.problems = []
+        if state.ndim != 2 or state.shape[1] != 6:
+            self.problems.append(["State does not have 6 columns",
+                                  np.zeros(0, dtype = np.int64)])
+            return False
+        if len(state) == 0:
+            self.problems.append(["State contains no balls",
+                                  np.zeros(0, dtype = np.int64)])
+            return False
+
+        positions = state[:, 0:2]
+        masses = state[:, 4]
+        radii = state[:, 5]
+
+        is_finite = np.isfinite(state).all(axis = 1)
+        self.add_problem("Non-finite values", ~is_finite)
+
+        # Comparisons with NaN are False, so these only find finite rows
+        self.add_problem("Mass is not positive", masses <= 0)
+        self.add_problem("Radius is not positive", radii <= 0)
+
+        distance = self.container_radius - radii
+        is_outside = ((np.einsum("ij,ij->i", positions, positions) >
+                       (distance * (1 + Ball.TOLERANCE)) ** 2) |
+                      (distance < 0))
+        self.add_problem("Ball is outside the container", is_outside)
+
+        # Only finite balls with a positive radius inside the container can
+        # overlap. This also keeps the grid within the container, so huge
+        # positions cannot overflow its cell keys.
+        valid = np.flatnonzero(is_finite & (radii > 0) & ~is_outside)
+        if len(valid) > 1:
+            grid = NeighbourGrid(2 * radii[valid].max())
+            i, j, d = grid.pairs(positions[valid])
+            i = valid[i]
+            j = valid[j]
+            overlap = d < (radii[i] + radii[j]) * (1 - Ball.TOLERANCE)
+            if overlap.any():
+                self.problems.append(["Balls overlap",
+                                      np.column_stack([i[overlap],
+                                                       j[overlap]])])
+
+        return len(self.problems) == 0
+
+    def add_problem(self, description, is_offending):
+        """Records a problem if any row is offending.
+
+        Arguments:
+            description (str): Description of the problem.
+            is_offending (np.array): Boolean array which is True for every
+                                     offending row.
+        """
+        rows = np.flatnonzero(is_offending)
+        if len(rows) > 0:
+            self.problems.append([description, rows])
+
+    def report(self):
+        """Describes the problems found by the last call to validate().
+
+        Returns:
+            A string with one line per problem, listing its first rows
+            (counted from 0, e.g. row 0 is the first ball in the file).
+        """
+        lines = []
+        for description, rows in self.problems:
+            if len(rows) == 0:
+                lines.append(description) # Applies to the whole state
+                continue
+            shown = [str(list(row)) if np.ndim(row) else str(row)
+                     for row in rows[:ValidateState.MAX_ROWS_SHOWN].tolist()]
+            more = len(rows) - len(shown)
+            lines.append("{} ({} found): rows {}{}".format(
+                description, len(rows), ", ".join(shown),
+                " and {} more".format(more) if more > 0 else ""))
+        return "\n".join(lines)
+
+    def check(self, state):
+        """Raises an exception describing the problems if a state is invalid.
+
+        Arguments:
+            state (np.array): An (N, 6) array of the state of every ball.
+        """
+        if not self.validate(state):
+            raise Exception("Invalid initial state in ValidateState module:\n"
+                            + self.report())
@@ -1,130 +1,253 @@
 import csv
+import json
+import numpy as np
 from numpy import linalg as la
-import time
 
 class WriteOutput():
     """Outputs statistical data to CSV file for analysis.
-    
+
+    The quantities written are chosen by name from the registries below, and
+    only the chosen quantities are measured. System observables (e.g.
+    "pressure") are measured after every collision and written to
+    `1542627068.csv`. Ball observables (e.g. "speed") are measured for every
+    ball at the start and end of the simulation and written to
+    `1542627068_states.csv`. The first row of each file labels its columns,
+    and `1542627068_schema.json` describes every column and its units.
+
+    Each registry maps the name of an observable to [name of the method which
+    measures it, column names, units, description]. To add an observable, add
+    a method which returns a list of values (one per column, or one array per
+    column for ball observables) and register it.
+
     Arguments:
         App (App): App object containing all information about the simulation,
                    which is used to measure observables of the system.
+        observables (list = None): Names of the system observables to write
+                                   (RMS speed by default).
+        ball_observables (list = None): Names of the ball observables to write
+                                        (speed by default).
     """
-    def __init__(self, App):
+    OBSERVABLES = {
+        "kinetic_energy": ["measure_kinetic_energy", ["kinetic_energy"],
+                           "J", "Total kinetic energy"],
+        "rms_speed": ["measure_rms_speed", ["rms_speed"], "m/s",
+                      "Root mean square speed"],
+        "pressure": ["measure_pressure", ["pressure"], "Pa",
+                     "Pressure on the container averaged since t = 0"],
+        "inner_concentration": ["measure_inner_concentration",
+                                ["inner_concentration"], "balls",
+                                "Number of balls within the inner radius"],
+        "momentum": ["measure_momentum", ["momentum_x", "momentum_y"],
+                     "kg m/s", "Total momentum"],
+        "mean_free_path": ["measure_mean_free_path", ["mean_free_path"], "m",
+                           "Mean free path averaged over balls which have"
+                           " collided"],
+    }
+    BALL_OBSERVABLES = {
+        "speed": ["measure_speeds", ["speed"], "m/s", "Speed of each ball"],
+        "kinetic_energy": ["measure_kinetic_energies", ["kinetic_energy"],
+                           "J", "Kinetic energy of each ball"],
+        "mean_free_path": ["measure_mean_free_paths", ["mean_free_path"], "m",
+                           "Mean free path of each ball"],
+        "momentum": ["measure_momenta", ["momentum_x", "momentum_y"],
+                     "kg m/s", "Momentum of each ball"],
+        "position": ["measure_positions", ["x", "y"], "m",
+                     "Position of each ball"],
+        "displacement": ["measure_displacements",
+                         ["displacement_x", "displacement_y"], "m",
+                         "Displacement of each ball since t = 0"],
+    }
+
+    def __init__(self, App, observables = None, ball_observables = None):
         self.__output = [] # No accessor method (not accessed outside class)
+        self.__states = []
         self.App = App
         self.should_output = App.should_output
+        self.observables = (observables if observables is not None
+                            else ["rms_speed"])
+        self.ball_observables = (ball_observables
+                                 if ball_observables is not None
+                                 else ["speed"])
+
+        for name in self.observables:
+            if name not in WriteOutput.OBSERVABLES:
+                raise Exception("Unknown observable `{}` in WriteOutput "
+                                "module.".format(name))
+        for name in self.ball_observables:
+            if name not in WriteOutput.BALL_OBSERVABLES:
+                raise Exception("Unknown ball observable `{}` in WriteOutput "
+                                "module.".format(name))
+
+        # Look up the measuring methods once rather than at every collision
+        self.__measures = [getattr(self, WriteOutput.OBSERVABLES[name][0])
+                           for name in self.observables]
+        self.__ball_measures = [
+            getattr(self, WriteOutput.BALL_OBSERVABLES[name][0])
+            for name in self.ball_observables]
 
     def print_line(self):
-        """Measures key observables of system."""
+        """Measures the chosen system observables."""
         if self.should_output == True:
-            t = self.App.time
-            state = self.continuous_measurements()
-    
-            # Index of state refers to different output quantities
-            # 0) Total kinetic energy
-            # 1) RMS speed
-            # 2) Pressure
-            # 3) Inner Concentration
-            
-            # Change the index below to output different quantities
-            out = [t, state[1]] # Will output time and RMS speed
+            out = [self.App.time]
+            for measure in self.__measures:
+                out.extend(measure())
             self.__output.append(out)
 
     def print_state(self):
-        """Measures key observables of every ball in system."""
+        """Measures the chosen observables of every ball in system."""
         if self.should_output == True:
-            t = self.App.time
-            state = self.state_measurements()
-    
-            # Index of state refers to different quantities
-            # 0) Particle speeds
-            # 1) Kinetic energies
-            # 2) Mean free paths
-            # 3) Momentum
-            
-            # Change the index below to output different quantities
-            out = state[0]
-            out.insert(0, t) # Attach the time variable as the first output index
-            self.__output.append(out)
+            out = [self.App.time]
+            for measure in self.__ball_measures:
+                for values in measure():
+                    out.extend(values)
+            self.__states.append(out)
 
-    def continuous_measurements(self):
-        """Measures state variables and returns array of value for each ball.
-        
-        This calculation is less intensive than state_measurements so may be
-        performed at each collision.
+    def measure_kinetic_energy(self):
+        """Total kinetic energy (already calculated by App.update_state)."""
+        return [self.App.kinetic_energy]
 
-        Returns:
-            A list whose elements are:
-            0) Total kinetic energy
-            1) RMS speed
-            2) Pressure
-            3) Inner Concentration (R <= 50)
-        """
-        kinetic_energy = 0.0
-        rms_speed_sum = 0.0
-        pressure = ((self.App.delta_p /
-                   (Self.App.self.container_circumference * self.App.time))
-                   if self.App.time > 0.0 else 0.0)
-        inner_concentration = 0
-
-        for b in self.App.balls():
-            kinetic_energy += b.kinetic_energy()
-            rms_speed_sum += b.speed_squared()
-            inner_concentration += 1 if la.norm(b.position()) <= 50 else 0
-
-        return [kinetic_energy, rms_speed_sum / self.App.balls_in_container,
-                pressure, inner_concentration]
-
-    def state_measurements(self):
-        """Measures state variables and returns array of value for each ball.
-        
-        Warning: This is an expensive calculation so should not be performed
-                 for every collision. The state measurement is used to observe
-                 the state at the start and end to determine initial and
-                 equilibrium states.
+    def measure_rms_speed(self):
+        """RMS speed (already calculated by App.update_state)."""
+        return [self.App.rms_speed]
+
+    def measure_pressure(self):
+        """Pressure (already calculated by App.update_state)."""
+        return [self.App.pressure]
+
+    def measure_inner_concentration(self):
+        """Number of balls with R <= App.inner_radius."""
+        positions = self.App.positions
+        return [np.count_nonzero(np.einsum("ij,ij->i", positions, positions)
+                                 <= self.App.inner_radius ** 2)]
+
+    def measure_momentum(self):
+        """Total momentum [px, py] of all balls."""
+        return list(np.dot(self.App.masses, self.App.velocities))
+
+    def measure_mean_free_path(self):
+        """Mean free path averaged over the balls which have collided.
+
+        Balls with no collisions yet have no free path, so they are left out
+        rather than counted as 0. This is nan until a ball has collided."""
+        has_collided = self.App.ball_collision_counts > 0
+        if not has_collided.any():
+            return [np.nan]
+        return [np.mean(self.measure_mean_free_paths()[0][has_collided])]
+
+    def measure_speeds(self):
+        """Speed of each ball."""
+        return [la.norm(self.App.velocities, axis = 1)]
+
+    def measure_kinetic_energies(self):
+        """Kinetic energy of each ball."""
+        velocities = self.App.velocities
+        return [0.5 * self.App.masses *
+                np.einsum("ij,ij->i", velocities, velocities)]
+
+    def measure_mean_free_paths(self):
+        """Mean free path of each ball."""
+        collisions = self.App.ball_collision_counts
+        mean_free_paths = np.zeros(self.App.num_balls)
+        np.divide(self.App.distance_travelled, collisions,
+                  out = mean_free_paths, where = collisions > 0)
+        return [mean_free_paths]
+
+    def measure_momenta(self):
+        """Momentum [px, py] of each ball."""
+        momenta = self.App.masses[:, None] * self.App.velocities
+        return [momenta[:, 0], momenta[:, 1]]
+
+    def measure_positions(self):
+        """Position [x, y] of each ball."""
+        return [self.App.positions[:, 0], self.App.positions[:, 1]]
+
+    def measure_displacements(self):
+        """Displacement [dx, dy] of each ball since t = 0."""
+        displacements = self.App.positions - self.App.initial_positions
+        return [displacements[:, 0], displacements[:, 1]]
+
+    def header(self):
+        """Column names of the system observables file."""
+        columns = ["time"]
+        for name in self.observables:
+            columns.extend(WriteOutput.OBSERVABLES[name][1])
+        return columns
+
+    def state_header(self):
+        """Column names of the ball observables file (e.g. `speed_0`)."""
+        columns = ["time"]
+        for name in self.ball_observables:
+            for column in WriteOutput.BALL_OBSERVABLES[name][1]:
+                columns.extend("{}_{}".format(column, i)
+                               for i in range(self.App.num_balls))
+        return columns
+
+    def schema(self):
+        """Describes the columns of each output file.
 
         Returns:
-            A list whose elements are:
-            0) A list of the speeds of all particles
-            1) A list of the kinetic energies of all particles
-            2) A list of the mean free paths of all partciles
-            3) A list of the momenta of all particles as [px, py]
+            A dict which can be written as JSON.
         """
-        speed = []
-        kinetic_energy = []
-        mean_free_path = []
-        momentum = []
-        for b in self.App.balls():
-            speed.append(la.norm(b.velocity()))
-            kinetic_energy.append(b.kinetic_energy())
-            mean_free_path.append(b.mean_free_path())
-            momentum.extend(b.momentum())
-
-        return [speed, kinetic_energy, mean_free_path, momentum]
+        def describe(registry, names, per_ball):
+            columns = [{"name": "time", "units": "s",
+                        "description": "Time of the simulation"}]
+            for name in names:
+                _, column_names, units, description = registry[name]
+                for column in column_names:
+                    columns.append({"name": column + ("_<ball>" if per_ball
+                                                      else ""),
+                                    "observable": name, "units": units,
+                                    "description": description})
+            return columns
+
+        run = self.App.run_name
+        return {"run": run,
+                "num_balls": self.App.num_balls,
+                "files": {
+                    "{}.csv".format(run): describe(
+                        WriteOutput.OBSERVABLES, self.observables, False),
+                    "{}_states.csv".format(run): describe(
+                        WriteOutput.BALL_OBSERVABLES, self.ball_observables,
+                        True)}}
 
     def save(self):
-        """Writes contents of `self.__output` to a CSV file.
-        
-        The name of the CSV file is dynamically generated using the current
-        timestamp. This is so that previous data files are not overwritten when
-        this method is called."""
-        
+        """Writes the measurements to CSV files and the schema to JSON.
+
+        The name of each file starts with the timestamp at which the
+        simulation started (App.run_name). This is so that previous data files
+        are not overwritten and all files of one run share the same name."""
+
         if self.should_output == True:
-            file_name = "{}.csv".format(int(time.time()))
-            
+            run = self.App.run_name
+            self.write_csv("{}.csv".format(run), self.header(),
+                           self.format_output(self.__output))
+            self.write_csv("{}_states.csv".format(run), self.state_header(),
+                           self.format_output(self.__states))
+
             try:
-                f = open(file_name, "wt")
+                f = open("{}_schema.json".format(run), "wt")
             except IOError:
-                raise Exception("Unknown error occurred while outputting data"
+                raise Exception("Unknown error occurred while outputting data "
                                 "in WriteOutput module.")
-            
-            with f as csv_file:
-                writer = csv.writer(csv_file, lineterminator = "\n")
-                writer.writerows(self.__output)
-    
-    def format_output(self):
-        """Outputs each row in `self.__output` for writing to file.
-        
+            with f as json_file:
+                json.dump(self.schema(), json_file, indent = 2)
+
+    def write_csv(self, file_name, header, rows):
+        """Writes a header row and then `rows` to a CSV file."""
+        try:
+            f = open(file_name, "wt")
+        except IOError:
+            raise Exception("Unknown error occurred while outputting data "
+                            "in WriteOutput module.")
+
+        with f as csv_file:
+            writer = csv.writer(csv_file, lineterminator = "\n")
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def format_output(self, output):
+        """Outputs each row in `output` for writing to file.
+
         Yields:
             line [list]: A list containing state variables where the first
                          element is the time in the simulation and subsequent
@@ -133,5 +256,5 @@ class WriteOutput():
 
         # A yield call is more efficient than writing to the file directly
         # because it writes one row at a time (so less memory-intensive)
-        for line in self.__output:
+        for line in output:
             yield line
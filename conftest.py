@@ -0,0 +1,23 @@
+import pytest
+
+from InitialState import InitialState
+
+@pytest.fixture
+def state_file(tmp_path, monkeypatch):
+    """Writes a small initial state in a temporary working directory.
+
+    App writes its output files to the working directory, so every test
+    which runs App is moved to `tmp_path`.
+
+    Returns:
+        A function which writes a state of `num_balls` balls of radius 0.5
+        in a container of radius 10 and returns the name of its CSV file.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MPLBACKEND", "Agg")
+
+    def write(num_balls = 40, seed = 1):
+        file_name = "state_{}_{}.csv".format(num_balls, seed)
+        InitialState(10.0, file_name, num_balls, 1.0, 0.5, 1.0, seed = seed)
+        return file_name
+    return write
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from App import App
+from EventLog import EventLog, EventReplay
+
+@pytest.fixture
+def recorded(state_file):
+    """Returns a short App run recorded with keyframes and its replay."""
+    app = App(10.0, 300, False, False, 0.0, state_file(),
+              should_record_events = True, keyframe_interval = 50)
+    return [app, EventReplay("{}.events".format(app.run_name))]
+
+def test_replay_matches_app(recorded):
+    app, replay = recorded
+    assert len(replay.events) == 300
+    positions, velocities = replay.state_at(app.time)
+    assert np.array_equal(positions, app.positions)
+    assert np.array_equal(velocities, app.velocities)
+
+def test_replay_between_keyframes(recorded):
+    app, replay = recorded
+    keyframes = replay.keyframes
+    assert len(keyframes) == 7 # Including t = 0
+    for k in range(len(keyframes) - 1):
+        # Replaying from each keyframe reaches the next one exactly
+        positions = np.array(keyframes[k]["state"][:, :2])
+        velocities = np.array(keyframes[k]["state"][:, 2:])
+        time = replay.replay(positions, velocities, keyframes[k]["event"],
+                             keyframes[k + 1]["event"])
+        assert time == keyframes[k + 1]["time"]
+        assert np.array_equal(positions, keyframes[k + 1]["state"][:, :2])
+        assert np.array_equal(velocities, keyframes[k + 1]["state"][:, 2:])
+
+def test_keyframes_do_not_change_states(recorded):
+    app, replay = recorded
+    times = np.linspace(0.0, app.time, 23)
+    times = np.sort(np.r_[times, replay.keyframe_times[1:]])
+    with_keyframes = list(replay.states_at(times))
+
+    replay.keyframes = None
+    replay.keyframe_times = None
+    without_keyframes = list(replay.states_at(times))
+    for a, b in zip(with_keyframes, without_keyframes):
+        assert np.array_equal(a[0], b[0])
+        assert np.array_equal(a[1], b[1])
+
+def test_find_event_at_block_edges(recorded, monkeypatch):
+    _, replay = recorded
+    monkeypatch.setattr(EventReplay, "BLOCK_SIZE", 7)
+    times = np.array(replay.events["time"])
+    queries = np.r_[-1.0, times, (times[1:] + times[:-1]) / 2, times[-1] + 1]
+    for t in queries:
+        expected = int(np.searchsorted(times, t, side = "right"))
+        # Every search start before the answer, including block edges
+        for index in sorted({0, expected, max(expected - 7, 0),
+                             max(expected - 1, 0)}):
+            assert replay.find_event(t, index) == expected
+
+def test_keyframe_before(recorded):
+    _, replay = recorded
+    times = replay.keyframe_times
+    assert replay.keyframe_before(-1.0)["event"] == 0
+    for k, t in enumerate(times):
+        assert replay.keyframe_before(t)["event"] == 50 * k
+        if k > 0:
+            assert (replay.keyframe_before(np.nextafter(t, -np.inf))["event"]
+                    == 50 * (k - 1))
+    assert replay.keyframe_before(times[-1] + 1.0)["event"] == 300
+
+    replay.keyframes = None
+    replay.keyframe_times = None
+    assert replay.keyframe_before(1.0) is None
+
+def test_keyframes_only_index_written_events(tmp_path):
+    positions = np.array([[0.0, 0.0], [2.0, 0.0]])
+    velocities = np.array([[1.0, 0.0], [-1.0, 0.0]])
+    log = EventLog(str(tmp_path / "run.events"), positions, velocities,
+                   np.ones(2), np.ones(2), keyframe_interval = 10)
+    for i in range(25):
+        log.record(0.1, [i % 2], [velocities[i % 2]])
+        replay = EventReplay(log.file_name)
+        assert len(replay.events) >= replay.keyframes[-1]["event"]
+    assert len(replay.keyframes) == 3
+    log.close()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from App import App
+from InvariantMonitor import InvariantMonitor
+
+def perpendicular(v):
+    """Returns `v` rotated by 90 degrees."""
+    return np.array([-v[1], v[0]])
+
+def corrupt_energy(app):
+    # Ball 0 is not part of the collision, which leaves ball 1 unchanged
+    app.velocities[0] *= 1.1
+
+def corrupt_momentum(app):
+    # The same impulse on both balls, along r1 + r2 so that the angular
+    # momentum is unchanged
+    impulse = 0.1 * (app.positions[0] + app.positions[1])
+    app.velocities[0] += impulse / app.masses[0]
+    app.velocities[1] += impulse / app.masses[1]
+
+def corrupt_ball_angular_momentum(app):
+    # Equal and opposite impulses which are not along the line of centres
+    impulse = 0.1 * perpendicular(app.positions[0] - app.positions[1])
+    app.velocities[0] += impulse / app.masses[0]
+    app.velocities[1] -= impulse / app.masses[1]
+
+def corrupt_wall_speed(app):
+    # A radial impulse, which does not change the angular momentum
+    app.velocities[0] += 0.1 * app.positions[0]
+
+def corrupt_wall_angular_momentum(app):
+    # The speed is unchanged but the impulse is not radial
+    app.velocities[0] = perpendicular(app.velocities[0])
+
+# [corruption, colliding balls, description of the violation]
+CASES = [[corrupt_energy, [1], "Total energy drifted"],
+         [corrupt_momentum, [0, 1], "Momentum not conserved"],
+         [corrupt_ball_angular_momentum, [0, 1],
+          "Angular momentum not conserved"],
+         [corrupt_wall_speed, [0], "Speed not conserved"],
+         [corrupt_wall_angular_momentum, [0],
+          "Angular momentum not conserved"]]
+
+def corrupted_collision(state_file, should_fail_hard, case):
+    """Reports a collision which violates a conservation law to a monitor.
+
+    Returns:
+        The InvariantMonitor which checked the collision.
+    """
+    corrupt, ball_ids, _ = case
+    app = App(10.0, 20, False, False, 0.0, state_file())
+    # Energy is only checked in the energy case, so only one law is broken
+    energy_interval = 1 if corrupt is corrupt_energy else 10 ** 9
+    monitor = InvariantMonitor(app, energy_interval, 1, None, 1e-8,
+                               should_fail_hard)
+    monitor.before_collision(ball_ids)
+    corrupt(app)
+    monitor.after_collision(ball_ids)
+    return monitor
+
+@pytest.mark.parametrize("case", CASES)
+def test_hard_failure(state_file, case):
+    with pytest.raises(Exception, match = case[2]):
+        corrupted_collision(state_file, True, case)
+
+@pytest.mark.parametrize("case", CASES)
+def test_soft_failure(state_file, case):
+    monitor = corrupted_collision(state_file, False, case)
+    assert len(monitor.violations) == 1
+    event, time, description = monitor.violations[0]
+    assert event == 1
+    assert description.startswith(case[2])
+
+def test_overlap_scan(state_file):
+    app = App(10.0, 20, False, False, 0.0, state_file())
+    app.positions[0] = [0.0, 0.0]
+    app.positions[1] = [0.5, 0.0] # Radii are 0.5
+    monitor = InvariantMonitor(app, 10 ** 9, 10 ** 9, 1, 1e-8, False)
+    monitor.before_collision([2])
+    monitor.after_collision([2])
+    assert len(monitor.violations) == 1
+    assert "Balls overlap" in monitor.violations[0][2]
+    assert "[0, 1]" in monitor.violations[0][2]
+
+def test_clean_run(state_file):
+    app = App(10.0, 500, False, False, 0.0, state_file(),
+              should_monitor_invariants = True, invariant_energy_interval = 10,
+              invariant_collision_interval = 1,
+              invariant_overlap_interval = 50,
+              should_fail_on_violation = True)
+    assert app.monitor.violations == []
+    assert app.monitor.num_checks == 500 + 50 + 10
@@ -0,0 +1,47 @@
+import numpy as np
+
+from App import App
+from InitialState import InitialState
+from ParallelEngine import ParallelEngine
+
+def run_engine(container_radius, state, num_workers, end_time):
+    """Runs a ParallelEngine and returns [final state, totals]."""
+    engine = ParallelEngine(container_radius, state, num_workers)
+    try:
+        engine.run(end_time)
+        final_state = engine.state()
+    finally:
+        totals = engine.close()
+    return [final_state, totals]
+
+def test_worker_counts_agree():
+    state = InitialState(15.0, None, 200, 1.0, 0.5, 1.0, seed = 3).balls
+    serial_state, serial_totals = run_engine(15.0, state, 1, 3.0)
+    assert serial_totals[4] == 0 # One sector has no boundary events
+    for num_workers in [2, 3, 6]:
+        final_state, totals = run_engine(15.0, state, num_workers, 3.0)
+        assert np.array_equal(final_state, serial_state)
+        assert totals[:2] == serial_totals[:2]
+        # Only events near the boundary events are undone
+        assert totals[4] < 0.05 * totals[3]
+
+def test_matches_app(state_file):
+    file_name = state_file(num_balls = 100)
+    app = App(10.0, 200, False, False, 0.0, file_name)
+    state = np.loadtxt(file_name, delimiter = ",", ndmin = 2)
+    # The last collision is at app.time, up to rounding
+    final_state, totals = run_engine(10.0, state, 3, app.time + 1e-9)
+    app.positions += app.velocities * 1e-9
+    assert totals[0] == app.ball_collisions
+    assert totals[1] == app.wall_collisions
+    assert np.allclose(final_state[:, 0:2], app.positions, rtol = 0.0,
+                       atol = 1e-10)
+    assert np.allclose(final_state[:, 2:4], app.velocities, rtol = 0.0,
+                       atol = 1e-10)
+
+def test_benchmark():
+    state = InitialState(15.0, None, 100, 1.0, 0.5, 1.0, seed = 4).balls
+    rows = ParallelEngine.benchmark(15.0, state, 1.0, [1, 2])
+    assert [row[0] for row in rows] == [1, 2]
+    for row in rows:
+        assert 0 < row[6] <= row[5] # Slowest worker of each round
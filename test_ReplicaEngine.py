@@ -0,0 +1,43 @@
+import numpy as np
+
+from App import App
+from InitialState import InitialState
+from ReplicaEngine import ReplicaEngine
+
+def load_state(file_name):
+    """Returns the (N, 6) state in an initial state CSV file."""
+    return np.loadtxt(file_name, delimiter = ",", ndmin = 2)
+
+def test_single_replica_matches_app(state_file):
+    file_name = state_file()
+    for num_events in [1, 5, 20]:
+        app = App(10.0, num_events, False, False, 0.0, file_name)
+        engine = ReplicaEngine(10.0, [load_state(file_name)])
+        engine.run(num_events)
+        assert np.isclose(engine.time[0], app.time, rtol = 1e-12)
+        assert engine.ball_collisions[0] == app.ball_collisions
+        assert engine.wall_collisions[0] == app.wall_collisions
+        assert np.allclose(engine.positions[0], app.positions, atol = 1e-10)
+        assert np.allclose(engine.velocities[0], app.velocities,
+                           atol = 1e-10)
+
+def test_replicas_are_independent():
+    seeds = ReplicaEngine.replica_seeds(7, 3)
+    states = [InitialState(10.0, None, 20, 1.0, 0.5, 1.0, seed = seed).balls
+              for seed in seeds]
+    engine = ReplicaEngine(10.0, states)
+    engine.run(50)
+    for k, state in enumerate(states):
+        alone = ReplicaEngine(10.0, [state])
+        alone.run(50)
+        assert np.array_equal(engine.positions[k], alone.positions[0])
+        assert np.array_equal(engine.velocities[k], alone.velocities[0])
+        assert engine.time[k] == alone.time[0]
+
+def test_replica_seeds():
+    seeds = ReplicaEngine.replica_seeds(2 ** 32 - 1, 1000)
+    assert len(set(seeds)) == 1000
+    assert all(0 <= seed < 2 ** 32 for seed in seeds)
+    assert ReplicaEngine.replica_seeds(42, 3) == ReplicaEngine.replica_seeds(
+        42, 3)
+    assert ReplicaEngine.replica_seeds(None, 2) == [None, None]
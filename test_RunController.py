@@ -0,0 +1,30 @@
+import numpy as np
+
+from App import App
+from RunController import RunController
+
+CRITICAL_VALUE = 1.094 # 5% critical value of the scaled KS distance
+
+def test_maxwellian_sample_passes():
+    random = np.random.RandomState(0)
+    for n in [20, 200, 2000]:
+        velocities = random.normal(size = (n, 2))
+        masses = random.uniform(1.0, 3.0, n)
+        velocities /= np.sqrt(masses)[:, None] # Same temperature for all
+        assert (RunController.ks_distance_from_equilibrium(masses, velocities)
+                < CRITICAL_VALUE)
+
+def test_delta_sample_fails():
+    # Every ball has the same speed, as in a state made by InitialState
+    angles = np.random.RandomState(0).uniform(0.0, 2 * np.pi, 200)
+    velocities = np.column_stack([np.cos(angles), np.sin(angles)])
+    masses = np.ones(200)
+    assert (RunController.ks_distance_from_equilibrium(masses, velocities)
+            > CRITICAL_VALUE)
+
+def test_app_equilibrates(state_file):
+    app = App(10.0, 600, False, False, 0.0, state_file(),
+              should_control_run = True, equilibration_check_interval = 50,
+              equilibration_ks_threshold = CRITICAL_VALUE)
+    assert app.controller.is_equilibrated
+    assert app.controller.equilibration_event > 50 # Starts from equal speeds
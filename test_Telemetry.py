@@ -0,0 +1,44 @@
+import socket
+import pytest
+
+from App import App
+from Telemetry import Telemetry
+
+def check_snapshot(snapshot, app):
+    """Checks a fetched snapshot describes the final state of `app`."""
+    assert snapshot["time"] == app.time
+    assert snapshot["balls"] == app.num_balls
+    assert snapshot["ball_collisions"] == app.ball_collisions
+    assert snapshot["wall_collisions"] == app.wall_collisions
+    assert snapshot["total_collisions"] == 20
+    assert snapshot["kinetic_energy"] == app.kinetic_energy
+    assert snapshot["debug_text"] == app.format_debug_text()
+
+def test_fetch_from_port(state_file):
+    app = App(10.0, 20, False, False, 0.0, state_file())
+    telemetry = Telemetry(20, port = 0) # Any free port
+    try:
+        assert Telemetry.fetch(port = telemetry.port) == {}
+        telemetry.publish(app)
+        check_snapshot(Telemetry.fetch(port = telemetry.port), app)
+    finally:
+        telemetry.close()
+
+    with pytest.raises(ConnectionRefusedError):
+        Telemetry.fetch(port = telemetry.port)
+
+def test_fetch_from_socket(state_file):
+    app = App(10.0, 20, False, False, 0.0, state_file())
+    telemetry = Telemetry(20, socket_path = "telemetry.sock")
+    try:
+        telemetry.publish(app)
+        check_snapshot(Telemetry.fetch(socket_path = "telemetry.sock"), app)
+    finally:
+        telemetry.close()
+
+def test_port_in_use():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as other:
+        other.bind((Telemetry.HOST, 0))
+        other.listen()
+        with pytest.raises(Exception, match = "could not be started"):
+            Telemetry(20, port = other.getsockname()[1])
@@ -0,0 +1,34 @@
+import numpy as np
+
+from ValidateState import ValidateState
+
+def make_state(positions):
+    """Returns a state of unit balls at `positions` moving with v = (1, 0)."""
+    state = np.zeros((len(positions), 6))
+    state[:, 0:2] = positions
+    state[:, 2] = 1.0
+    state[:, 4] = 1.0
+    state[:, 5] = 1.0
+    return state
+
+def test_valid_state():
+    validator = ValidateState(10.0)
+    assert validator.validate(make_state([[0, 0], [2, 0], [-5, 5]]))
+
+def test_overlapping_balls():
+    validator = ValidateState(10.0)
+    assert not validator.validate(make_state([[0, 0], [1.5, 0], [-5, 5]]))
+    description, rows = validator.problems[0]
+    assert description == "Balls overlap"
+    assert rows.tolist() == [[0, 1]]
+
+def test_huge_finite_position():
+    for huge in [1e10, 1e300]:
+        validator = ValidateState(10.0)
+        assert not validator.validate(make_state([[0, 0], [huge, 0],
+                                                  [2, 0]]))
+        assert len(validator.problems) == 1
+        description, rows = validator.problems[0]
+        assert description == "Ball is outside the container"
+        assert rows.tolist() == [1]
+        assert "rows 1" in validator.report()